@@ -1,13 +1,21 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
-import joblib
-import pandas as pd
 import os
 import numpy as np
-from database import Database
+from database import Database, decode_cursor, paginate
+from export import FORMATS as EXPORT_FORMATS, gzip_chunks
 import pyotp
 from pdf_generator import PDFGenerator
 from io import BytesIO
+from datetime import datetime
+from prediction_cache import PredictionCache
+from weather_cache import WeatherCache
+from batch_scheduler import MicroBatchScheduler
+from model_registry import ModelRegistry, MODEL_FEATURES
+from scenarios import (PRACTICES, PRACTICE_LABELS, enumerate_practices, economics, validate_practice_options,
+                       parse_grid, break_even_price, load_distributions, validate_distribution,
+                       sample_conditions, condition_variants, quantiles, UNIFORM_DISTRIBUTION, RAINFALL_LEVELS,
+                       DISEASE_LEVELS, MAX_SAMPLES, age_trajectories, MAX_PROJECTION_YEARS)
 
 app = Flask(__name__)
 CORS(app)  # Permet les requêtes cross-origin pour le frontend
@@ -15,14 +23,61 @@ CORS(app)  # Permet les requêtes cross-origin pour le frontend
 # Initialiser la base de données
 db = Database()
 
-# Charger le modèle XGBoost
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "model_productivite_xgb.pkl")
+# Moteur d'inférence :
+#   "xgboost" : booster complet (par défaut)
+#   "grid"    : grille de seuils compilée (grid_engine.py)
+#   "lite"    : runtime NumPy allégé, sans xgboost/sklearn/pandas (lite_runtime.py)
+# Le modèle servi vient du registre (model_registry.py) et peut être remplacé à chaud
+model_registry = ModelRegistry(
+    engine=os.environ.get("MON_CACAO_ENGINE", "xgboost"),
+    grid_slabs=int(os.environ.get("MON_CACAO_GRID_SLABS", 2048)),
+    # Threads de prédiction par processus (0 = réglage du modèle), fixé par gunicorn_config.py
+    n_threads=int(os.environ.get("MON_CACAO_INFERENCE_THREADS", 0)) or None,
+    # Niveau de couverture des intervalles de prédiction (0.8, 0.9 ou 0.95, calibrés à l'entraînement)
+    interval_level=float(os.environ.get("MON_CACAO_INTERVAL_LEVEL", 0.9))
+)
 try:
-xgb_model = joblib.load(MODEL_PATH)
-    MODEL_LOADED = True
-except:
-    MODEL_LOADED = False
-    print("⚠️ Modèle XGBoost non trouvé. Les prédictions utiliseront le mode simulation.")
+    model_registry.activate()
+except Exception:
+    print(f"⚠️ Modèle XGBoost non chargé ({model_registry.last_error}). "
+          "Les prédictions utiliseront le mode simulation.")
+
+# Vérification périodique du manifeste du registre (0 = désactivée)
+MODEL_POLL_SECONDS = float(os.environ.get("MON_CACAO_MODEL_POLL_SECONDS", 0))
+if MODEL_POLL_SECONDS > 0:
+    model_registry.watch(MODEL_POLL_SECONDS)
+
+# Cache météo : mémoire du processus devant la table weather_cache (une ligne par région)
+weather_cache = WeatherCache(
+    db,
+    ttl=float(os.environ.get("MON_CACAO_WEATHER_TTL", 3600)),
+    # Données expirées encore servies (marquées périmées) pendant leur rafraîchissement
+    stale_ttl=float(os.environ.get("MON_CACAO_WEATHER_STALE", 21600)),
+    max_size=int(os.environ.get("MON_CACAO_WEATHER_MEMORY_SIZE", 256)),
+    revalidate_after=float(os.environ.get("MON_CACAO_WEATHER_REVALIDATE_SECONDS", 60))
+)
+# Purge périodique des données expirées (0 = désactivée)
+WEATHER_EVICT_SECONDS = float(os.environ.get("MON_CACAO_WEATHER_EVICT_SECONDS", 600))
+if WEATHER_EVICT_SECONDS > 0:
+    weather_cache.start_eviction(WEATHER_EVICT_SECONDS)
+
+# ========== PAGINATION ==========
+
+# Taille maximale d'une page des listes (paramètre `limit`)
+MAX_PAGE_SIZE = 500
+
+def page_args(default_limit):
+    """(limit, cursor) de la requête ; ValueError si l'un des deux est invalide"""
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError(f"limit doit être un entier entre 1 et {MAX_PAGE_SIZE}") from None
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit doit être compris entre 1 et {MAX_PAGE_SIZE}")
+    cursor = request.args.get('cursor') or None
+    if cursor is not None:
+        decode_cursor(cursor)
+    return limit, cursor
 
 # ========== ROUTES D'AUTHENTIFICATION ==========
 
@@ -153,9 +208,15 @@ def create_producer():
 
 @app.route('/api/producers/<int:professional_id>', methods=['GET'])
 def get_producers(professional_id):
-    """Récupérer les producteurs d'un professionnel"""
-    producers = db.get_producers_by_professional(professional_id)
-    return jsonify({'success': True, 'producers': producers}), 200
+    """Récupérer les producteurs d'un professionnel (page suivante : ?cursor=<next_cursor>)"""
+    try:
+        limit, cursor = page_args(100)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Une ligne de plus que la page : indique s'il reste une page suivante
+    producers, next_cursor = paginate(db.get_producers_by_professional(professional_id, limit + 1, cursor), limit)
+    return jsonify({'success': True, 'producers': producers, 'next_cursor': next_cursor}), 200
 
 # ========== ROUTES SOUMISSIONS ==========
 
@@ -176,13 +237,35 @@ def save_submission():
 
 @app.route('/api/submissions', methods=['GET'])
 def get_submissions():
-    """Récupérer les soumissions"""
+    """Récupérer les soumissions (page suivante : ?cursor=<next_cursor>)"""
     user_id = request.args.get('user_id', type=int)
     producer_id = request.args.get('producer_id', type=int)
-    limit = request.args.get('limit', 100, type=int)
+    try:
+        limit, cursor = page_args(100)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    submissions = db.get_submissions(user_id, producer_id, limit)
-    return jsonify({'success': True, 'submissions': submissions}), 200
+    submissions, next_cursor = paginate(db.get_submissions(user_id, producer_id, limit + 1, cursor), limit,
+                                        'date_soumission')
+    return jsonify({'success': True, 'submissions': submissions, 'next_cursor': next_cursor}), 200
+
+@app.route('/api/submissions/export', methods=['GET'])
+def export_submissions():
+    """Exporter les soumissions en continu (?format=csv|ndjson, ?gzip=1 pour compresser)"""
+    user_id = request.args.get('user_id', type=int)
+    producer_id = request.args.get('producer_id', type=int)
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f"format doit être l'un de : {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    convert, mimetype, extension = EXPORT_FORMATS[export_format]
+    # Générateur : les lignes sont lues par blocs au fur et à mesure de l'envoi
+    chunks = convert(db.iter_submissions(user_id, producer_id))
+    headers = {'Content-Disposition': f'attachment; filename="soumissions.{extension}"'}
+    if request.args.get('gzip', 'false').lower() in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(chunks, mimetype=mimetype, headers=headers)
 
 # ========== ROUTES CONSEILS ==========
 
@@ -232,12 +315,15 @@ def create_notification():
 
 @app.route('/api/notifications/<int:user_id>', methods=['GET'])
 def get_notifications(user_id):
-    """Récupérer les notifications d'un utilisateur"""
+    """Récupérer les notifications d'un utilisateur (page suivante : ?cursor=<next_cursor>)"""
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-    limit = request.args.get('limit', 50, type=int)
+    try:
+        limit, cursor = page_args(50)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    notifications = db.get_notifications(user_id, unread_only, limit)
-    return jsonify({'success': True, 'notifications': notifications}), 200
+    notifications, next_cursor = paginate(db.get_notifications(user_id, unread_only, limit + 1, cursor), limit)
+    return jsonify({'success': True, 'notifications': notifications, 'next_cursor': next_cursor}), 200
 
 @app.route('/api/notifications/<int:notification_id>/read', methods=['POST'])
 def mark_notification_read(notification_id):
@@ -317,16 +403,21 @@ def send_message():
 
 @app.route('/api/messages/<int:user_id>', methods=['GET'])
 def get_messages(user_id):
-    """Récupérer les messages"""
+    """Récupérer les messages (page suivante : ?cursor=<next_cursor>)"""
     folder = request.args.get('folder', 'inbox')
+    try:
+        limit, cursor = page_args(50)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    messages = db.get_messages(user_id, folder)
+    messages, next_cursor = paginate(db.get_messages(user_id, folder, limit + 1, cursor), limit)
     unread_count = db.get_unread_count(user_id)
     
     return jsonify({
         'success': True,
         'messages': messages,
-        'unread_count': unread_count
+        'unread_count': unread_count,
+        'next_cursor': next_cursor
     }), 200
 
 # ========== ROUTES LOCALISATION ==========
@@ -351,12 +442,16 @@ def save_location():
 
 @app.route('/api/locations', methods=['GET'])
 def get_locations():
-    """Récupérer les localisations"""
+    """Récupérer les localisations (page suivante : ?cursor=<next_cursor>)"""
     user_id = request.args.get('user_id', type=int)
     producer_id = request.args.get('producer_id', type=int)
+    try:
+        limit, cursor = page_args(100)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    locations = db.get_locations(user_id, producer_id)
-    return jsonify({'success': True, 'locations': locations}), 200
+    locations, next_cursor = paginate(db.get_locations(user_id, producer_id, limit + 1, cursor), limit)
+    return jsonify({'success': True, 'locations': locations, 'next_cursor': next_cursor}), 200
 
 # ========== ROUTES MÉTÉO ==========
 
@@ -376,16 +471,21 @@ def cache_weather():
     if not region:
         return jsonify({'success': False, 'error': 'region requis'}), 400
     
-    result = db.cache_weather(region, latitude, longitude, temperature, humidity, precipitation, forecast_data)
+    result = weather_cache.put(region, latitude, longitude, temperature, humidity, precipitation, forecast_data)
     return jsonify(result), 200
 
 @app.route('/api/weather/<region>', methods=['GET'])
 def get_weather(region):
-    """Récupérer les données météo (cache ou API externe)"""
-    cached = db.get_cached_weather(region)
+    """Récupérer les données météo (cache ou API externe)
+    
+    Données expirées depuis peu : servies avec `stale`, et `revalidate` pour le seul
+    client chargé de les rafraîchir (API externe puis POST /api/weather/cache)
+    """
+    cached, stale, revalidate = weather_cache.get(region)
     
     if cached:
-        return jsonify({'success': True, 'data': cached, 'source': 'cache'}), 200
+        return jsonify({'success': True, 'data': cached, 'source': 'cache',
+                        'stale': stale, 'revalidate': revalidate}), 200
     
     # Si pas en cache, on retourne une structure vide (sera remplie par le frontend avec API externe)
     return jsonify({
@@ -405,11 +505,18 @@ def home():
         "database": "SQLite",
         "endpoints": {
             "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_practices": "/predict/practices",
+            "predict_sensitivity": "/predict/sensitivity",
+            "predict_scenarios": "/predict/scenarios",
+            "predict_projection": "/predict/projection",
             "health": "/health",
             "model_info": "/model-info",
+            "model_reload": "/model/reload",
             "auth": "/api/auth/*",
             "producers": "/api/producers",
             "submissions": "/api/submissions",
+            "submissions_export": "/api/submissions/export",
             "notifications": "/api/notifications",
             "gamification": "/api/gamification/*",
             "messages": "/api/messages",
@@ -420,85 +527,264 @@ def home():
 
 @app.route('/health')
 def health():
+    model = model_registry.active
     return jsonify({
         "status": "healthy",
-        "model_loaded": MODEL_LOADED,
-        "database": "connected"
+        "model_loaded": model is not None,
+        "database": "connected",
+        "database_pool": db.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "weather_cache": weather_cache.stats(),
+        "micro_batching": micro_batcher.stats() if micro_batcher is not None else {"enabled": False},
+        "inference_engine": {
+            "name": model.engine if model is not None else "simulation",
+            **(model.predictor.stats() if hasattr(getattr(model, "predictor", None), "stats") else {})
+        }
     })
 
+# Champs requis pour une prédiction - mêmes paramètres que Streamlit
+REQUIRED_FIELDS = [
+    'age_verger', 'agroforest', 'engrais', 'fumier', 'maladie',
+    'herbicide', 'insecticide', 'fongicide', 'cout_prod', 'prix_a',
+    'region', 'pluviometrie', 'sexe', 'competences'
+]
+NUMERIC_FIELDS = ['age_verger', 'cout_prod', 'prix_a']
+
+# Nombre maximum d'exploitations par appel à /predict/batch
+MAX_BATCH_SIZE = 1000
+
+def validate_prediction_input(data):
+    """Vérifie les données d'une exploitation, retourne un message d'erreur ou None"""
+    if not isinstance(data, dict):
+        return "Format invalide: objet JSON attendu"
+    
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return f"Champ manquant: {field}"
+    
+    for field in NUMERIC_FIELDS:
+        value = data[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"Valeur numérique attendue: {field}"
+    
+    return None
+
+def to_model_features(data):
+    """Convertit les champs de l'API en colonnes du modèle - EXACTEMENT comme dans Streamlit"""
+    return {
+        "Coût_production/ha": data['cout_prod'],
+        "Age_verger": data['age_verger'],
+        "Région": data['region'],
+        "Pluviometrie": data['pluviometrie'],
+        "Sexe": data['sexe'],
+        "Niveau_education": "Non renseigné",
+        "Competences": data['competences'],
+        "Engrais chimique": data['engrais'],
+        "Agroforesterie": data['agroforest'],
+        "fumier/ compost": data['fumier'],
+        "Herbicide": data['herbicide'],
+        "Insecticide": data['insecticide'],
+        "Fongicide": data['fongicide'],
+        "Maladie": data['maladie'],
+    }
+
+# Cache des prédictions devant le modèle (taille 0 = désactivé)
+prediction_cache = PredictionCache(
+    MODEL_FEATURES,
+    max_size=int(os.environ.get("MON_CACAO_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("MON_CACAO_CACHE_TTL", 3600)),
+    precisions={
+        "Coût_production/ha": float(os.environ.get("MON_CACAO_CACHE_COST_PRECISION", 1000)),
+        "Age_verger": float(os.environ.get("MON_CACAO_CACHE_AGE_PRECISION", 0.1)),
+    }
+)
+
+def predict_grouped(items):
+    """Évalue des couples (modèle, exploitation) : un appel par modèle présent dans le lot"""
+    results = [None] * len(items)
+    groups = {}
+    for i, (model, features) in enumerate(items):
+        groups.setdefault(id(model), (model, []))[1].append(i)
+    for model, indices in groups.values():
+        predictions = model.predict_features([items[i][1] for i in indices])
+        for i, production in zip(indices, predictions):
+            results[i] = production
+    return results
+
+# Micro-lots : les /predict concurrents partagent un seul appel au modèle
+micro_batcher = None
+if os.environ.get("MON_CACAO_MICROBATCH", "0") == "1":
+    micro_batcher = MicroBatchScheduler(
+        predict_grouped,
+        max_batch_size=int(os.environ.get("MON_CACAO_MICROBATCH_SIZE", 32)),
+        max_wait_ms=float(os.environ.get("MON_CACAO_MICROBATCH_WAIT_MS", 2))
+    )
+# Attente maximale du résultat d'un micro-lot avant l'appel direct au modèle
+MICROBATCH_TIMEOUT = float(os.environ.get("MON_CACAO_MICROBATCH_TIMEOUT_MS", 1000)) / 1000
+
+def evaluate_rows(model, feature_rows):
+    """Appel au modèle, via l'ordonnanceur de micro-lots pour les requêtes unitaires"""
+    if micro_batcher is not None and len(feature_rows) == 1:
+        try:
+            return np.array([micro_batcher.predict((model, feature_rows[0]), timeout=MICROBATCH_TIMEOUT)])
+        except TimeoutError:
+            # Ordonnanceur bloqué ou arrêté : la requête est évaluée seule
+            pass
+    return model.predict_features(feature_rows)
+
+def predict_productions(records, model=None):
+    """Prédit la productivité (t/ha) de plusieurs exploitations en un seul appel au modèle
+
+    `model` est lu une seule fois dans le registre : si une nouvelle version est
+    activée pendant la requête, celle-ci se termine avec l'ancienne.
+    """
+    model = model or model_registry.active
+    if model is None:
+        # Mode simulation
+        return np.array([simulate_prediction(r) for r in records])
+    
+    feature_rows = [to_model_features(r) for r in records]
+    if not prediction_cache.enabled:
+        return evaluate_rows(model, feature_rows)
+    
+    prediction_cache.bind_model(model.version)
+    productions = np.empty(len(records), dtype=np.float64)
+    misses = {}  # clé -> (colonnes quantifiées, indices des lignes concernées)
+    for i, features in enumerate(feature_rows):
+        key, canonical = prediction_cache.canonicalize(features)
+        if key in misses:
+            misses[key][1].append(i)
+            continue
+        cached = prediction_cache.get(key)
+        if cached is None:
+            misses[key] = (canonical, [i])
+        else:
+            productions[i] = cached
+    
+    # Les lignes absentes du cache sont évaluées ensemble en un seul appel
+    if misses:
+        predictions = evaluate_rows(model, [canonical for canonical, _ in misses.values()])
+        for (key, (_, indices)), production in zip(misses.items(), predictions):
+            prediction_cache.put(key, float(production), version=model.version)
+            productions[indices] = production
+    
+    return productions
+
+def build_prediction_result(production, data, model=None):
+    """Calcule revenu, bénéfice, confiance et recommandations pour une prédiction
+
+    Si le modèle est calibré, l'intervalle de prédiction est lu dans sa table
+    (aucune évaluation supplémentaire) et la confiance est son niveau de couverture.
+    """
+    production = float(production)  # t/ha
+    production_kg = production * 1000  # Conversion en kg/ha
+    prix_vente = data['prix_a'] / 1000  # Conversion tonne vers kg (FCFA/kg)
+    revenu = round(production_kg * prix_vente)  # FCFA/ha
+    benefice = round(revenu - data['cout_prod'])  # FCFA/ha
+    
+    intervals = getattr(model, "intervals", None)
+    if intervals is not None:
+        lower, upper = intervals.interval(production, data['region'])
+        confidence = round(intervals.level * 100)
+        interval = {
+            "lower_t_ha": round(lower, 3),
+            "upper_t_ha": round(upper, 3),
+            "level": intervals.level,
+            "method": "conformal"
+        }
+    else:
+        confidence = calculate_confidence(data)  # Modèle non calibré : heuristique
+        interval = None
+    
+    return {
+        "productivity_t_ha": round(production, 3),
+        "productivity_kg_ha": round(production_kg),
+        "revenue_fcfa": revenu,
+        "benefit_fcfa": benefice,
+        "confidence": confidence,
+        "interval": interval,
+        "recommendation": get_recommendation(production, data),
+        "price_per_kg": prix_vente,
+        "cost_per_ha": data['cout_prod']
+    }
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
         # Récupérer les données du frontend
         data = request.get_json()
         
-        # Validation des données - mêmes paramètres que Streamlit
-        required_fields = [
-            'age_verger', 'agroforest', 'engrais', 'fumier', 'maladie',
-            'herbicide', 'insecticide', 'fongicide', 'cout_prod', 'prix_a',
-            'region', 'pluviometrie', 'sexe', 'competences'
-        ]
-        
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Champ manquant: {field}"}), 400
+        error = validate_prediction_input(data)
+        if error:
+            return jsonify({"error": error}), 400
         
         # Utiliser le modèle si disponible, sinon simulation
-        if MODEL_LOADED:
-        # Création du dictionnaire de données - EXACTEMENT comme dans Streamlit
-        model_data = {
-            "Coût_production/ha": [data['cout_prod']],
-            "Age_verger": [data['age_verger']],
-            "Région": [data['region']],
-            "Pluviometrie": [data['pluviometrie']],
-            "Sexe": [data['sexe']],
-                "Niveau_education": ["Non renseigné"],
-            "Competences": [data['competences']],
-            "Engrais chimique": [data['engrais']],
-            "Agroforesterie": [data['agroforest']],
-            "fumier/ compost": [data['fumier']],
-            "Herbicide": [data['herbicide']],
-            "Insecticide": [data['insecticide']],
-            "Fongicide": [data['fongicide']],
-            "Maladie": [data['maladie']],
-        }
+        model = model_registry.active
+        production = predict_productions([data], model)[0]
         
-            # Création du DataFrame et prédiction
-        df_input = pd.DataFrame(model_data)
-        X_trans = xgb_model.named_steps["prep"].transform(df_input)
-        pred = xgb_model.named_steps["model"].predict(X_trans)[0]
-            production = pred  # t/ha
-        else:
-            # Mode simulation
-            production = simulate_prediction(data)
+        return jsonify({
+            "success": True,
+            "prediction": build_prediction_result(production, data, model),
+            "input_data": data,
+            "model_info": {
+                "model_type": "XGBoost" if model is not None else "Simulation",
+                "model_version": model.version if model is not None else None,
+                "features_used": list(data.keys())
+            }
+        })
         
-        production_kg = production * 1000  # Conversion en kg/ha
-        prix_vente = data['prix_a'] / 1000  # Conversion tonne vers kg (FCFA/kg)
-        revenu = round(production_kg * prix_vente)  # FCFA/ha
-        benefice = round(revenu - data['cout_prod'])  # FCFA/ha
+    except Exception as e:
+        return jsonify({
+            "error": f"Erreur lors de la prédiction: {str(e)}",
+            "success": False
+        }), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Prédiction pour plusieurs exploitations en un seul passage du modèle"""
+    try:
+        data = request.get_json()
+        records = data.get('records') if isinstance(data, dict) else data
         
-        # Calcul de la confiance
-        confidence = calculate_confidence(data)
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Liste 'records' non vide requise", "success": False}), 400
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({
+                "error": f"Trop d'exploitations: maximum {MAX_BATCH_SIZE} par appel",
+                "success": False
+            }), 400
         
-        # Recommandations
-        recommendation = get_recommendation(production, data)
+        # Validation individuelle : une erreur n'empêche pas les autres prédictions
+        results = []
+        valid_indices = []
+        for i, record in enumerate(records):
+            error = validate_prediction_input(record)
+            if error:
+                results.append({"index": i, "success": False, "error": error})
+            else:
+                results.append(None)
+                valid_indices.append(i)
+        
+        # Un seul passage du préprocesseur et du modèle sur toutes les lignes valides
+        model = model_registry.active
+        if valid_indices:
+            valid_records = [records[i] for i in valid_indices]
+            productions = predict_productions(valid_records, model)
+            for i, record, production in zip(valid_indices, valid_records, productions):
+                results[i] = {
+                    "index": i,
+                    "success": True,
+                    "prediction": build_prediction_result(production, record, model)
+                }
         
         return jsonify({
             "success": True,
-            "prediction": {
-                "productivity_t_ha": round(production, 3),
-                "productivity_kg_ha": round(production_kg),
-                "revenue_fcfa": revenu,
-                "benefit_fcfa": benefice,
-                "confidence": confidence,
-                "recommendation": recommendation,
-                "price_per_kg": prix_vente,
-                "cost_per_ha": data['cout_prod']
-            },
-            "input_data": data,
+            "count": len(records),
+            "valid_count": len(valid_indices),
+            "results": results,
             "model_info": {
-                "model_type": "XGBoost" if MODEL_LOADED else "Simulation",
-                "features_used": list(data.keys())
+                "model_type": "XGBoost" if model is not None else "Simulation",
+                "model_version": model.version if model is not None else None
             }
         })
         
@@ -508,6 +794,278 @@ def predict():
             "success": False
         }), 500
 
+# ========== SCÉNARIOS « ET SI ? » ==========
+
+def read_scenario_request(data):
+    """Extrait l'exploitation d'une requête de scénario, retourne (exploitation, erreur)"""
+    if not isinstance(data, dict):
+        return None, "Format invalide: objet JSON attendu"
+    farm = data.get('farm', data)
+    return farm, validate_prediction_input(farm)
+
+@app.route('/predict/practices', methods=['POST'])
+def predict_practices():
+    """Classe les 2^6 combinaisons de pratiques culturales d'une exploitation
+
+    Corps : {"farm": {...}, "costs": {pratique: FCFA/ha}, "budget": FCFA/ha,
+    "sort_by": "yield" | "benefit", "top": N}
+    """
+    try:
+        data = request.get_json()
+        farm, error = read_scenario_request(data)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+
+        costs, budget = data.get('costs'), data.get('budget')
+        error = validate_practice_options(costs, budget)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+        sort_by = data.get('sort_by', 'yield')
+        if sort_by not in ('yield', 'benefit'):
+            return jsonify({"error": "sort_by doit valoir 'yield' ou 'benefit'", "success": False}), 400
+
+        # Situation actuelle + toutes les combinaisons : un seul appel au modèle
+        model = model_registry.active
+        variants, adopted, extra_costs = enumerate_practices(farm, costs, budget)
+        productions = predict_productions([farm] + variants, model)
+        baseline, productions = productions[0], productions[1:]
+
+        _, benefits = economics(productions, farm['prix_a'], [v['cout_prod'] for v in variants])
+        _, (baseline_benefit,) = economics([baseline], farm['prix_a'], [farm['cout_prod']])
+        yield_gains = productions - baseline
+        benefit_gains = benefits - baseline_benefit
+
+        # Tri décroissant sur le critère choisi, l'autre départage les ex aequo
+        primary, secondary = (yield_gains, benefit_gains) if sort_by == 'yield' else (benefit_gains, yield_gains)
+        order = np.lexsort((-secondary, -primary))
+        top = data.get('top')
+        if isinstance(top, int) and not isinstance(top, bool) and top > 0:
+            order = order[:top]
+
+        scenarios = []
+        for i in order:
+            variant = variants[i]
+            scenarios.append({
+                "practices": {p: variant[p] for p in PRACTICES},
+                "changes": [
+                    f"{'Adopter' if variant[p] == 'Oui' else 'Arrêter'} : {PRACTICE_LABELS[p]}"
+                    for p in PRACTICES if variant[p] != farm[p]
+                ],
+                "extra_cost_fcfa": round(float(extra_costs[i])),
+                "productivity_t_ha": round(float(productions[i]), 3),
+                "yield_gain_t_ha": round(float(yield_gains[i]), 3),
+                "benefit_fcfa": int(benefits[i]),
+                "benefit_gain_fcfa": int(benefit_gains[i]),
+                "recommendation": get_recommendation(float(productions[i]), variant)
+            })
+
+        return jsonify({
+            "success": True,
+            "baseline": build_prediction_result(baseline, farm, model),
+            "evaluated": len(variants),
+            "sort_by": sort_by,
+            "scenarios": scenarios,
+            "model_info": {
+                "model_type": "XGBoost" if model is not None else "Simulation",
+                "model_version": model.version if model is not None else None
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Erreur lors de la simulation: {str(e)}",
+            "success": False
+        }), 500
+
+@app.route('/predict/sensitivity', methods=['POST'])
+def predict_sensitivity():
+    """Revenu et bénéfice sur des grilles de prix et de coûts, avec le prix d'équilibre
+
+    Corps : {"farm": {...}, "prices": [...] | {"min", "max", "steps"}, "costs": idem}
+    Le prix n'entre pas dans le modèle : la production est prédite une fois par
+    coût de la grille (le coût est une entrée du modèle), en un seul appel.
+    """
+    try:
+        data = request.get_json()
+        farm, error = read_scenario_request(data)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+
+        prices, error = parse_grid(data.get('prices'), 'prices',
+                                   np.linspace(0.5 * farm['prix_a'], 1.5 * farm['prix_a'], 21))
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+        costs, error = parse_grid(data.get('costs'), 'costs', [farm['cout_prod']])
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+
+        model = model_registry.active
+        productions = predict_productions([dict(farm, cout_prod=float(c)) for c in costs], model)
+
+        # Matrices coûts x prix par diffusion : aucune autre évaluation du modèle
+        revenue, benefit = economics(productions[:, None], prices[None, :], costs[:, None])
+        break_even = break_even_price(productions, costs)
+
+        return jsonify({
+            "success": True,
+            "prices": prices.tolist(),
+            "costs": costs.tolist(),
+            "productivity_t_ha": np.round(productions, 3).tolist(),
+            "revenue_fcfa": revenue.astype(np.int64).tolist(),
+            "benefit_fcfa": benefit.astype(np.int64).tolist(),
+            "break_even_price": [round(float(p)) if np.isfinite(p) else None for p in break_even],
+            "break_even_price_per_kg": [round(float(p) / 1000, 1) if np.isfinite(p) else None for p in break_even],
+            "model_info": {
+                "model_type": "XGBoost" if model is not None else "Simulation",
+                "model_version": model.version if model is not None else None
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Erreur lors de la simulation: {str(e)}",
+            "success": False
+        }), 500
+
+# Distributions de pluviométrie et de maladie par région (scenarios.py)
+scenario_distributions = load_distributions()
+
+@app.route('/predict/scenarios', methods=['POST'])
+def predict_scenarios():
+    """Simulation de Monte-Carlo sur la pluviométrie et les maladies de la saison
+
+    Corps : {"farm": {...}, "n_samples": 10000, "seed": 42, "price_cv": 0.1,
+    "distribution": {"pluviometrie": {niveau: p}, "maladie": {niveau: p}}}
+    La distribution par défaut est celle de la région de l'exploitation.
+    """
+    try:
+        data = request.get_json()
+        farm, error = read_scenario_request(data)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+
+        n_samples = data.get('n_samples', 10000)
+        if isinstance(n_samples, bool) or not isinstance(n_samples, int) or not 1 <= n_samples <= MAX_SAMPLES:
+            return jsonify({"error": f"n_samples doit être compris entre 1 et {MAX_SAMPLES}", "success": False}), 400
+        price_cv = data.get('price_cv', 0)
+        if isinstance(price_cv, bool) or not isinstance(price_cv, (int, float)) or price_cv < 0:
+            return jsonify({"error": "Valeur numérique positive attendue: price_cv", "success": False}), 400
+        seed = data.get('seed')
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+            return jsonify({"error": "Entier positif ou nul attendu: seed", "success": False}), 400
+        override = data.get('distribution', {})
+        error = validate_distribution(override)
+        if error:
+            return jsonify({"error": error, "success": False}), 400
+        distribution = dict(scenario_distributions.get(farm['region'], UNIFORM_DISTRIBUTION), **override)
+
+        # Seules pluie et maladie varient : les 9 combinaisons sont évaluées en un
+        # seul appel, puis chaque tirage lit sa production par indexation
+        model = model_registry.active
+        rng = np.random.default_rng(seed)
+        conditions = sample_conditions(distribution, n_samples, rng)
+        productions = predict_productions(condition_variants(farm), model)[conditions]
+
+        prices = np.full(n_samples, float(farm['prix_a']))
+        if price_cv:
+            prices = np.clip(prices * (1 + price_cv * rng.standard_normal(n_samples)), 0, None)
+        _, benefits = economics(productions, prices, farm['cout_prod'])
+
+        frequencies = np.bincount(conditions, minlength=len(RAINFALL_LEVELS) * len(DISEASE_LEVELS)) / n_samples
+        return jsonify({
+            "success": True,
+            "n_samples": n_samples,
+            "distribution": distribution,
+            "productivity_t_ha": quantiles(productions),
+            "benefit_fcfa": quantiles(benefits, 0),
+            "probability_of_loss": round(float((benefits < 0).mean()), 4),
+            "conditions": [
+                {"pluviometrie": rain, "maladie": disease, "frequency": round(float(f), 4)}
+                for (rain, disease), f in zip(
+                    ((r, d) for r in RAINFALL_LEVELS for d in DISEASE_LEVELS), frequencies)
+            ],
+            "model_info": {
+                "model_type": "XGBoost" if model is not None else "Simulation",
+                "model_version": model.version if model is not None else None
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Erreur lors de la simulation: {str(e)}",
+            "success": False
+        }), 500
+
+@app.route('/predict/projection', methods=['POST'])
+def predict_projection():
+    """Rendement et revenus cumulés à mesure que le verger vieillit
+
+    Corps : {"farm": {...}} ou {"farms": [...]}, "years": 25
+    Toutes les années de toutes les exploitations sont évaluées en un seul appel.
+    """
+    try:
+        data = request.get_json()
+        if isinstance(data, dict) and 'farms' in data:
+            farms = data['farms']
+            if not isinstance(farms, list) or not farms:
+                return jsonify({"error": "Liste 'farms' non vide requise", "success": False}), 400
+            errors = [validate_prediction_input(f) for f in farms]
+        else:
+            farm, error = read_scenario_request(data)
+            farms, errors = [farm], [error]
+        for i, error in enumerate(errors):
+            if error:
+                return jsonify({"error": f"Exploitation {i}: {error}", "success": False}), 400
+
+        years = data.get('years', 25)
+        if isinstance(years, bool) or not isinstance(years, int) or not 1 <= years <= MAX_PROJECTION_YEARS:
+            return jsonify({"error": f"years doit être compris entre 1 et {MAX_PROJECTION_YEARS}", "success": False}), 400
+        if len(farms) * years > MAX_BATCH_SIZE * 10:
+            return jsonify({"error": "Projection trop volumineuse: réduire farms ou years", "success": False}), 400
+
+        model = model_registry.active
+        variants, ages = age_trajectories(farms, years)
+        productions = predict_productions(variants, model).reshape(ages.shape)
+
+        # Colonnes prix et coût par exploitation, diffusées sur les années
+        prices = np.array([[f['prix_a']] for f in farms], dtype=np.float64)
+        costs = np.array([[f['cout_prod']] for f in farms], dtype=np.float64)
+        revenue, benefit = economics(productions, prices, costs)
+
+        # Intervalles lus dans la table de calibration, pour toutes les années à la fois
+        lower = upper = None
+        if model is not None and model.intervals is not None:
+            regions = [f['region'] for f in farms for _ in range(years)]
+            lower, upper = (b.reshape(ages.shape) for b in model.intervals.intervals(productions.ravel(), regions))
+
+        projections = [{
+            "ages": ages[i].tolist(),
+            "productivity_t_ha": np.round(productions[i], 3).tolist(),
+            "productivity_lower_t_ha": np.round(lower[i], 3).tolist() if lower is not None else None,
+            "productivity_upper_t_ha": np.round(upper[i], 3).tolist() if upper is not None else None,
+            "revenue_fcfa": revenue[i].astype(np.int64).tolist(),
+            "benefit_fcfa": benefit[i].astype(np.int64).tolist(),
+            "cumulative_revenue_fcfa": revenue[i].cumsum().astype(np.int64).tolist(),
+            "cumulative_benefit_fcfa": benefit[i].cumsum().astype(np.int64).tolist(),
+            "peak_age": float(ages[i][int(np.argmax(productions[i]))])
+        } for i in range(len(farms))]
+
+        return jsonify({
+            "success": True,
+            "years": years,
+            "projections": projections,
+            "model_info": {
+                "model_type": "XGBoost" if model is not None else "Simulation",
+                "model_version": model.version if model is not None else None
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Erreur lors de la projection: {str(e)}",
+            "success": False
+        }), 500
+
 def simulate_prediction(data):
     """Simulation de prédiction si le modèle n'est pas disponible"""
     base_production = 0.8  # t/ha de base
@@ -566,7 +1124,7 @@ def get_recommendation(prediction, data):
 @app.route('/api/pdf/report/professional/<int:professional_id>', methods=['GET'])
 def generate_professional_pdf(professional_id):
     """Générer un rapport PDF pour un professionnel"""
-    generator = PDFGenerator()
+    generator = PDFGenerator(db)
     pdf_buffer = BytesIO()
     generator.generate_professional_report(professional_id, pdf_buffer)
     pdf_buffer.seek(0)
@@ -582,7 +1140,7 @@ def generate_professional_pdf(professional_id):
 @app.route('/api/pdf/report/producer/<int:producer_id>', methods=['GET'])
 def generate_producer_pdf(producer_id):
     """Générer un rapport PDF pour un producteur"""
-    generator = PDFGenerator()
+    generator = PDFGenerator(db)
     pdf_buffer = BytesIO()
     generator.generate_producer_report(producer_id, pdf_buffer)
     pdf_buffer.seek(0)
@@ -598,32 +1156,46 @@ def generate_producer_pdf(producer_id):
 @app.route('/model-info')
 def model_info():
     """Retourne des informations sur le modèle"""
+    model = model_registry.active
     return jsonify({
-        "model_type": "XGBoost" if MODEL_LOADED else "Simulation",
-        "features": [
-            "Coût_production/ha",
-            "Age_verger", 
-            "Région",
-            "Pluviometrie",
-            "Sexe",
-            "Niveau_education",
-            "Competences",
-            "Engrais chimique",
-            "Agroforesterie",
-            "fumier/ compost",
-            "Herbicide",
-            "Insecticide",
-            "Fongicide",
-            "Maladie"
-        ],
+        "model_type": "XGBoost" if model is not None else "Simulation",
+        "version": model.version if model is not None else None,
+        "loaded_at": model.loaded_at if model is not None else None,
+        "load_time_ms": model.info()["load_time_ms"] if model is not None else None,
+        "features": MODEL_FEATURES,
         "output": "Productivité (t/ha)",
         "preprocessing": "StandardScaler + OneHotEncoder",
+        "compiled_encoder": model is not None and model.encoder is not None,
+        "inference_engine": model.engine if model is not None else "simulation",
+        "registry": model_registry.status(),
         "streamlit_compatible": True
     })
 
+@app.route('/model/reload', methods=['POST'])
+def reload_model():
+    """Charger une version du registre en arrière-plan puis la rendre active
+    
+    Une version explicite est aussi écrite dans le manifeste : les autres workers la
+    chargent à leur prochaine vérification, et la surveillance ne revient pas en arrière.
+    """
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    try:
+        model_registry.resolve(version)
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0]), "success": False}), 404
+    
+    if version:
+        model_registry.set_active(version)
+    if not model_registry.reload_async(version):
+        return jsonify({"error": "Chargement déjà en cours", "success": False}), 409
+    return jsonify({"success": True, "status": "loading", "version": version}), 202
+
 if __name__ == '__main__':
     print("🌱 Démarrage de l'API Mon Cacao v2.0...")
-    print(f"📦 Modèle chargé: {MODEL_LOADED}")
+    print(f"📦 Modèle chargé: {model_registry.active is not None}")
     print("💾 Base de données: SQLite")
-    print("🚀 Serveur API disponible sur http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    port = int(os.environ.get("MON_CACAO_PORT", 5000))
+    # Serveur de développement ; en production : gunicorn -c gunicorn_config.py
+    print(f"🚀 Serveur API disponible sur http://localhost:{port}")
+    app.run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,181 @@
+"""
+Ordonnanceur de micro-lots pour Mon Cacao
+Regroupe les appels /predict concurrents en un seul appel au modèle : un thread
+de travail vide la file dès que le lot est plein ou que l'attente maximale est atteinte
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class MicroBatchScheduler:
+    """File de requêtes évaluées par lots par `predict_fn(items) -> résultats`
+
+    `predict_fn` reçoit une liste d'éléments et retourne un résultat par élément,
+    dans le même ordre ; chaque appelant récupère sa propre ligne.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0, history=2048):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self._stopping = False
+
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.max_queue_depth = 0
+        self._batch_sizes = deque(maxlen=history)
+        self._waits = deque(maxlen=history)
+        self._model_times = deque(maxlen=history)
+
+    def _ensure_started(self):
+        # Un thread ne survit pas à fork() : chaque processus de travail démarre le sien
+        if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid() or not self._worker.is_alive():
+                previous, self._queue = self._queue, queue.Queue()
+                if self._pid == os.getpid():
+                    # Thread de travail arrêté : les éléments déjà en file sont repris par le suivant
+                    # (après fork, ceux du parent ne concernent pas ce processus)
+                    while True:
+                        try:
+                            entry = previous.get_nowait()
+                        except queue.Empty:
+                            break
+                        if entry is not None:
+                            self._queue.put(entry)
+                self._stopping = False
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="micro-batch", daemon=True)
+                self._worker.start()
+
+    def submit(self, item):
+        """Ajouter un élément à la file, retourne un Future"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        with self._lock:
+            self.requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def predict(self, item, timeout=None):
+        """Résultat d'un élément ; TimeoutError si le lot n'est pas évalué à temps"""
+        try:
+            return self.submit(item).result(timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def stop(self):
+        if self._worker is not None and self._worker.is_alive():
+            self._stopping = True
+            self._queue.put(None)
+            self._worker.join()
+
+    def _collect(self):
+        """Attendre un premier élément, puis compléter le lot jusqu'à la taille ou au délai maximum"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._stopping = True
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while not self._stopping:
+            batch = self._collect()
+            if batch is None:
+                break
+            try:
+                self._evaluate(batch)
+            finally:
+                # Quoi qu'il arrive au thread, aucun appelant du lot n'attend indéfiniment
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Lot de prédictions interrompu"))
+
+    def _evaluate(self, batch):
+        dispatched = time.perf_counter()
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.predict_fn(items)
+            error = None
+        except Exception as e:
+            error = e
+        model_time = time.perf_counter() - dispatched
+
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(len(batch))
+            self._model_times.append(model_time)
+            self._waits.extend(dispatched - enqueued for _, _, enqueued in batch)
+            if error is not None:
+                self.errors += 1
+
+        for i, (_, future, _) in enumerate(batch):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def stats(self):
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            waits_ms = [w * 1000 for w in self._waits]
+            model_ms = [t * 1000 for t in self._model_times]
+            return {
+                "enabled": True,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "batches": self.batches,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "batch_size": {
+                    "mean": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                    "p50": percentile(sizes, 50),
+                    "max": max(sizes) if sizes else 0,
+                },
+                "wait_ms": {
+                    "mean": round(sum(waits_ms) / len(waits_ms), 3) if waits_ms else 0.0,
+                    "p50": round(percentile(waits_ms, 50), 3),
+                    "p95": round(percentile(waits_ms, 95), 3),
+                    "p99": round(percentile(waits_ms, 99), 3),
+                },
+                "model_call_ms": {
+                    "mean": round(sum(model_ms) / len(model_ms), 3) if model_ms else 0.0,
+                    "p95": round(percentile(model_ms, 95), 3),
+                },
+            }
@@ -0,0 +1,568 @@
+"""
+Bancs d'essai des performances de Mon Cacao
+Usage : python benchmark.py <commande> [options]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.pkl")
+
+
+def load_pipeline(path=MODEL_PATH):
+    import joblib
+    return joblib.load(path)
+
+
+def per_call(fn, repeat):
+    """Durée moyenne d'un appel en secondes (après un appel de chauffe)"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def random_farm_columns(encoder, n_rows, n_combinations=64, seed=0):
+    """Exploitations aléatoires : valeurs numériques continues, `n_combinations` jeux de modalités"""
+    rng = np.random.default_rng(seed)
+    combos = [
+        [rng.choice(cats) for cats in encoder.categories]
+        for _ in range(n_combinations)
+    ]
+    picks = rng.integers(0, n_combinations, n_rows)
+    columns = {
+        "Coût_production/ha": rng.uniform(200000, 600000, n_rows),
+        "Age_verger": rng.uniform(1, 30, n_rows),
+    }
+    for j, name in enumerate(encoder.categorical_features):
+        columns[name] = np.array([combos[p][j] for p in picks], dtype=object)
+    return columns
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+# ========== MOTEURS D'INFÉRENCE ==========
+
+def bench_engines(args):
+    """Booster XGBoost contre grille de seuils compilée"""
+    from feature_encoder import CompiledEncoder
+    from grid_engine import ThresholdGridEngine
+
+    pipeline = load_pipeline()
+    encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+    regressor = pipeline.named_steps["model"]
+    grid = ThresholdGridEngine.from_pipeline(pipeline)
+
+    X = encoder.transform_columns(random_farm_columns(encoder, args.rows, args.combinations), args.rows)
+
+    start = time.perf_counter()
+    grid.warm(X)
+    compile_time = time.perf_counter() - start
+    stats = grid.stats()
+    print(f"Compilation de {stats['slabs']} tables ({stats['cells']} cellules, "
+          f"{stats['memory_bytes'] / 1e6:.1f} Mo) : {compile_time:.2f} s")
+
+    if not np.array_equal(regressor.predict(X), grid.predict(X)):
+        raise SystemExit("❌ Les prédictions de la grille diffèrent du booster")
+
+    rows = []
+    for batch in (1, 16, 256, args.rows):
+        xgb_time = np.mean([per_call(lambda: regressor.predict(X[i:i + batch]), args.repeat)
+                            for i in range(0, min(len(X), 20 * batch), batch)])
+        grid_time = np.mean([per_call(lambda: grid.predict(X[i:i + batch]), args.repeat)
+                             for i in range(0, min(len(X), 20 * batch), batch)])
+        rows.append((batch, f"{xgb_time * 1e6:.1f}", f"{grid_time * 1e6:.1f}", f"x{xgb_time / grid_time:.1f}"))
+    print_table(("lot", "xgboost (µs)", "grille (µs)", "accélération"), rows)
+
+
+# ========== CATÉGORIES NATIVES ==========
+
+def bench_categorical(args):
+    """One-hot dense contre catégories natives XGBoost : entraînement, taille, latence, R²"""
+    import tempfile
+    import joblib
+    from sklearn.model_selection import train_test_split
+    from feature_encoder import CompiledEncoder
+    from train_model import build_pipeline, generate_dataset
+
+    X, y = generate_dataset(args.samples)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    rows = []
+    for mode in ("onehot", "native"):
+        pipeline = build_pipeline(mode)
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_time = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.pkl")
+            joblib.dump(pipeline, path)
+            size = os.path.getsize(path)
+
+        encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+        regressor = pipeline.named_steps["model"]
+        if args.threads:
+            regressor.set_params(n_jobs=args.threads)
+        X_bench = encoder.transform_columns(random_farm_columns(encoder, args.rows), args.rows)
+        single = np.mean([per_call(lambda: regressor.predict(X_bench[i:i + 1]), args.repeat) for i in range(20)])
+        batch = per_call(lambda: regressor.predict(X_bench), max(1, args.repeat // 10))
+
+        rows.append((
+            mode,
+            f"{fit_time:.2f}",
+            f"{size / 1024:.0f}",
+            encoder.n_features_out,
+            f"{X_bench.nbytes / args.rows:.0f}",
+            f"{single * 1e6:.0f}",
+            f"{batch * 1e3:.1f}",
+            f"{pipeline.score(X_test, y_test):.4f}",
+        ))
+    print(f"{args.samples} exploitations d'entraînement, lot de {args.rows} lignes")
+    print_table(("encodage", "entraînement (s)", "pickle (Ko)", "colonnes", "octets/ligne",
+                 "1 ligne (µs)", "lot (ms)", "R² test"), rows)
+
+
+# ========== RUNTIME ALLÉGÉ ==========
+
+# Chaque mesure tourne dans un processus neuf pour compter les imports à froid
+RUNTIME_PROBES = {
+    "pipeline joblib (xgboost + sklearn + pandas)": """
+import joblib, xgboost, sklearn.pipeline
+from feature_encoder import CompiledEncoder
+deserialize = time.perf_counter()
+pipeline = joblib.load(MODEL_PATH)
+encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+predict = pipeline.named_steps["model"].predict
+""",
+    "runtime allégé (NumPy)": """
+from lite_runtime import LiteModel
+deserialize = time.perf_counter()
+model = LiteModel.load()
+encoder, predict = model.encoder, model.predict
+""",
+    "artefact : booster UBJSON (xgboost)": """
+import xgboost
+from model_artifact import ModelArtifact, artifact_path_for
+deserialize = time.perf_counter()
+artifact = ModelArtifact.load(artifact_path_for(MODEL_PATH))
+encoder, predict = artifact.encoder, artifact.regressor().predict
+""",
+    "artefact : arbres mmap (NumPy)": """
+from model_artifact import ModelArtifact, artifact_path_for
+deserialize = time.perf_counter()
+artifact = ModelArtifact.load(artifact_path_for(MODEL_PATH))
+model = artifact.lite_model()
+encoder, predict = model.encoder, model.predict
+""",
+}
+
+RUNTIME_PROBE_TEMPLATE = """
+import json, resource, sys, time
+start = time.perf_counter()
+MODEL_PATH = {model_path!r}
+{body}
+loaded = time.perf_counter()
+columns = {{"Coût_production/ha": 450000.0, "Age_verger": 15.0}}
+for name, cats in zip(encoder.categorical_features, encoder.categories):
+    columns[name] = cats[0]
+predict(encoder.transform_columns(columns, 1))
+first = time.perf_counter()
+print(json.dumps({{
+    "load_s": loaded - start,
+    "deserialize_s": loaded - deserialize,
+    "first_prediction_s": first - loaded,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": sorted(m for m in ("xgboost", "sklearn", "pandas") if m in sys.modules),
+}}))
+"""
+
+
+def bench_runtime(args):
+    """Temps d'import/chargement et mémoire résidente : pickle joblib, export allégé et artefact"""
+    import json
+    import subprocess
+    import sys
+
+    rows = []
+    for label, body in RUNTIME_PROBES.items():
+        code = RUNTIME_PROBE_TEMPLATE.format(model_path=MODEL_PATH, body=body)
+        runs = [json.loads(subprocess.check_output([sys.executable, "-c", code], cwd=BASE_DIR))
+                for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["load_s"])
+        rows.append((
+            label,
+            f"{best['load_s'] * 1000:.0f}",
+            f"{best['deserialize_s'] * 1000:.1f}",
+            f"{best['first_prediction_s'] * 1000:.1f}",
+            f"{best['max_rss_mb']:.0f}",
+            ", ".join(best["heavy_modules"]) or "-",
+        ))
+    print_table(("chemin", "import+chargement (ms)", "désérialisation (ms)", "1re prédiction (ms)", "RSS max (Mo)", "modules lourds"), rows)
+
+
+# ========== ENTRAÎNEMENT HORS MÉMOIRE ==========
+
+# Chaque entraînement tourne dans un processus neuf pour mesurer son pic de mémoire
+TRAINING_PROBES = {
+    "DataFrame + one-hot dense": """
+import sqlite3
+import pandas as pd
+from retrain import SUBMISSIONS_QUERY, MAX_PRODUCTION_KG_HA
+from synthetic_data import SUBMISSION_COLUMNS
+from model_registry import MODEL_FEATURES
+from train_model import build_pipeline
+conn = sqlite3.connect(DB)
+df = pd.read_sql_query(SUBMISSIONS_QUERY, conn, params=(0, MAX_PRODUCTION_KG_HA, -1))
+holdout = df['id'] % 5 == 0
+X = df[list(SUBMISSION_COLUMNS)].set_axis(list(SUBMISSION_COLUMNS.values()), axis=1).reindex(columns=MODEL_FEATURES)
+y = df['production_reelle'] / 1000
+pipeline = build_pipeline().fit(X[~holdout], y[~holdout])
+metrics = {"r2": pipeline.score(X[holdout], y[holdout])}
+""",
+    "itérateur + QuantileDMatrix": """
+from train_stream import train
+_, metrics = train(DB, "quantile", CHUNK_SIZE)
+""",
+    "itérateur + mémoire externe": """
+from train_stream import train
+_, metrics = train(DB, "external", CHUNK_SIZE)
+""",
+}
+
+TRAINING_PROBE_TEMPLATE = """
+import json, resource, time, warnings
+warnings.simplefilter("ignore")
+DB, CHUNK_SIZE = {db!r}, {chunk_size}
+start = time.perf_counter()
+{body}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "r2": metrics["r2"],
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def bench_outofcore(args):
+    """Entraînement depuis SQLite : DataFrame complet contre itérateur par blocs (durée, pic de mémoire)"""
+    import json
+    import subprocess
+    import sys
+
+    if not os.path.exists(args.db):
+        from synthetic_data import iter_chunks, write_sqlite
+        print(f"Génération de {args.rows} soumissions dans {args.db}...")
+        write_sqlite(args.db, iter_chunks(args.rows, seed=0), seed=0)
+
+    rows = []
+    for label, body in TRAINING_PROBES.items():
+        code = TRAINING_PROBE_TEMPLATE.format(db=os.path.abspath(args.db), chunk_size=args.chunk_size, body=body)
+        result = json.loads(subprocess.check_output([sys.executable, "-c", code], cwd=BASE_DIR))
+        rows.append((label, f"{result['seconds']:.1f}", f"{result['max_rss_mb']:.0f}", f"{result['r2']:.4f}"))
+    print(f"{args.db}, blocs de {args.chunk_size} lignes")
+    print_table(("chemin", "durée (s)", "RSS max (Mo)", "R² contrôle"), rows)
+
+
+# ========== MICRO-LOTS ==========
+
+def bench_microbatch(args):
+    """Requêtes concurrentes à une ligne : appels directs contre micro-lots (débit et latence)"""
+    from concurrent.futures import ThreadPoolExecutor
+    from batch_scheduler import MicroBatchScheduler, percentile
+    from feature_encoder import CompiledEncoder
+
+    pipeline = load_pipeline()
+    encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+    regressor = pipeline.named_steps["model"]
+    columns = random_farm_columns(encoder, args.requests, args.combinations)
+    farms = [{name: values[i] for name, values in columns.items()} for i in range(args.requests)]
+
+    def predict_rows(rows):
+        return regressor.predict(encoder.transform_records(rows))
+
+    def run(call):
+        latencies = []
+
+        def timed(farm):
+            start = time.perf_counter()
+            call(farm)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as pool:
+            list(pool.map(timed, farms))
+        elapsed = time.perf_counter() - start
+        ms = [t * 1000 for t in latencies]
+        return (f"{len(farms) / elapsed:.0f}", f"{percentile(ms, 50):.2f}", f"{percentile(ms, 99):.2f}")
+
+    rows = [("direct", "-", *run(lambda farm: predict_rows([farm])), "1")]
+    for wait_ms in args.waits:
+        scheduler = MicroBatchScheduler(predict_rows, max_batch_size=args.batch_size, max_wait_ms=wait_ms)
+        result = run(scheduler.predict)
+        scheduler.stop()
+        rows.append((f"micro-lots {args.batch_size}", wait_ms, *result, scheduler.stats()["batch_size"]["mean"]))
+    print_table(("chemin", "attente max (ms)", "req/s", "p50 (ms)", "p99 (ms)", "lot moyen"), rows)
+
+
+# ========== BASE DE DONNÉES ==========
+
+def _database_variants(directory, rows):
+    """Deux bases identiques : connexion par appel (comportement d'origine) et pool WAL"""
+    import sqlite3
+    from contextlib import contextmanager
+    from database import Database
+    from synthetic_data import iter_chunks, write_sqlite
+
+    class PerCallDatabase(Database):
+        """Une connexion par appel, journal DELETE et pragmas par défaut, comme avant le pool"""
+
+        def init_database(self):
+            super().init_database()
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("PRAGMA journal_mode = DELETE")
+
+        @contextmanager
+        def connection(self):
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+        @contextmanager
+        def transaction(self):
+            with self.connection() as conn:
+                yield conn
+                conn.commit()
+
+    variants = {}
+    for label, cls in (("connexion par appel", PerCallDatabase), ("pool WAL", Database)):
+        db = cls(os.path.join(directory, f"{cls.__name__}.db"))
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO users (username, password_hash, user_type) VALUES (?, '-', 'producteur')",
+                             [(f"user{i}",) for i in range(1, 51)])
+            conn.executemany("INSERT INTO user_points (user_id) VALUES (?)", [(i,) for i in range(1, 51)])
+        write_sqlite(db.db_path, iter_chunks(rows, seed=0), seed=0, user_id=1)
+        variants[label] = db
+    return variants
+
+
+DATABASE_METHODS = {
+    "save_submission": lambda db, i: db.save_submission(1 + i % 50, submission_data={"age_verger": 10, "region": "Nawa"}),
+    "get_submissions": lambda db, i: db.get_submissions(user_id=1 + i % 50, limit=20),
+    "create_notification": lambda db, i: db.create_notification(1 + i % 50, "Titre", "Message"),
+    "get_notifications": lambda db, i: db.get_notifications(1 + i % 50),
+    "add_points": lambda db, i: db.add_points(1 + i % 50, 5),
+    "get_unread_count": lambda db, i: db.get_unread_count(1 + i % 50),
+    "get_leaderboard": lambda db, i: db.get_leaderboard(),
+}
+
+
+def bench_database(args):
+    """Latence par méthode et débit concurrent : connexion par appel contre pool WAL"""
+    import sqlite3
+    import tempfile
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from batch_scheduler import percentile
+
+    with tempfile.TemporaryDirectory() as directory:
+        variants = _database_variants(directory, args.rows)
+
+        rows = []
+        for name, method in DATABASE_METHODS.items():
+            row = [name]
+            for db in variants.values():
+                timings = []
+                for i in range(args.calls):
+                    start = time.perf_counter()
+                    method(db, i)
+                    timings.append((time.perf_counter() - start) * 1e6)
+                row += [f"{percentile(timings, 50):.0f}", f"{percentile(timings, 99):.0f}"]
+            rows.append(row)
+        labels = list(variants)
+        print(f"Latence d'un appel, un thread ({args.calls} appels, {args.rows} soumissions)")
+        print_table(("méthode", *(f"{label} {q} (µs)" for label in labels for q in ("p50", "p99"))), rows)
+
+        # Charge mixte : une écriture pour quatre lectures, chaque client enchaîne ses appels
+        mix = ["save_submission", "get_submissions", "get_notifications", "get_unread_count", "get_leaderboard",
+               "add_points", "get_submissions", "get_notifications", "get_unread_count", "get_leaderboard"]
+        rows = []
+        for clients in args.clients:
+            for label, db in variants.items():
+                latencies, errors, lock = [], [], threading.Lock()
+
+                def client(offset):
+                    for i in range(offset, args.operations, clients):
+                        name = mix[i % len(mix)]
+                        start = time.perf_counter()
+                        try:
+                            DATABASE_METHODS[name](db, i)
+                        except sqlite3.OperationalError as e:
+                            with lock:
+                                errors.append(str(e))
+                            continue
+                        with lock:
+                            latencies.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(clients) as pool:
+                    list(pool.map(client, range(clients)))
+                elapsed = time.perf_counter() - start
+                writes = args.operations * sum(name in ("save_submission", "add_points") for name in mix) // len(mix)
+                rows.append((clients, label, f"{args.operations / elapsed:.0f}", f"{writes / elapsed:.0f}",
+                             f"{percentile(latencies, 50):.2f}", f"{percentile(latencies, 99):.2f}", len(errors)))
+        print(f"\nCharge mixte ({args.operations} appels, 20 % d'écritures)")
+        print_table(("clients", "base", "appels/s", "écritures/s", "p50 (ms)", "p99 (ms)", "verrous"), rows)
+
+
+# ========== SERVEUR HTTP ==========
+
+def _post_farms(args):
+    """Client de charge : envoie des exploitations à /predict, retourne les latences en secondes"""
+    import json
+    import urllib.request
+
+    url, farms = args
+    latencies = []
+    for farm in farms:
+        body = json.dumps(farm).encode()
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(req) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _wait_for_server(url, timeout=60):
+    import urllib.request
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            urllib.request.urlopen(url).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"❌ Serveur injoignable : {url}")
+
+
+def bench_server(args):
+    """Débit de /predict : serveur de développement Flask contre Gunicorn préchargé"""
+    import signal
+    import subprocess
+    import sys
+    import tempfile
+    from multiprocessing import Pool
+    from batch_scheduler import percentile
+
+    root = os.path.dirname(BASE_DIR)
+    rng = np.random.default_rng(0)
+    regions = ["Indenie-Djuablin", "Yamoussoukro", "La Me", "San-Pedro", "Grand-Ponts"]
+    farms = [{
+        "age_verger": float(rng.uniform(1, 30)), "agroforest": str(rng.choice(["Oui", "Non"])),
+        "engrais": str(rng.choice(["Oui", "Non"])), "fumier": "Non", "maladie": str(rng.choice(["Non", "Oui"])),
+        "herbicide": "Non", "insecticide": "Oui", "fongicide": "Non",
+        "cout_prod": float(rng.uniform(200000, 600000)), "prix_a": 750000.0,
+        "region": str(rng.choice(regions)), "pluviometrie": "Moyenne", "sexe": "Masculin",
+        "competences": "non",
+    } for _ in range(args.requests)]
+
+    env = dict(os.environ, MON_CACAO_CACHE_SIZE="0",
+               MON_CACAO_DB_PATH=os.path.join(tempfile.mkdtemp(), "bench.db"))
+    servers = [("flask dev (debug)", [sys.executable, "api_server.py"], BASE_DIR,
+                dict(env, MON_CACAO_PORT=str(args.port)))]
+    for workers in args.workers:
+        servers.append((f"gunicorn {workers} worker(s)",
+                        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py"], root,
+                        dict(env, MON_CACAO_BIND=f"127.0.0.1:{args.port}", MON_CACAO_WORKERS=str(workers))))
+
+    rows = []
+    for label, command, cwd, server_env in servers:
+        process = subprocess.Popen(command, cwd=cwd, env=server_env, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            _wait_for_server(base_url + "/health")
+            chunks = [(base_url + "/predict", farms[i::args.clients]) for i in range(args.clients)]
+            with Pool(args.clients) as pool:
+                pool.map(_post_farms, [(url, chunk[:5]) for url, chunk in chunks])  # chauffe
+                start = time.perf_counter()
+                latencies = [t for part in pool.map(_post_farms, chunks) for t in part]
+                elapsed = time.perf_counter() - start
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+        ms = [t * 1000 for t in latencies]
+        rows.append((label, f"{len(latencies) / elapsed:.0f}", f"{percentile(ms, 50):.1f}", f"{percentile(ms, 99):.1f}"))
+    print(f"{args.requests} requêtes /predict, {args.clients} clients, {os.cpu_count()} cœur(s)")
+    print_table(("serveur", "req/s", "p50 (ms)", "p99 (ms)"), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bancs d'essai Mon Cacao")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    engines = commands.add_parser("engines", help=bench_engines.__doc__)
+    engines.add_argument("--rows", type=int, default=4096)
+    engines.add_argument("--combinations", type=int, default=64)
+    engines.add_argument("--repeat", type=int, default=50)
+    engines.set_defaults(func=bench_engines)
+
+    categorical = commands.add_parser("categorical", help=bench_categorical.__doc__)
+    categorical.add_argument("--samples", type=int, default=1000)
+    categorical.add_argument("--rows", type=int, default=4096)
+    categorical.add_argument("--repeat", type=int, default=50)
+    categorical.add_argument("--threads", type=int, default=None)
+    categorical.set_defaults(func=bench_categorical)
+
+    runtime = commands.add_parser("runtime", help=bench_runtime.__doc__)
+    runtime.add_argument("--repeat", type=int, default=3)
+    runtime.set_defaults(func=bench_runtime)
+
+    outofcore = commands.add_parser("outofcore", help=bench_outofcore.__doc__)
+    outofcore.add_argument("--db", default="bench.db")
+    outofcore.add_argument("--rows", type=int, default=1000000, help="si la base n'existe pas")
+    outofcore.add_argument("--chunk-size", type=int, default=100000)
+    outofcore.set_defaults(func=bench_outofcore)
+
+    database = commands.add_parser("database", help=bench_database.__doc__)
+    database.add_argument("--rows", type=int, default=2000, help="soumissions initiales")
+    database.add_argument("--calls", type=int, default=500)
+    database.add_argument("--operations", type=int, default=4000)
+    database.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    database.set_defaults(func=bench_database)
+
+    microbatch = commands.add_parser("microbatch", help=bench_microbatch.__doc__)
+    microbatch.add_argument("--requests", type=int, default=4000)
+    microbatch.add_argument("--clients", type=int, default=32)
+    microbatch.add_argument("--combinations", type=int, default=64)
+    microbatch.add_argument("--batch-size", type=int, default=32)
+    microbatch.add_argument("--waits", type=float, nargs="+", default=[0.5, 2, 5])
+    microbatch.set_defaults(func=bench_microbatch)
+
+    server = commands.add_parser("server", help=bench_server.__doc__)
+    server.add_argument("--requests", type=int, default=3000)
+    server.add_argument("--clients", type=int, default=16)
+    server.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    server.add_argument("--port", type=int, default=5099)
+    server.set_defaults(func=bench_server)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
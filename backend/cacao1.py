@@ -3,7 +3,6 @@
 import os
 import sqlite3
 import pandas as pd  # type: ignore
-import joblib  # type: ignore
 import streamlit as st  # type: ignore
 from datetime import date
 import plotly.graph_objects as go  # type: ignore
@@ -11,6 +10,9 @@ import plotly.express as px  # type: ignore
 from werkzeug.security import generate_password_hash, check_password_hash  # type: ignore
 import time
 from auth_system import auth
+from model_registry import ModelRegistry
+from scenarios import age_trajectories, economics
+from export import csv_chunks, iter_blocks
 
 # Configuration de la page - DOIT ÊTRE LE PREMIER APPEL STREAMLIT
 st.set_page_config(
@@ -330,6 +332,8 @@ st.markdown("""
 BASE_DIR   = os.path.abspath(os.path.dirname(__file__))
 DB_PATH    = os.path.join(BASE_DIR, "data.sqlite")
 MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.pkl")
+PROJECTION_YEARS = 25  # Horizon de la projection sur la durée de vie du verger
+ADMIN_PREVIEW_ROWS = 1000  # Soumissions affichées dans l'espace admin (l'export CSV les contient toutes)
 
 # Données de référence pour les comparaisons
 MOYENNES_REGIONALES = {
@@ -359,8 +363,16 @@ SUGGESTIONS = {
     ]
 }
 
-# Charger le modèle XGBoost optimisé
-xgb_model = joblib.load(MODEL_PATH)
+# Charger le modèle XGBoost optimisé depuis le registre (une seule fois par processus)
+@st.cache_resource
+def get_model_registry():
+    registry = ModelRegistry(default_path=MODEL_PATH)
+    registry.activate()
+    return registry
+
+model_registry = get_model_registry()
+# Nouvelle version publiée : chargée en arrière-plan, l'ancienne reste servie en attendant
+model_registry.check_for_update()
 
 # ─── INITIALISATION DE LA BD ───────────────────────────────────────────────────
 def init_db():
@@ -1002,10 +1014,9 @@ elif choice == "📊 Prédiction" and st.session_state.user_id is not None:
                 "Maladie": [maladie],
             }
             
-            # Création du DataFrame et prédiction
-            df_input = pd.DataFrame(data)
-            X_trans = xgb_model.named_steps["prep"].transform(df_input)
-            pred = xgb_model.named_steps["model"].predict(X_trans)[0]
+            # Prédiction avec le modèle actif du registre
+            model = model_registry.active
+            pred = model.predict_features([{k: v[0] for k, v in data.items()}])[0]
             
             # Variables pour les calculs
             production = pred  # t/ha
@@ -1174,6 +1185,39 @@ elif choice == "📊 Prédiction" and st.session_state.user_id is not None:
             
             st.plotly_chart(fig_fin, use_container_width=True)
 
+            # Projection sur la durée de vie du verger : toutes les années en un seul appel au modèle
+            st.markdown("### 📈 Projection sur la durée de vie du verger")
+            trajectoire, ages = age_trajectories(
+                [{k: v[0] for k, v in data.items()}], PROJECTION_YEARS, "Age_verger")
+            production_proj = model.predict_features(trajectoire)
+            revenu_proj, benefice_proj = economics(production_proj, prix_a * 1000, cout_prod)
+
+            fig_proj = go.Figure()
+            fig_proj.add_trace(go.Scatter(
+                name='Production (t/ha)', x=ages[0], y=production_proj,
+                mode='lines+markers', line=dict(color='#2E8B57')
+            ))
+            fig_proj.add_trace(go.Scatter(
+                name='Revenu cumulé (FCFA/ha)', x=ages[0], y=revenu_proj.cumsum(),
+                yaxis='y2', line=dict(color='#2E86AB', dash='dot')
+            ))
+            fig_proj.add_trace(go.Scatter(
+                name='Bénéfice cumulé (FCFA/ha)', x=ages[0], y=benefice_proj.cumsum(),
+                yaxis='y2', line=dict(color='#1a472a')
+            ))
+            fig_proj.update_layout(
+                title=f"📈 PROJECTION SUR {PROJECTION_YEARS} ANS",
+                xaxis_title="Âge du verger (années)",
+                yaxis=dict(title="Production (t/ha)"),
+                yaxis2=dict(title="Cumul (FCFA/ha)", overlaying='y', side='right'),
+                plot_bgcolor='white',
+                height=400
+            )
+            st.plotly_chart(fig_proj, use_container_width=True)
+            st.caption(f"Pic de production attendu vers {ages[0][production_proj.argmax()]:.0f} ans ; "
+                       f"bénéfice cumulé sur {PROJECTION_YEARS} ans : {format_number(benefice_proj.sum())} FCFA/ha "
+                       "(prix et coûts actuels supposés constants).")
+
             # Suggestions d'optimisation
             st.markdown("### 💡 Suggestions d'optimisation")
             
@@ -1825,8 +1869,7 @@ elif choice == "🔒 Admin" and st.session_state.user_id is not None:
     st.markdown("---")
 
     st.markdown("#### 🗂️ Toutes les soumissions")
-    df_submissions = pd.read_sql_query(
-        """
+    submissions_query = """
         SELECT
             s.id AS submission_id,
             u.username,
@@ -1849,19 +1892,23 @@ elif choice == "🔒 Admin" and st.session_state.user_id is not None:
         FROM submissions s
         JOIN users u ON s.user_id = u.id
         ORDER BY s.submitted_at DESC
-        """,
-        conn,
-    )
-    conn.close()
-
+        """
+    # Aperçu limité aux soumissions récentes ; l'export complet ne passe pas par un DataFrame
+    df_submissions = pd.read_sql_query(submissions_query + " LIMIT ?", conn, params=(ADMIN_PREVIEW_ROWS,))
+    st.caption(f"Aperçu des {ADMIN_PREVIEW_ROWS} soumissions les plus récentes")
     st.dataframe(df_submissions, use_container_width=True)
-    csv_all = df_submissions.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        label="📥 Télécharger toutes les soumissions (CSV)",
-        data=csv_all,
-        file_name="toutes_soumissions_cacao.csv",
-        mime="text/csv",
-    )
+
+    # Export CSV construit seulement à la demande, bloc par bloc depuis le curseur
+    # (pas de DataFrame intermédiaire), et non à chaque réexécution de la page
+    if st.button("📦 Préparer l'export CSV de toutes les soumissions"):
+        csv_all = b"".join(csv_chunks(iter_blocks(conn.execute(submissions_query))))
+        st.download_button(
+            label="📥 Télécharger toutes les soumissions (CSV)",
+            data=csv_all,
+            file_name="toutes_soumissions_cacao.csv",
+            mime="text/csv",
+        )
+    conn.close()
 
 # ─── CAS PAR DÉFAUT (non connecté) ──────────────────────────────────────────────
 else:
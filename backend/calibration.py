@@ -0,0 +1,93 @@
+"""
+Intervalles de prédiction conformes pour Mon Cacao
+Les quantiles des erreurs absolues sur des données non vues à l'entraînement sont
+calculés une fois par train_model.py et rangés dans l'artefact du modèle : un
+intervalle se lit ensuite dans une table, sans nouvelle évaluation du modèle
+"""
+import math
+
+import numpy as np
+
+# Niveaux de couverture calculés à l'entraînement
+LEVELS = (0.8, 0.9, 0.95)
+# Effectif minimum d'une région pour lui donner sa propre table
+MIN_GROUP_SIZE = 30
+
+
+def conformal_quantile(abs_residuals, level):
+    """Quantile conforme : rang ceil((n + 1) * niveau) des erreurs absolues triées"""
+    scores = np.sort(np.asarray(abs_residuals, dtype=np.float64))
+    n = len(scores)
+    rank = math.ceil((n + 1) * level)
+    if rank > n:
+        return None  # Trop peu de points pour garantir ce niveau
+    return float(scores[rank - 1])
+
+
+def quantile_table(abs_residuals, levels):
+    """{niveau: demi-largeur}, sans les niveaux que l'effectif ne permet pas de garantir"""
+    widths = {str(level): conformal_quantile(abs_residuals, level) for level in levels}
+    return {level: width for level, width in widths.items() if width is not None}
+
+
+def fit_calibration(y_true, y_pred, groups=None, levels=LEVELS, min_group_size=MIN_GROUP_SIZE):
+    """Tables de demi-largeurs d'intervalle : globale, et par groupe (région) si l'effectif suffit
+
+    Le résultat est un dictionnaire simple, rangé tel quel dans l'artefact du modèle.
+    """
+    residuals = np.abs(np.asarray(y_true, dtype=np.float64) - np.asarray(y_pred, dtype=np.float64))
+    table = {
+        "method": "split-conformal",
+        "n_samples": int(len(residuals)),
+        "levels": quantile_table(residuals, levels),
+        "groups": {},
+    }
+    if groups is not None:
+        groups = np.asarray(groups)
+        for group in np.unique(groups):
+            mask = groups == group
+            if mask.sum() >= min_group_size:
+                table["groups"][str(group)] = {
+                    "n_samples": int(mask.sum()),
+                    "levels": quantile_table(residuals[mask], levels),
+                }
+    return table
+
+
+class IntervalLookup:
+    """Recherche O(1) de la demi-largeur d'intervalle pour un niveau et une région"""
+
+    def __init__(self, table, level=0.9):
+        self.table = table
+        self.level = level
+        key = str(level)
+        if key not in table["levels"]:
+            raise ValueError(f"Niveau non calibré: {level} (disponibles : {sorted(table['levels'])})")
+        self.global_width = table["levels"][key]
+        self.group_widths = {
+            group: entry["levels"][key] for group, entry in table.get("groups", {}).items()
+            if key in entry["levels"]
+        }
+
+    def width(self, group=None):
+        return self.group_widths.get(group, self.global_width)
+
+    def interval(self, prediction, group=None):
+        """(borne basse, borne haute) ; la production ne peut pas être négative"""
+        width = self.width(group)
+        return max(0.0, prediction - width), prediction + width
+
+    def intervals(self, predictions, groups):
+        """Version vectorisée pour un lot de prédictions"""
+        widths = np.array([self.width(g) for g in groups], dtype=np.float64)
+        predictions = np.asarray(predictions, dtype=np.float64)
+        return np.maximum(0.0, predictions - widths), predictions + widths
+
+    def info(self):
+        return {
+            "method": self.table.get("method"),
+            "level": self.level,
+            "n_samples": self.table.get("n_samples"),
+            "global_half_width": round(self.global_width, 4),
+            "groups": sorted(self.group_widths),
+        }
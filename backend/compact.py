@@ -0,0 +1,245 @@
+"""
+Compactage du modèle de productivité sous un budget de perte de précision
+Trois familles de candidats, évaluées sur un jeu de contrôle indépendant :
+
+  troncature   premiers arbres du booster seulement
+  élagage      updater `prune` de XGBoost : profondeur maximale réduite et fusion
+               des feuilles dont le gain est inférieur à gamma
+  distillation petit booster (moins d'arbres, moins profonds) entraîné sur les
+               prédictions du modèle d'origine
+
+Le plus petit candidat dont le RMSE ne dépasse pas celui du modèle d'origine de plus
+de --max-loss (et qui respecte --slo-ms si précisé) est sauvegardé comme un pickle
+ordinaire, avec son export allégé et son artefact, publiable dans le registre.
+
+Usage : python compact.py [--model model_productivite_xgb.pkl] [--max-loss 0.02]
+                          [--slo-ms 0.5] [--engine xgboost|lite]
+                          [--output model_compact.pkl] [--report compact.json]
+"""
+import argparse
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import xgboost as xgb
+
+from batch_scheduler import percentile
+from lite_runtime import TreeEnsemble
+from tune import measure_latency
+from xgb_trees import parse_booster_json
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.pkl")
+
+# Hausse relative du RMSE de contrôle tolérée (0.02 = +2 %)
+MAX_LOSS = 0.02
+# Jeu de contrôle et jeu de distillation : tirages indépendants de l'entraînement (graine 42)
+HOLDOUT_SAMPLES = 5000
+HOLDOUT_SEED = 2024
+DISTILL_SAMPLES = 20000
+DISTILL_SEED = 7
+
+TRUNCATE_FRACTIONS = (0.25, 0.5, 0.75)
+PRUNE_DEPTHS = (3, 4, 5)
+PRUNE_GAMMAS = (0.0, 0.01, 0.1)
+STUDENT_DEPTHS = (2, 3, 4)
+STUDENT_TREES = (25, 50, 100)
+
+
+def booster_stats(booster):
+    """Taille du booster : arbres, nœuds atteignables, profondeur maximale, octets UBJSON
+
+    Les nœuds supprimés par l'élagage restent dans les tableaux sérialisés mais ne
+    sont plus atteints : seuls les nœuds atteignables sont comptés.
+    """
+    trees = TreeEnsemble.from_trees(parse_booster_json(booster.save_raw('json')))
+    n_nodes, nodes = 0, trees.roots
+    while len(nodes):
+        n_nodes += len(nodes)
+        inner = nodes[~trees.is_leaf[nodes]]
+        nodes = np.concatenate([trees._left[inner], trees._right[inner]])
+    return {
+        'trees': booster.num_boosted_rounds(),
+        'nodes': n_nodes,
+        'max_depth': trees.max_depth,
+        'size_kb': round(len(booster.save_raw('ubj')) / 1024, 1),
+    }
+
+
+def truncate(booster, n_trees):
+    return booster[:n_trees]
+
+
+def prune(booster, dmatrix, max_depth, gamma):
+    """Élaguer une copie du booster : nœuds plus profonds que `max_depth` et splits de gain < gamma
+
+    Les nœuds supprimés deviennent des feuilles avec le poids déjà calculé à
+    l'entraînement ; `dmatrix` ne sert qu'au schéma des colonnes.
+    """
+    params = {'process_type': 'update', 'updater': 'prune', 'max_depth': max_depth, 'gamma': gamma,
+              'verbosity': 0}
+    return xgb.train(params, dmatrix, num_boost_round=booster.num_boosted_rounds(), xgb_model=booster.copy())
+
+
+def distill(X, teacher_prediction, max_depth, n_trees, n_threads=None):
+    """Petit booster ajusté sur les prédictions du modèle d'origine
+
+    Le taux d'apprentissage croît quand le nombre d'arbres diminue (10 / n_trees,
+    plafonné à 0.3) pour garder un budget d'apprentissage comparable.
+    """
+    params = {'max_depth': max_depth, 'learning_rate': min(0.3, 10 / n_trees), 'seed': 42, 'verbosity': 0}
+    if n_threads:
+        params['nthread'] = n_threads
+    return xgb.train(params, xgb.DMatrix(X, label=teacher_prediction), num_boost_round=n_trees)
+
+
+def measure_lite_latency(booster, X, n_calls=300):
+    """Latence d'une prédiction à une ligne (ms) par le runtime NumPy (moteur `lite`)"""
+    trees = TreeEnsemble.from_trees(parse_booster_json(booster.save_raw('json')))
+    rows = [X[i:i + 1] for i in range(min(len(X), 50))]
+    trees.predict(rows[0])
+    timings = []
+    for i in range(n_calls):
+        start = time.perf_counter()
+        trees.predict(rows[i % len(rows)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': percentile(timings, 50), 'p99_ms': percentile(timings, 99)}
+
+
+def evaluate(name, booster, X, y, teacher_prediction, base_rmse=None):
+    """Précision sur le contrôle, écart au modèle d'origine, taille et latences"""
+    prediction = booster.inplace_predict(X)
+    entry = {'name': name, **booster_stats(booster)}
+    entry['rmse'] = float(np.sqrt(np.mean((prediction - y) ** 2)))
+    entry['loss'] = entry['rmse'] / base_rmse - 1 if base_rmse else 0.0
+    entry['teacher_rmse'] = float(np.sqrt(np.mean((prediction - teacher_prediction) ** 2)))
+    xgb_latency = measure_latency(booster.save_raw('ubj'), X)
+    lite_latency = measure_lite_latency(booster, X)
+    entry.update(xgboost_p50_ms=xgb_latency['p50_ms'], xgboost_p99_ms=xgb_latency['p99_ms'],
+                 lite_p50_ms=lite_latency['p50_ms'], lite_p99_ms=lite_latency['p99_ms'])
+    return entry
+
+
+def compact(teacher, X_holdout, y_holdout, X_distill, max_loss=MAX_LOSS, slo_ms=None, engine="xgboost",
+            n_threads=None):
+    """Évaluer tous les candidats et choisir le plus petit dans les budgets
+
+    Retourne (rapport, booster retenu). Sans candidat acceptable, le modèle
+    d'origine est retenu.
+    """
+    teacher_holdout = teacher.inplace_predict(X_holdout)
+    teacher_distill = teacher.inplace_predict(X_distill)
+    baseline = evaluate("origine", teacher, X_holdout, y_holdout, teacher_holdout)
+    base_rmse = baseline['rmse']
+
+    boosters = {"origine": teacher}
+    n_rounds = teacher.num_boosted_rounds()
+    for fraction in TRUNCATE_FRACTIONS:
+        n_trees = max(1, int(n_rounds * fraction))
+        boosters[f"troncature {n_trees} arbres"] = truncate(teacher, n_trees)
+    dmatrix = xgb.DMatrix(X_distill[:1], label=teacher_distill[:1])
+    for depth in PRUNE_DEPTHS:
+        for gamma in PRUNE_GAMMAS:
+            boosters[f"élagage profondeur {depth}, gamma {gamma:g}"] = prune(teacher, dmatrix, depth, gamma)
+    for depth in STUDENT_DEPTHS:
+        for n_trees in STUDENT_TREES:
+            boosters[f"distillation {n_trees} arbres profondeur {depth}"] = distill(
+                X_distill, teacher_distill, depth, n_trees, n_threads)
+
+    candidates = [baseline]
+    for name, booster in list(boosters.items())[1:]:
+        candidates.append(evaluate(name, booster, X_holdout, y_holdout, teacher_holdout, base_rmse))
+    for entry in candidates:
+        entry['within_loss'] = entry is baseline or entry['loss'] <= max_loss
+        entry['meets_slo'] = slo_ms is None or entry[f'{engine}_p99_ms'] <= slo_ms
+
+    # Le plus petit modèle dans le budget de précision, ceux qui respectent l'objectif de latence d'abord
+    accepted = sorted((c for c in candidates if c['within_loss']),
+                      key=lambda c: (not c['meets_slo'], c['nodes'], c['rmse']))
+    selected = accepted[0]
+    report = {
+        'max_loss': max_loss,
+        'slo_ms': slo_ms,
+        'engine': engine,
+        'holdout_rows': len(y_holdout),
+        'distill_rows': len(X_distill),
+        'baseline': baseline,
+        'selected': selected['name'],
+        'gains': {
+            'nodes': baseline['nodes'] / selected['nodes'],
+            'size': baseline['size_kb'] / selected['size_kb'],
+            'xgboost_p50': baseline['xgboost_p50_ms'] / selected['xgboost_p50_ms'],
+            'lite_p50': baseline['lite_p50_ms'] / selected['lite_p50_ms'],
+        },
+        'candidates': candidates,
+    }
+    return report, boosters[selected['name']]
+
+
+def compacted_pipeline(pipeline, booster):
+    """Copie du pipeline sklearn dont le régresseur porte le booster compacté"""
+    compacted = copy.deepcopy(pipeline)
+    regressor = compacted.named_steps["model"]
+    regressor.load_model(bytearray(booster.save_raw('ubj')))
+    return compacted
+
+
+def main():
+    import joblib
+    from benchmark import print_table
+    from train_model import calibrate, generate_dataset
+
+    parser = argparse.ArgumentParser(description="Compactage du modèle sous un budget de précision")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--max-loss", type=float, default=MAX_LOSS, help="hausse relative du RMSE tolérée")
+    parser.add_argument("--slo-ms", type=float, default=None, help="p99 maximal d'une prédiction")
+    parser.add_argument("--engine", choices=("xgboost", "lite"), default="xgboost",
+                        help="moteur dont la latence est comparée à --slo-ms")
+    parser.add_argument("--holdout-samples", type=int, default=HOLDOUT_SAMPLES)
+    parser.add_argument("--distill-samples", type=int, default=DISTILL_SAMPLES)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--report", default=None, help="rapport au format JSON")
+    parser.add_argument("--output", default="model_compact.pkl")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    prep = pipeline.named_steps["prep"]
+    X_holdout, y_holdout = generate_dataset(args.holdout_samples, seed=HOLDOUT_SEED)
+    X_distill, _ = generate_dataset(args.distill_samples, seed=DISTILL_SEED)
+    teacher = pipeline.named_steps["model"].get_booster()
+
+    report, booster = compact(teacher, prep.transform(X_holdout), y_holdout.to_numpy(), prep.transform(X_distill),
+                              args.max_loss, args.slo_ms, args.engine, args.threads)
+    report['model'] = os.path.basename(args.model)
+
+    rows = [(c['name'], c['trees'], c['nodes'], c['max_depth'], c['size_kb'], f"{c['rmse']:.4f}",
+             f"{c['loss']:+.1%}", f"{c['xgboost_p50_ms']:.3f}", f"{c['lite_p50_ms']:.3f}",
+             "oui" if c['within_loss'] and c['meets_slo'] else "non")
+            for c in report['candidates']]
+    print_table(("candidat", "arbres", "nœuds", "prof.", "Ko", "RMSE", "perte", "xgboost p50 (ms)",
+                 "lite p50 (ms)", "accepté"), rows)
+    gains = report['gains']
+    print(f"Retenu : {report['selected']} — {gains['nodes']:.1f}× moins de nœuds, {gains['size']:.1f}× plus petit, "
+          f"p50 ÷{gains['xgboost_p50']:.2f} (xgboost), ÷{gains['lite_p50']:.2f} (lite)")
+    if report['slo_ms'] is not None and not any(c['meets_slo'] and c['within_loss'] for c in report['candidates']):
+        print(f"⚠️ Aucun candidat ne respecte p99 <= {args.slo_ms} ms dans le budget de précision")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # Pickle ordinaire, recalibré sur le contrôle, avec ses exports (comme train_model.py)
+    compacted = compacted_pipeline(pipeline, booster)
+    calibrate(compacted, X_holdout, y_holdout)
+    joblib.dump(compacted, args.output)
+    from lite_runtime import export_pipeline
+    from model_artifact import artifact_path_for, export_artifact
+    export_pipeline(compacted, os.path.splitext(args.output)[0] + '.lite.npz', source_path=args.output)
+    export_artifact(compacted, artifact_path_for(args.output), source_path=args.output)
+    print(f"✅ Modèle compacté sauvegardé dans {args.output} (python model_registry.py publish {args.output})")
+
+
+if __name__ == "__main__":
+    main()
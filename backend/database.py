@@ -1,11 +1,19 @@
 """
 Système de base de données pour Mon Cacao
 Remplace localStorage par une vraie base de données SQLite
+
+Les méthodes empruntent une connexion longue durée à un pool (journal WAL, pragmas
+réglés une fois par connexion) au lieu d'ouvrir et fermer une connexion par appel :
+  with db.connection() as conn:   lectures, mode autocommit
+  with db.transaction() as conn:  BEGIN IMMEDIATE ... COMMIT, ROLLBACK sur exception
 """
 import sqlite3
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from export import CHUNK_ROWS, iter_blocks
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 import pyotp
@@ -13,249 +21,453 @@ import qrcode
 from io import BytesIO
 import base64
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "mon_cacao.db")
+DB_PATH = os.environ.get("MON_CACAO_DB_PATH", os.path.join(os.path.dirname(__file__), "mon_cacao.db"))
 
-class Database:
-    def __init__(self, db_path=DB_PATH):
-        self.db_path = db_path
-        self.init_database()
-    
-    def get_connection(self):
-        """Créer une connexion à la base de données"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-    
-    def init_database(self):
-        """Initialiser toutes les tables de la base de données"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+# Connexions inactives conservées par processus (les suivantes sont fermées après usage)
+POOL_SIZE = int(os.environ.get("MON_CACAO_DB_POOL_SIZE", 8))
+# Attente maximale d'un verrou d'écriture avant "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get("MON_CACAO_DB_BUSY_TIMEOUT_MS", 5000))
+
+# Réglages appliqués à chaque nouvelle connexion
+PRAGMAS = {
+    "busy_timeout": BUSY_TIMEOUT_MS,
+    # Avec WAL, NORMAL ne synchronise le disque qu'aux checkpoints : un arrêt brutal peut
+    # perdre les dernières transactions, jamais corrompre la base
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # Kio, soit 16 Mo de cache de pages par connexion
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+# Migrations du schéma, appliquées dans l'ordre et enregistrées dans `schema_version`.
+# Une base existante ne reçoit que les migrations qui lui manquent : ne jamais modifier
+# une migration publiée, en ajouter une nouvelle.
+MIGRATIONS = [
+    (1, "Tables de l'application", [
         # Table des utilisateurs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE,
-                phone TEXT UNIQUE,
-                password_hash TEXT NOT NULL,
-                user_type TEXT NOT NULL CHECK(user_type IN ('producteur', 'professionnel')),
-                region TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                is_active INTEGER DEFAULT 1,
-                two_factor_secret TEXT,
-                two_factor_enabled INTEGER DEFAULT 0,
-                reset_token TEXT,
-                reset_token_expires TIMESTAMP
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE,
+            phone TEXT UNIQUE,
+            password_hash TEXT NOT NULL,
+            user_type TEXT NOT NULL CHECK(user_type IN ('producteur', 'professionnel')),
+            region TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            is_active INTEGER DEFAULT 1,
+            two_factor_secret TEXT,
+            two_factor_enabled INTEGER DEFAULT 0,
+            reset_token TEXT,
+            reset_token_expires TIMESTAMP
+        )
+        ''',
         # Table des producteurs (créés par les professionnels)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS producers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                professional_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                code TEXT UNIQUE NOT NULL,
-                region TEXT,
-                phone TEXT,
-                email TEXT,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (professional_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS producers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            professional_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            code TEXT UNIQUE NOT NULL,
+            region TEXT,
+            phone TEXT,
+            email TEXT,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (professional_id) REFERENCES users(id)
+        )
+        ''',
         # Table des soumissions de données
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                producer_id INTEGER,
-                user_id INTEGER,
-                age_verger REAL,
-                agroforest TEXT,
-                engrais TEXT,
-                fumier TEXT,
-                maladie TEXT,
-                herbicide TEXT,
-                insecticide TEXT,
-                fongicide TEXT,
-                cout_prod REAL,
-                prix_vente REAL,
-                production_reelle REAL,
-                revenu_total REAL,
-                region TEXT,
-                pluviometrie TEXT,
-                temperature REAL,
-                humidite REAL,
-                date_soumission TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                synced INTEGER DEFAULT 1,
-                FOREIGN KEY (producer_id) REFERENCES producers(id),
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            producer_id INTEGER,
+            user_id INTEGER,
+            age_verger REAL,
+            agroforest TEXT,
+            engrais TEXT,
+            fumier TEXT,
+            maladie TEXT,
+            herbicide TEXT,
+            insecticide TEXT,
+            fongicide TEXT,
+            cout_prod REAL,
+            prix_vente REAL,
+            production_reelle REAL,
+            revenu_total REAL,
+            region TEXT,
+            pluviometrie TEXT,
+            temperature REAL,
+            humidite REAL,
+            date_soumission TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            synced INTEGER DEFAULT 1,
+            FOREIGN KEY (producer_id) REFERENCES producers(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
         # Table des conseils donnés
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS advice_tracking (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                producer_id INTEGER,
-                user_id INTEGER,
-                advice_text TEXT NOT NULL,
-                category TEXT,
-                advice_type TEXT,
-                source TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (producer_id) REFERENCES producers(id),
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS advice_tracking (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            producer_id INTEGER,
+            user_id INTEGER,
+            advice_text TEXT NOT NULL,
+            category TEXT,
+            advice_type TEXT,
+            source TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (producer_id) REFERENCES producers(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
         # Table des notifications
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                message TEXT NOT NULL,
-                type TEXT DEFAULT 'info',
-                read INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            type TEXT DEFAULT 'info',
+            read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
         # Table des badges et gamification
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS badges (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                badge_type TEXT NOT NULL,
-                badge_name TEXT NOT NULL,
-                earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS badges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            badge_type TEXT NOT NULL,
+            badge_name TEXT NOT NULL,
+            earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
         # Table des points et classements
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_points (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL UNIQUE,
-                total_points INTEGER DEFAULT 0,
-                level INTEGER DEFAULT 1,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS user_points (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE,
+            total_points INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 1,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
         # Table des messages (messagerie interne)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_id INTEGER NOT NULL,
-                receiver_id INTEGER NOT NULL,
-                subject TEXT,
-                content TEXT NOT NULL,
-                read INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (sender_id) REFERENCES users(id),
-                FOREIGN KEY (receiver_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender_id INTEGER NOT NULL,
+            receiver_id INTEGER NOT NULL,
+            subject TEXT,
+            content TEXT NOT NULL,
+            read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (sender_id) REFERENCES users(id),
+            FOREIGN KEY (receiver_id) REFERENCES users(id)
+        )
+        ''',
         # Table des localisations (pour cartographie)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS locations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                producer_id INTEGER,
-                user_id INTEGER,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                address TEXT,
-                region TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (producer_id) REFERENCES producers(id),
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
+        '''
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            producer_id INTEGER,
+            user_id INTEGER,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            address TEXT,
+            region TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (producer_id) REFERENCES producers(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
         # Table des données météo (cache)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weather_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                region TEXT NOT NULL,
-                latitude REAL,
-                longitude REAL,
-                temperature REAL,
-                humidity REAL,
-                precipitation REAL,
-                forecast_data TEXT,
-                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
+        '''
+        CREATE TABLE IF NOT EXISTS weather_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            region TEXT NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            temperature REAL,
+            humidity REAL,
+            precipitation REAL,
+            forecast_data TEXT,
+            cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP
+        )
+        ''',
+    ]),
+    (2, "Index des requêtes fréquentes", [
+        # Soumissions d'un producteur ou d'un utilisateur, les plus récentes d'abord
+        "CREATE INDEX IF NOT EXISTS idx_submissions_producer_date ON submissions (producer_id, date_soumission)",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_user_date ON submissions (user_id, date_soumission)",
+        "CREATE INDEX IF NOT EXISTS idx_submissions_date ON submissions (date_soumission)",
+        # Notifications : toutes, ou seulement les non lues (index partiel)
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_unread ON notifications (user_id, created_at) WHERE read = 0",
+        # Messagerie : boîte de réception, messages envoyés, compteur des non lus
+        "CREATE INDEX IF NOT EXISTS idx_messages_receiver_created ON messages (receiver_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_sender_created ON messages (sender_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_receiver_read ON messages (receiver_id, read)",
+        # Localisations
+        "CREATE INDEX IF NOT EXISTS idx_locations_producer_created ON locations (producer_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_locations_user_created ON locations (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_locations_created ON locations (created_at)",
+        # Producteurs d'un professionnel, conseils, badges, classement
+        "CREATE INDEX IF NOT EXISTS idx_producers_professional_created ON producers (professional_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_advice_producer ON advice_tracking (producer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_advice_stats ON advice_tracking (category, advice_type, source)",
+        "CREATE INDEX IF NOT EXISTS idx_badges_user_earned ON badges (user_id, earned_at)",
+        "CREATE INDEX IF NOT EXISTS idx_user_points_total ON user_points (total_points)",
+        # Réinitialisation du mot de passe
+        "CREATE INDEX IF NOT EXISTS idx_users_reset_token ON users (reset_token)",
+    ]),
+    (3, "Cache météo : une ligne par région", [
+        # INSERT OR REPLACE sans contrainte d'unicité ajoutait une ligne à chaque appel :
+        # seule la plus récente de chaque région est conservée
+        "DELETE FROM weather_cache WHERE id NOT IN (SELECT MAX(id) FROM weather_cache GROUP BY region)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_weather_region ON weather_cache (region)",
+        # Purge des lignes expirées
+        "CREATE INDEX IF NOT EXISTS idx_weather_expires ON weather_cache (expires_at)",
+    ]),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# ========== PAGINATION ==========
+# Pagination par clé : les listes sont triées par (date, id) décroissants et une page
+# reprend après la dernière ligne de la précédente. Sans OFFSET, la recherche dans
+# l'index coûte autant en page 1 qu'en page 1000. Les dates NULL sont classées après
+# toutes les autres (ordre décroissant de SQLite), par id décroissant.
+
+def encode_cursor(row, column='created_at'):
+    """Curseur opaque désignant la position qui suit `row`"""
+    raw = json.dumps([row[column], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(date ou None, id) contenus dans un curseur ; ValueError s'il est invalide"""
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Curseur de pagination invalide") from e
+    if not isinstance(value, (str, type(None))) or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError("Curseur de pagination invalide")
+    return value, row_id
+
+def paginate(rows, limit, column='created_at'):
+    """Page et curseur suivant (None en fin de liste) à partir de `limit + 1` lignes lues"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], column)
+
+class Database:
+    def __init__(self, db_path=DB_PATH, pool_size=POOL_SIZE):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._stats = {"opened": 0, "reused": 0, "closed": 0}
+        self.init_database()
+        # Aucune connexion ouverte n'est héritée par les workers créés par fork (gunicorn --preload)
+        self.close()
+    
+    def _connect(self, isolation_level=None, check_same_thread=False):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=isolation_level,
+                               check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+    
+    def get_connection(self):
+        """Connexion dédiée hors pool, à fermer par l'appelant (tâches longues : entraînement, exports)
+        
+        Transactions implicites comme sqlite3 par défaut : conn.commit() valide les écritures.
+        """
+        return self._connect(isolation_level="", check_same_thread=True)
+    
+    def _acquire(self):
+        with self._pool_lock:
+            if os.getpid() != self._pid:
+                # Processus fils : les connexions du parent ne doivent pas être réutilisées
+                self._idle, self._pid = [], os.getpid()
+            if self._idle:
+                self._stats["reused"] += 1
+                return self._idle.pop()
+            self._stats["opened"] += 1
+        return self._connect()
+    
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._pool_lock:
+            if os.getpid() == self._pid and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+            self._stats["closed"] += 1
         conn.close()
     
+    @contextmanager
+    def connection(self):
+        """Connexion du pool (autocommit), rendue au pool à la sortie
+        
+        Imbriquée dans un autre bloc du même thread, la même connexion est réutilisée.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Transaction d'écriture : validée à la sortie du bloc, annulée sur exception
+        
+        BEGIN IMMEDIATE prend le verrou d'écriture dès le début (attente bornée par
+        busy_timeout) : pas d'échec tardif d'une lecture promue en écriture.
+        Une transaction imbriquée rejoint la transaction englobante.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+    
+    def close(self):
+        """Fermer les connexions inactives du pool"""
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+            self._stats["closed"] += len(idle)
+        for conn in idle:
+            conn.close()
+    
+    def stats(self):
+        """Compteurs du pool pour /health"""
+        with self._pool_lock:
+            return {"pool_size": self.pool_size, "idle": len(self._idle), **self._stats}
+    
+    def schema_version(self, conn):
+        """Dernière migration appliquée (0 pour une base vide)"""
+        try:
+            return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return 0
+    
+    def init_database(self):
+        """Appliquer les migrations manquantes
+        
+        Base à jour : une seule lecture de `schema_version`, aucune écriture.
+        """
+        with self.connection() as conn:
+            if self.schema_version(conn) >= SCHEMA_VERSION:
+                return
+            # Lecteurs et écrivain simultanés ; réglage conservé dans le fichier de la base
+            conn.execute("PRAGMA journal_mode = WAL")
+        
+        with self.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Relu sous le verrou d'écriture : un autre processus a pu migrer entre-temps
+            current = self.schema_version(conn)
+            for version, description, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                             (version, description))
+    
+    def _keyset(self, query, conditions, params, cursor=None, limit=None, column='created_at', id_column='id'):
+        """Lignes de `query` triées par (column, id) décroissants, après `cursor`, au plus `limit` (None = toutes)"""
+        
+        def select(conn, extra, extra_params, limit):
+            where = list(conditions) + extra
+            sql = query + (" WHERE " + " AND ".join(where) if where else "")
+            sql += f" ORDER BY {column} DESC, {id_column} DESC LIMIT ?"
+            return [dict(row) for row in conn.execute(sql, list(params) + extra_params + [-1 if limit is None else limit])]
+        
+        with self.connection() as conn:
+            if cursor is None:
+                return select(conn, [], [], limit)
+            value, row_id = decode_cursor(cursor)
+            if value is None:
+                return select(conn, [f"{column} IS NULL", f"{id_column} < ?"], [row_id], limit)
+            # La comparaison exclut les dates NULL : lues ensuite si la page n'est pas pleine.
+            # Deux requêtes plutôt qu'un OR, qui empêcherait la recherche par intervalle dans l'index
+            rows = select(conn, [f"({column}, {id_column}) < (?, ?)"], [value, row_id], limit)
+            if limit is None or len(rows) < limit:
+                rows += select(conn, [f"{column} IS NULL"], [], None if limit is None else limit - len(rows))
+            return rows
+    
     # ========== GESTION DES UTILISATEURS ==========
     
     def create_user(self, username, password, user_type, email=None, phone=None, region=None):
         """Créer un nouvel utilisateur"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         password_hash = generate_password_hash(password)
         
         try:
-            cursor.execute('''
-                INSERT INTO users (username, email, phone, password_hash, user_type, region)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (username, email, phone, password_hash, user_type, region))
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO users (username, email, phone, password_hash, user_type, region)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (username, email, phone, password_hash, user_type, region))
+                
+                user_id = cursor.lastrowid
+                
+                # Initialiser les points pour la gamification
+                cursor.execute('''
+                    INSERT INTO user_points (user_id, total_points, level)
+                    VALUES (?, 0, 1)
+                ''', (user_id,))
             
-            user_id = cursor.lastrowid
-            conn.commit()
-            
-            # Initialiser les points pour la gamification
-            cursor.execute('''
-                INSERT INTO user_points (user_id, total_points, level)
-                VALUES (?, 0, 1)
-            ''', (user_id,))
-            conn.commit()
-            
-            conn.close()
             return {'success': True, 'user_id': user_id}
         except sqlite3.IntegrityError as e:
-            conn.close()
             return {'success': False, 'error': 'Utilisateur déjà existant'}
         except Exception as e:
-            conn.close()
             return {'success': False, 'error': str(e)}
     
     def authenticate_user(self, identifier, password):
         """Authentifier un utilisateur (par email, phone ou username)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM users 
-            WHERE (email = ? OR phone = ? OR username = ?) AND is_active = 1
-        ''', (identifier, identifier, identifier))
-        
-        user = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM users
+                WHERE (email = ? OR phone = ? OR username = ?) AND is_active = 1
+            ''', (identifier, identifier, identifier))
+            
+            user = cursor.fetchone()
         
         if user and check_password_hash(user['password_hash'], password):
             # Mettre à jour la dernière connexion
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-            ''', (user['id'],))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                conn.execute('''
+                    UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (user['id'],))
             
             return {
                 'success': True,
@@ -274,20 +486,15 @@ class Database:
     
     def enable_2fa(self, user_id):
         """Activer l'authentification à deux facteurs"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Générer un secret pour TOTP
         secret = pyotp.random_base32()
         
-        cursor.execute('''
-            UPDATE users 
-            SET two_factor_secret = ?, two_factor_enabled = 1
-            WHERE id = ?
-        ''', (secret, user_id))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE users
+                SET two_factor_secret = ?, two_factor_enabled = 1
+                WHERE id = ?
+            ''', (secret, user_id))
         
         # Générer le QR code
         totp = pyotp.TOTP(secret)
@@ -313,12 +520,8 @@ class Database:
     
     def verify_2fa(self, user_id, token):
         """Vérifier le code 2FA"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT two_factor_secret FROM users WHERE id = ?', (user_id,))
-        user = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            user = conn.execute('SELECT two_factor_secret FROM users WHERE id = ?', (user_id,)).fetchone()
         
         if not user or not user['two_factor_secret']:
             return {'success': False, 'error': '2FA non activé'}
@@ -331,59 +534,49 @@ class Database:
     
     def generate_reset_token(self, identifier):
         """Générer un token de réinitialisation de mot de passe"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id FROM users 
-            WHERE email = ? OR phone = ? OR username = ?
-        ''', (identifier, identifier, identifier))
-        
-        user = cursor.fetchone()
-        if not user:
-            conn.close()
-            return {'success': False, 'error': 'Utilisateur non trouvé'}
-        
-        # Générer un token sécurisé
-        token = secrets.token_urlsafe(32)
-        expires = datetime.now().timestamp() + 3600  # 1 heure
-        
-        cursor.execute('''
-            UPDATE users 
-            SET reset_token = ?, reset_token_expires = ?
-            WHERE id = ?
-        ''', (token, expires, user['id']))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id FROM users
+                WHERE email = ? OR phone = ? OR username = ?
+            ''', (identifier, identifier, identifier))
+            
+            user = cursor.fetchone()
+            if not user:
+                return {'success': False, 'error': 'Utilisateur non trouvé'}
+            
+            # Générer un token sécurisé
+            token = secrets.token_urlsafe(32)
+            expires = datetime.now().timestamp() + 3600  # 1 heure
+            
+            cursor.execute('''
+                UPDATE users
+                SET reset_token = ?, reset_token_expires = ?
+                WHERE id = ?
+            ''', (token, expires, user['id']))
         
         return {'success': True, 'token': token, 'user_id': user['id']}
     
     def reset_password(self, token, new_password):
         """Réinitialiser le mot de passe avec un token"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id FROM users 
-            WHERE reset_token = ? AND reset_token_expires > ?
-        ''', (token, datetime.now().timestamp()))
-        
-        user = cursor.fetchone()
-        if not user:
-            conn.close()
-            return {'success': False, 'error': 'Token invalide ou expiré'}
-        
         password_hash = generate_password_hash(new_password)
         
-        cursor.execute('''
-            UPDATE users 
-            SET password_hash = ?, reset_token = NULL, reset_token_expires = NULL
-            WHERE id = ?
-        ''', (password_hash, user['id']))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id FROM users
+                WHERE reset_token = ? AND reset_token_expires > ?
+            ''', (token, datetime.now().timestamp()))
+            
+            user = cursor.fetchone()
+            if not user:
+                return {'success': False, 'error': 'Token invalide ou expiré'}
+            
+            cursor.execute('''
+                UPDATE users
+                SET password_hash = ?, reset_token = NULL, reset_token_expires = NULL
+                WHERE id = ?
+            ''', (password_hash, user['id']))
         
         return {'success': True}
     
@@ -391,224 +584,169 @@ class Database:
     
     def create_producer(self, professional_id, name, region, phone=None, email=None, notes=None):
         """Créer un nouveau producteur"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Générer un code unique
         timestamp = int(datetime.now().timestamp())
         random_part = secrets.token_hex(3).upper()
         code = f"PROD-{timestamp}-{random_part}"
         
         try:
-            cursor.execute('''
-                INSERT INTO producers (professional_id, name, code, region, phone, email, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (professional_id, name, code, region, phone, email, notes))
-            
-            producer_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO producers (professional_id, name, code, region, phone, email, notes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (professional_id, name, code, region, phone, email, notes))
+                
+                producer_id = cursor.lastrowid
             
             return {'success': True, 'producer_id': producer_id, 'code': code}
         except Exception as e:
-            conn.close()
             return {'success': False, 'error': str(e)}
     
-    def get_producers_by_professional(self, professional_id):
-        """Récupérer tous les producteurs d'un professionnel"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM producers WHERE professional_id = ? ORDER BY created_at DESC
-        ''', (professional_id,))
-        
-        producers = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return producers
+    def get_producers_by_professional(self, professional_id, limit=None, cursor=None):
+        """Récupérer les producteurs d'un professionnel, les plus récents d'abord"""
+        return self._keyset('SELECT * FROM producers', ['professional_id = ?'], [professional_id], cursor, limit)
     
     # ========== GESTION DES SOUMISSIONS ==========
     
     def save_submission(self, user_id, producer_id=None, submission_data=None):
         """Sauvegarder une soumission de données"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO submissions (
-                producer_id, user_id, age_verger, agroforest, engrais, fumier,
-                maladie, herbicide, insecticide, fongicide, cout_prod, prix_vente,
-                production_reelle, revenu_total, region, pluviometrie, temperature, humidite
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            producer_id, user_id,
-            submission_data.get('age_verger'),
-            submission_data.get('agroforest'),
-            submission_data.get('engrais'),
-            submission_data.get('fumier'),
-            submission_data.get('maladie'),
-            submission_data.get('herbicide'),
-            submission_data.get('insecticide'),
-            submission_data.get('fongicide'),
-            submission_data.get('cout_prod'),
-            submission_data.get('prix_vente'),
-            submission_data.get('production_reelle'),
-            submission_data.get('revenu_total'),
-            submission_data.get('region'),
-            submission_data.get('pluviometrie'),
-            submission_data.get('temperature'),
-            submission_data.get('humidite')
-        ))
-        
-        submission_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO submissions (
+                    producer_id, user_id, age_verger, agroforest, engrais, fumier,
+                    maladie, herbicide, insecticide, fongicide, cout_prod, prix_vente,
+                    production_reelle, revenu_total, region, pluviometrie, temperature, humidite
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                producer_id, user_id,
+                submission_data.get('age_verger'),
+                submission_data.get('agroforest'),
+                submission_data.get('engrais'),
+                submission_data.get('fumier'),
+                submission_data.get('maladie'),
+                submission_data.get('herbicide'),
+                submission_data.get('insecticide'),
+                submission_data.get('fongicide'),
+                submission_data.get('cout_prod'),
+                submission_data.get('prix_vente'),
+                submission_data.get('production_reelle'),
+                submission_data.get('revenu_total'),
+                submission_data.get('region'),
+                submission_data.get('pluviometrie'),
+                submission_data.get('temperature'),
+                submission_data.get('humidite')
+            ))
+            
+            submission_id = cursor.lastrowid
         
         return {'success': True, 'submission_id': submission_id}
     
-    def get_submissions(self, user_id=None, producer_id=None, limit=100):
-        """Récupérer les soumissions"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def get_submissions(self, user_id=None, producer_id=None, limit=100, cursor=None):
+        """Récupérer les soumissions, les plus récentes d'abord"""
         if producer_id:
-            cursor.execute('''
-                SELECT * FROM submissions 
-                WHERE producer_id = ? 
-                ORDER BY date_soumission DESC 
-                LIMIT ?
-            ''', (producer_id, limit))
+            conditions, params = ['producer_id = ?'], [producer_id]
         elif user_id:
-            cursor.execute('''
-                SELECT * FROM submissions 
-                WHERE user_id = ? 
-                ORDER BY date_soumission DESC 
-                LIMIT ?
-            ''', (user_id, limit))
+            conditions, params = ['user_id = ?'], [user_id]
         else:
-            cursor.execute('''
-                SELECT * FROM submissions 
-                ORDER BY date_soumission DESC 
-                LIMIT ?
-            ''', (limit,))
-        
-        submissions = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+            conditions, params = [], []
+        return self._keyset('SELECT * FROM submissions', conditions, params, cursor, limit, column='date_soumission')
+    
+    def iter_submissions(self, user_id=None, producer_id=None, chunk_size=CHUNK_ROWS):
+        """Parcourir les soumissions pour un export : noms des colonnes, puis blocs de `chunk_size` lignes
         
-        return submissions
+        Connexion dédiée, fermée en fin de parcours ou quand le générateur est abandonné
+        (client déconnecté) ; la connexion du pool reste libre pendant l'export.
+        """
+        if producer_id:
+            where, params = 'WHERE producer_id = ?', (producer_id,)
+        elif user_id:
+            where, params = 'WHERE user_id = ?', (user_id,)
+        else:
+            where, params = '', ()
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(f'SELECT * FROM submissions {where} ORDER BY date_soumission DESC, id DESC', params)
+            yield from iter_blocks(cursor, chunk_size)
+        finally:
+            conn.close()
     
     # ========== GESTION DES CONSEILS ==========
     
     def save_advice(self, producer_id, user_id, advice_text, category, advice_type, source):
         """Sauvegarder un conseil donné"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO advice_tracking (producer_id, user_id, advice_text, category, advice_type, source)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (producer_id, user_id, advice_text, category, advice_type, source))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO advice_tracking (producer_id, user_id, advice_text, category, advice_type, source)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (producer_id, user_id, advice_text, category, advice_type, source))
         
         return {'success': True}
     
     def get_advice_stats(self, professional_id=None):
         """Récupérer les statistiques des conseils"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if professional_id:
-            # Récupérer les producteurs du professionnel
-            cursor.execute('SELECT id FROM producers WHERE professional_id = ?', (professional_id,))
-            producer_ids = [row['id'] for row in cursor.fetchall()]
+        with self.connection() as conn:
+            cursor = conn.cursor()
             
-            if not producer_ids:
-                conn.close()
-                return {'by_category': {}, 'by_type': {}, 'by_source': {}, 'total': 0}
+            if professional_id:
+                # Récupérer les producteurs du professionnel
+                cursor.execute('SELECT id FROM producers WHERE professional_id = ?', (professional_id,))
+                producer_ids = [row['id'] for row in cursor.fetchall()]
+                
+                if not producer_ids:
+                    return {'by_category': {}, 'by_type': {}, 'by_source': {}, 'total': 0}
+                
+                placeholders = ','.join('?' * len(producer_ids))
+                cursor.execute(f'''
+                    SELECT category, advice_type, source, COUNT(*) as count
+                    FROM advice_tracking
+                    WHERE producer_id IN ({placeholders})
+                    GROUP BY category, advice_type, source
+                ''', producer_ids)
+            else:
+                cursor.execute('''
+                    SELECT category, advice_type, source, COUNT(*) as count
+                    FROM advice_tracking
+                    GROUP BY category, advice_type, source
+                ''')
             
-            placeholders = ','.join('?' * len(producer_ids))
-            cursor.execute(f'''
-                SELECT category, advice_type, source, COUNT(*) as count
-                FROM advice_tracking
-                WHERE producer_id IN ({placeholders})
-                GROUP BY category, advice_type, source
-            ''', producer_ids)
-        else:
-            cursor.execute('''
-                SELECT category, advice_type, source, COUNT(*) as count
-                FROM advice_tracking
-                GROUP BY category, advice_type, source
-            ''')
+            rows = cursor.fetchall()
         
         stats = {'by_category': {}, 'by_type': {}, 'by_source': {}, 'total': 0}
         
-        for row in cursor.fetchall():
+        for row in rows:
             stats['by_category'][row['category']] = stats['by_category'].get(row['category'], 0) + row['count']
             stats['by_type'][row['advice_type']] = stats['by_type'].get(row['advice_type'], 0) + row['count']
             stats['by_source'][row['source']] = stats['by_source'].get(row['source'], 0) + row['count']
             stats['total'] += row['count']
         
-        conn.close()
         return stats
     
     # ========== GESTION DES NOTIFICATIONS ==========
     
     def create_notification(self, user_id, title, message, notification_type='info'):
         """Créer une notification"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO notifications (user_id, title, message, type)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, title, message, notification_type))
-        
-        notification_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO notifications (user_id, title, message, type)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, title, message, notification_type))
+            
+            notification_id = cursor.lastrowid
         
         return {'success': True, 'notification_id': notification_id}
     
-    def get_notifications(self, user_id, unread_only=False, limit=50):
-        """Récupérer les notifications d'un utilisateur"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if unread_only:
-            cursor.execute('''
-                SELECT * FROM notifications 
-                WHERE user_id = ? AND read = 0
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (user_id, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM notifications 
-                WHERE user_id = ?
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (user_id, limit))
-        
-        notifications = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return notifications
+    def get_notifications(self, user_id, unread_only=False, limit=50, cursor=None):
+        """Récupérer les notifications d'un utilisateur, les plus récentes d'abord"""
+        conditions = ['user_id = ?', 'read = 0'] if unread_only else ['user_id = ?']
+        return self._keyset('SELECT * FROM notifications', conditions, [user_id], cursor, limit)
     
     def mark_notification_read(self, notification_id, user_id):
         """Marquer une notification comme lue"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE notifications SET read = 1 
-            WHERE id = ? AND user_id = ?
-        ''', (notification_id, user_id))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE notifications SET read = 1
+                WHERE id = ? AND user_id = ?
+            ''', (notification_id, user_id))
         
         return {'success': True}
     
@@ -616,232 +754,184 @@ class Database:
     
     def add_points(self, user_id, points, reason=''):
         """Ajouter des points à un utilisateur"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR IGNORE INTO user_points (user_id, total_points, level)
-            VALUES (?, 0, 1)
-        ''', (user_id,))
-        
-        cursor.execute('''
-            UPDATE user_points 
-            SET total_points = total_points + ?, last_updated = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        ''', (points, user_id))
-        
-        # Calculer le niveau (1 point = 1 niveau, max 100)
-        cursor.execute('''
-            UPDATE user_points 
-            SET level = MIN(100, CAST(total_points / 10 AS INTEGER) + 1)
-            WHERE user_id = ?
-        ''', (user_id,))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO user_points (user_id, total_points, level)
+                VALUES (?, 0, 1)
+            ''', (user_id,))
+            
+            cursor.execute('''
+                UPDATE user_points
+                SET total_points = total_points + ?, last_updated = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            ''', (points, user_id))
+            
+            # Calculer le niveau (1 point = 1 niveau, max 100)
+            cursor.execute('''
+                UPDATE user_points
+                SET level = MIN(100, CAST(total_points / 10 AS INTEGER) + 1)
+                WHERE user_id = ?
+            ''', (user_id,))
         
         return {'success': True}
     
     def award_badge(self, user_id, badge_type, badge_name):
         """Attribuer un badge à un utilisateur"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Vérifier si le badge existe déjà
-        cursor.execute('''
-            SELECT id FROM badges 
-            WHERE user_id = ? AND badge_type = ? AND badge_name = ?
-        ''', (user_id, badge_type, badge_name))
-        
-        if cursor.fetchone():
-            conn.close()
-            return {'success': False, 'error': 'Badge déjà obtenu'}
-        
-        cursor.execute('''
-            INSERT INTO badges (user_id, badge_type, badge_name)
-            VALUES (?, ?, ?)
-        ''', (user_id, badge_type, badge_name))
-        
-        badge_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Vérifier si le badge existe déjà
+            cursor.execute('''
+                SELECT id FROM badges
+                WHERE user_id = ? AND badge_type = ? AND badge_name = ?
+            ''', (user_id, badge_type, badge_name))
+            
+            if cursor.fetchone():
+                return {'success': False, 'error': 'Badge déjà obtenu'}
+            
+            cursor.execute('''
+                INSERT INTO badges (user_id, badge_type, badge_name)
+                VALUES (?, ?, ?)
+            ''', (user_id, badge_type, badge_name))
+            
+            badge_id = cursor.lastrowid
         
         return {'success': True, 'badge_id': badge_id}
     
     def get_user_badges(self, user_id):
         """Récupérer les badges d'un utilisateur"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM badges 
-            WHERE user_id = ? 
-            ORDER BY earned_at DESC
-        ''', (user_id,))
-        
-        badges = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return badges
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM badges
+                WHERE user_id = ?
+                ORDER BY earned_at DESC
+            ''', (user_id,))
+            
+            return [dict(row) for row in cursor.fetchall()]
     
     def get_leaderboard(self, limit=10):
         """Récupérer le classement des utilisateurs"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT u.id, u.username, u.user_type, up.total_points, up.level
-            FROM user_points up
-            JOIN users u ON up.user_id = u.id
-            WHERE u.is_active = 1
-            ORDER BY up.total_points DESC
-            LIMIT ?
-        ''', (limit,))
-        
-        leaderboard = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return leaderboard
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT u.id, u.username, u.user_type, up.total_points, up.level
+                FROM user_points up
+                JOIN users u ON up.user_id = u.id
+                WHERE u.is_active = 1
+                ORDER BY up.total_points DESC
+                LIMIT ?
+            ''', (limit,))
+            
+            return [dict(row) for row in cursor.fetchall()]
     
     # ========== MESSAGERIE ==========
     
     def send_message(self, sender_id, receiver_id, subject, content):
         """Envoyer un message"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO messages (sender_id, receiver_id, subject, content)
-            VALUES (?, ?, ?, ?)
-        ''', (sender_id, receiver_id, subject, content))
-        
-        message_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO messages (sender_id, receiver_id, subject, content)
+                VALUES (?, ?, ?, ?)
+            ''', (sender_id, receiver_id, subject, content))
+            
+            message_id = cursor.lastrowid
         
         return {'success': True, 'message_id': message_id}
     
-    def get_messages(self, user_id, folder='inbox'):
-        """Récupérer les messages (inbox ou sent)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def get_messages(self, user_id, folder='inbox', limit=None, cursor=None):
+        """Récupérer les messages (inbox ou sent), les plus récents d'abord"""
         if folder == 'inbox':
-            cursor.execute('''
-                SELECT m.*, u.username as sender_name
-                FROM messages m
-                JOIN users u ON m.sender_id = u.id
-                WHERE m.receiver_id = ?
-                ORDER BY m.created_at DESC
-            ''', (user_id,))
+            query = 'SELECT m.*, u.username as sender_name FROM messages m JOIN users u ON m.sender_id = u.id'
+            conditions = ['m.receiver_id = ?']
         else:  # sent
-            cursor.execute('''
-                SELECT m.*, u.username as receiver_name
-                FROM messages m
-                JOIN users u ON m.receiver_id = u.id
-                WHERE m.sender_id = ?
-                ORDER BY m.created_at DESC
-            ''', (user_id,))
-        
-        messages = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return messages
+            query = 'SELECT m.*, u.username as receiver_name FROM messages m JOIN users u ON m.receiver_id = u.id'
+            conditions = ['m.sender_id = ?']
+        return self._keyset(query, conditions, [user_id], cursor, limit, column='m.created_at', id_column='m.id')
     
     def get_unread_count(self, user_id):
         """Récupérer le nombre de messages non lus"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) as count FROM messages 
-            WHERE receiver_id = ? AND read = 0
-        ''', (user_id,))
-        
-        count = cursor.fetchone()['count']
-        conn.close()
-        
-        return count
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT COUNT(*) as count FROM messages
+                WHERE receiver_id = ? AND read = 0
+            ''', (user_id,))
+            
+            return cursor.fetchone()['count']
     
     # ========== LOCALISATION ==========
     
     def save_location(self, user_id, producer_id, latitude, longitude, address=None, region=None):
         """Sauvegarder une localisation"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO locations (producer_id, user_id, latitude, longitude, address, region)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (producer_id, user_id, latitude, longitude, address, region))
-        
-        location_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO locations (producer_id, user_id, latitude, longitude, address, region)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (producer_id, user_id, latitude, longitude, address, region))
+            
+            location_id = cursor.lastrowid
         
         return {'success': True, 'location_id': location_id}
     
-    def get_locations(self, user_id=None, producer_id=None):
-        """Récupérer les localisations"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def get_locations(self, user_id=None, producer_id=None, limit=None, cursor=None):
+        """Récupérer les localisations, les plus récentes d'abord"""
         if producer_id:
-            cursor.execute('''
-                SELECT * FROM locations WHERE producer_id = ?
-            ''', (producer_id,))
+            conditions, params = ['producer_id = ?'], [producer_id]
         elif user_id:
-            cursor.execute('''
-                SELECT * FROM locations WHERE user_id = ?
-            ''', (user_id,))
+            conditions, params = ['user_id = ?'], [user_id]
         else:
-            cursor.execute('SELECT * FROM locations')
-        
-        locations = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return locations
+            conditions, params = [], []
+        return self._keyset('SELECT * FROM locations', conditions, params, cursor, limit)
     
     # ========== MÉTÉO ==========
     
-    def cache_weather(self, region, latitude, longitude, temperature, humidity, precipitation, forecast_data):
-        """Mettre en cache les données météo"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        expires_at = datetime.now().timestamp() + 3600  # 1 heure
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO weather_cache 
-            (region, latitude, longitude, temperature, humidity, precipitation, forecast_data, expires_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (region, latitude, longitude, temperature, humidity, precipitation, json.dumps(forecast_data), expires_at))
-        
-        conn.commit()
-        conn.close()
-        
-        return {'success': True}
+    def cache_weather(self, region, latitude, longitude, temperature, humidity, precipitation, forecast_data,
+                      ttl=3600):
+        """Mettre en cache les données météo (une ligne par région, remplacée à chaque appel)"""
+        expires_at = datetime.now().timestamp() + ttl
+        
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO weather_cache
+                (region, latitude, longitude, temperature, humidity, precipitation, forecast_data, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (region) DO UPDATE SET
+                    latitude = excluded.latitude, longitude = excluded.longitude,
+                    temperature = excluded.temperature, humidity = excluded.humidity,
+                    precipitation = excluded.precipitation, forecast_data = excluded.forecast_data,
+                    cached_at = CURRENT_TIMESTAMP, expires_at = excluded.expires_at
+            ''', (region, latitude, longitude, temperature, humidity, precipitation, json.dumps(forecast_data), expires_at))
+        
+        return {'success': True, 'expires_at': expires_at}
+    
+    def get_weather_entry(self, region):
+        """Données météo d'une région et leur date d'expiration, même expirées, ou None"""
+        with self.connection() as conn:
+            weather = conn.execute('''
+                SELECT temperature, humidity, precipitation, forecast_data, expires_at
+                FROM weather_cache WHERE region = ?
+            ''', (region,)).fetchone()
+        
+        if weather is None:
+            return None
+        
+        data = {
+            'temperature': weather['temperature'],
+            'humidity': weather['humidity'],
+            'precipitation': weather['precipitation'],
+            'forecast': json.loads(weather['forecast_data'])
+        }
+        return data, weather['expires_at']
     
     def get_cached_weather(self, region):
         """Récupérer les données météo en cache"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM weather_cache 
-            WHERE region = ? AND expires_at > ?
-        ''', (region, datetime.now().timestamp()))
-        
-        weather = cursor.fetchone()
-        conn.close()
-        
-        if weather:
-            return {
-                'temperature': weather['temperature'],
-                'humidity': weather['humidity'],
-                'precipitation': weather['precipitation'],
-                'forecast': json.loads(weather['forecast_data'])
-            }
+        entry = self.get_weather_entry(region)
+        if entry is not None and entry[1] > datetime.now().timestamp():
+            return entry[0]
         
         return None
-
+    
+    def evict_weather(self, before):
+        """Supprimer les données météo expirées avant le timestamp `before`, retourne le nombre de lignes"""
+        with self.transaction() as conn:
+            return conn.execute('DELETE FROM weather_cache WHERE expires_at <= ?', (before,)).rowcount
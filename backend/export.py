@@ -0,0 +1,61 @@
+"""
+Export en continu pour Mon Cacao
+Les lignes sont lues par blocs (`fetchmany`) et converties en morceaux CSV ou NDJSON
+au fil de l'eau : la mémoire utilisée ne dépend pas du nombre de lignes exportées
+"""
+import csv
+import io
+import json
+import zlib
+
+# Lignes lues par appel à fetchmany
+CHUNK_ROWS = 1000
+
+
+def iter_blocks(cursor, chunk_size=CHUNK_ROWS):
+    """Noms des colonnes d'un curseur exécuté, puis ses lignes par blocs de `chunk_size`"""
+    yield [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def csv_chunks(blocks):
+    """En-tête puis un morceau CSV (UTF-8) par bloc de lignes"""
+    blocks = iter(blocks)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(next(blocks))
+    for rows in blocks:
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+    yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(blocks):
+    """Un objet JSON par ligne, un morceau par bloc de lignes"""
+    blocks = iter(blocks)
+    columns = next(blocks)
+    for rows in blocks:
+        yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """Compresser un flux de morceaux au format gzip sans le rassembler en mémoire"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Format -> (convertisseur, type MIME, extension)
+FORMATS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8", "csv"),
+    "ndjson": (ndjson_chunks, "application/x-ndjson", "ndjson"),
+}
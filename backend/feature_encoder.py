@@ -0,0 +1,171 @@
+"""
+Encodeur de caractéristiques compilé pour Mon Cacao
+Reproduit le préprocesseur sklearn (SimpleImputer + StandardScaler + OneHotEncoder
+ou OrdinalEncoder) avec NumPy seul, sans DataFrame, pour le chemin critique des prédictions
+"""
+import math
+import threading
+
+import numpy as np
+
+
+class CompiledEncoder:
+    """Version compilée de l'étape `prep` du pipeline entraîné par train_model.py
+
+    Les paramètres (médianes, moyennes, écarts-types, vocabulaires) sont extraits
+    une fois au chargement ; chaque prédiction écrit ensuite directement dans une
+    ligne NumPy préallouée. La sortie est identique bit à bit à `prep.transform`.
+
+    `encoding="onehot"` : une colonne par modalité ; `encoding="ordinal"` : une
+    colonne par variable contenant le code de la modalité (NaN si inconnue), pour
+    les modèles XGBoost à catégories natives.
+    """
+
+    def __init__(self, numeric_features, medians, means, scales, categorical_features, categories,
+                 encoding="onehot"):
+        if encoding not in ("onehot", "ordinal"):
+            raise ValueError(f"Encodage catégoriel non supporté: {encoding}")
+        self.numeric_features = list(numeric_features)
+        self.medians = np.asarray(medians, dtype=np.float64)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.categorical_features = list(categorical_features)
+        self.categories = [list(cats) for cats in categories]
+        self.encoding = encoding
+
+        # Position de chaque modalité dans la ligne encodée (one-hot),
+        # ou code de chaque modalité dans la colonne de sa variable (ordinal)
+        self.offsets = []
+        self.vocabularies = []
+        offset = len(self.numeric_features)
+        for cats in self.categories:
+            self.offsets.append(offset)
+            if encoding == "ordinal":
+                self.vocabularies.append({cat: float(i) for i, cat in enumerate(cats)})
+                offset += 1
+            else:
+                self.vocabularies.append({cat: offset + i for i, cat in enumerate(cats)})
+                offset += len(cats)
+        self.n_features_out = offset
+
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, prep):
+        """Extraire les paramètres du ColumnTransformer `prep` ajusté"""
+        transformers = {name: (steps, columns) for name, steps, columns in prep.transformers_}
+        if set(transformers) - {'num', 'cat', 'remainder'} or prep.remainder != 'drop':
+            raise ValueError("Préprocesseur non supporté par l'encodeur compilé")
+
+        num_steps, numeric_features = transformers['num']
+        imputer = num_steps.named_steps['imputer']
+        scaler = num_steps.named_steps['scaler']
+        if imputer.strategy != 'median':
+            raise ValueError(f"Stratégie d'imputation numérique non supportée: {imputer.strategy}")
+        n_num = len(numeric_features)
+        means = scaler.mean_ if scaler.with_mean else np.zeros(n_num)
+        scales = scaler.scale_ if scaler.with_std else np.ones(n_num)
+
+        cat_steps, categorical_features = transformers['cat']
+        if 'ordinal' in cat_steps.named_steps:
+            ordinal = cat_steps.named_steps['ordinal']
+            if ordinal.handle_unknown != 'use_encoded_value' or not np.isnan(ordinal.unknown_value):
+                raise ValueError("OrdinalEncoder non supporté (modalité inconnue non codée NaN)")
+            return cls(numeric_features, imputer.statistics_, means, scales,
+                       categorical_features, ordinal.categories_, encoding="ordinal")
+
+        onehot = cat_steps.named_steps['onehot']
+        if onehot.drop is not None or onehot.handle_unknown != 'ignore':
+            raise ValueError("OneHotEncoder non supporté (drop ou handle_unknown différent de 'ignore')")
+
+        return cls(numeric_features, imputer.statistics_, means, scales,
+                   categorical_features, onehot.categories_)
+
+    def to_dict(self):
+        """Paramètres sérialisables en JSON"""
+        return {
+            'numeric_features': self.numeric_features,
+            'medians': self.medians.tolist(),
+            'means': self.means.tolist(),
+            'scales': self.scales.tolist(),
+            'categorical_features': self.categorical_features,
+            'categories': self.categories,
+            'encoding': self.encoding,
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(params['numeric_features'], params['medians'], params['means'], params['scales'],
+                   params['categorical_features'], params['categories'], params.get('encoding', 'onehot'))
+
+    def _row_buffer(self):
+        """Ligne préallouée propre à chaque thread du serveur"""
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = np.zeros((1, self.n_features_out), dtype=np.float64)
+            self._local.row = row
+        return row
+
+    def _fill_row(self, row, features):
+        row[:] = 0.0
+        for j, name in enumerate(self.numeric_features):
+            value = features.get(name)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                value = self.medians[j]
+            row[j] = (float(value) - self.means[j]) / self.scales[j]
+        if self.encoding == "ordinal":
+            # Modalité inconnue ou manquante : NaN, traité comme valeur manquante par XGBoost
+            for offset, name, vocabulary in zip(self.offsets, self.categorical_features, self.vocabularies):
+                row[offset] = vocabulary.get(features.get(name), np.nan)
+            return
+        # Modalité inconnue ou manquante : toutes les colonnes restent à 0 (handle_unknown='ignore')
+        for name, vocabulary in zip(self.categorical_features, self.vocabularies):
+            index = vocabulary.get(features.get(name))
+            if index is not None:
+                row[index] = 1.0
+
+    def transform_record(self, features):
+        """Encoder une exploitation (dict indexé par les noms de colonnes du modèle)
+
+        Retourne la ligne préallouée du thread courant : elle est réécrite à
+        l'appel suivant, à copier si elle doit être conservée.
+        """
+        row = self._row_buffer()
+        self._fill_row(row[0], features)
+        return row
+
+    def transform_records(self, records):
+        """Encoder plusieurs exploitations dans une matrice (n, n_features_out)"""
+        X = np.zeros((len(records), self.n_features_out), dtype=np.float64)
+        for i, features in enumerate(records):
+            self._fill_row(X[i], features)
+        return X
+
+    def transform_columns(self, columns, n_rows):
+        """Encoder des colonnes entières (tableaux NumPy ou scalaires diffusés à n_rows lignes)"""
+        X = np.zeros((n_rows, self.n_features_out), dtype=np.float64)
+        for j, name in enumerate(self.numeric_features):
+            values = np.broadcast_to(np.asarray(columns.get(name), dtype=np.float64), (n_rows,))
+            values = np.where(np.isnan(values), self.medians[j], values)
+            X[:, j] = (values - self.means[j]) / self.scales[j]
+        if self.encoding == "ordinal":
+            for offset, name, vocabulary in zip(self.offsets, self.categorical_features, self.vocabularies):
+                column = columns.get(name)
+                if np.ndim(column) == 0:
+                    X[:, offset] = vocabulary.get(column, np.nan)
+                else:
+                    X[:, offset] = np.fromiter((vocabulary.get(v, np.nan) for v in column),
+                                               dtype=np.float64, count=n_rows)
+            return X
+        rows = np.arange(n_rows)
+        for name, vocabulary in zip(self.categorical_features, self.vocabularies):
+            column = columns.get(name)
+            if np.ndim(column) == 0:
+                index = vocabulary.get(column)
+                if index is not None:
+                    X[:, index] = 1.0
+                continue
+            indices = np.fromiter((vocabulary.get(v, -1) for v in column), dtype=np.int64, count=n_rows)
+            known = indices >= 0
+            X[rows[known], indices[known]] = 1.0
+        return X
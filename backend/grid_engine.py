@@ -0,0 +1,189 @@
+"""
+Moteur d'inférence par grille de seuils pour Mon Cacao
+Compile le modèle XGBoost en tables constantes par morceaux : une prédiction
+devient deux recherches dichotomiques et une lecture de tableau
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from xgb_trees import booster_trees
+
+
+class ThresholdGridEngine:
+    """Table de prédictions exacte indexée par (modalités, cellule numérique)
+
+    Le modèle n'a que deux entrées numériques : pour une combinaison fixée des
+    colonnes one-hot, chaque arbre ne compare ces deux colonnes qu'à un ensemble
+    fini de seuils. Entre deux seuils consécutifs la prédiction est constante ; il
+    suffit donc de l'évaluer une fois par cellule de la grille.
+
+    Les ~17k combinaisons de modalités multipliées par ~240 x 240 cellules ne
+    tiennent pas en mémoire : chaque combinaison a sa propre table, limitée aux
+    seuils atteignables avec ces modalités, compilée à la première rencontre puis
+    gardée dans un cache LRU de `max_slabs` tables.
+    """
+
+    def __init__(self, regressor, n_numeric, max_slabs=4096):
+        self.regressor = regressor
+        self.n_numeric = n_numeric
+        self.max_slabs = max_slabs
+
+        parsed = booster_trees(regressor)
+        self.n_features = parsed['num_feature']
+        # Listes Python : le parcours nœud par nœud est plus rapide qu'avec des scalaires NumPy
+        self.trees = [
+            (t['left'].tolist(), t['right'].tolist(), t['feature'].tolist(),
+             t['value'].astype(np.float64).tolist(), t['is_leaf'].tolist())
+            for t in parsed['trees']
+        ]
+
+        # Seuils de tous les arbres : une seule recherche dichotomique par colonne numérique,
+        # chaque table traduit ensuite la cellule globale en sa propre cellule
+        self.global_thresholds = self._reachable_thresholds(None)
+
+        self._slabs = OrderedDict()
+        self._lock = threading.Lock()
+        self.compiled = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_pipeline(cls, pipeline, n_numeric=None, max_slabs=4096):
+        """Construire le moteur depuis le pipeline sklearn (étapes `prep` et `model`)"""
+        if n_numeric is None:
+            transformers = {name: columns for name, _, columns in pipeline.named_steps["prep"].transformers_}
+            n_numeric = len(transformers['num'])
+        return cls(pipeline.named_steps["model"], n_numeric, max_slabs=max_slabs)
+
+    # ----- Compilation -----
+
+    def _reachable_thresholds(self, active):
+        """Seuils numériques atteignables quand les colonnes one-hot `active` valent 1
+
+        Avec `active=None`, toutes les branches sont explorées.
+        """
+        thresholds = [set() for _ in range(self.n_numeric)]
+        for left, right, feature, value, is_leaf in self.trees:
+            stack = [0]
+            while stack:
+                node = stack.pop()
+                if is_leaf[node]:
+                    continue
+                f = feature[node]
+                if f < self.n_numeric or active is None:
+                    if f < self.n_numeric:
+                        thresholds[f].add(value[node])
+                    stack.append(left[node])
+                    stack.append(right[node])
+                else:
+                    # Même comparaison qu'XGBoost : x < seuil -> gauche (0 et 1 sont exacts en float32)
+                    x = 1.0 if f in active else 0.0
+                    stack.append(left[node] if x < value[node] else right[node])
+        return [np.array(sorted(t), dtype=np.float32) for t in thresholds]
+
+    @staticmethod
+    def _representatives(thresholds):
+        """Une valeur par cellule : sous le premier seuil, puis chaque seuil lui-même"""
+        if len(thresholds) == 0:
+            return np.zeros(1, dtype=np.float32)
+        below = np.nextafter(thresholds[0], np.float32(-np.inf))
+        return np.concatenate([[below], thresholds]).astype(np.float32)
+
+    def _compile(self, keys):
+        """Compiler les tables de plusieurs combinaisons en un seul appel au modèle"""
+        slabs, blocks = [], []
+        for key in keys:
+            onehot = np.unpackbits(np.frombuffer(key, dtype=np.uint8))[:self.n_features - self.n_numeric]
+            active = set((np.flatnonzero(onehot) + self.n_numeric).tolist())
+            thresholds = self._reachable_thresholds(active)
+            grids = np.meshgrid(*[self._representatives(t) for t in thresholds], indexing='ij')
+            block = np.zeros((grids[0].size, self.n_features), dtype=np.float32)
+            for j, grid in enumerate(grids):
+                block[:, j] = grid.ravel()
+            block[:, self.n_numeric:] = onehot
+            # Cellule globale -> cellule de cette table (ses seuils sont un sous-ensemble des seuils globaux)
+            cell_maps = tuple(
+                np.searchsorted(t, self._representatives(g), side='right').astype(np.intp)
+                for t, g in zip(thresholds, self.global_thresholds))
+            slabs.append((cell_maps, grids[0].shape))
+            blocks.append(block)
+
+        predictions = self.regressor.predict(np.vstack(blocks))
+        start = 0
+        compiled = {}
+        for key, (cell_maps, shape) in zip(keys, slabs):
+            size = int(np.prod(shape))
+            compiled[key] = (cell_maps, predictions[start:start + size].reshape(shape))
+            start += size
+        return compiled
+
+    def _get_slabs(self, keys):
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                slab = self._slabs.get(key)
+                if slab is None:
+                    missing.append(key)
+                else:
+                    self._slabs.move_to_end(key)
+                    found[key] = slab
+        if missing:
+            compiled = self._compile(missing)
+            found.update(compiled)
+            with self._lock:
+                self.compiled += len(compiled)
+                self._slabs.update(compiled)
+                while len(self._slabs) > self.max_slabs:
+                    self._slabs.popitem(last=False)
+                    self.evictions += 1
+        return found
+
+    def warm(self, X):
+        """Précompiler les tables des combinaisons présentes dans X"""
+        keys = np.unique(self._combination_keys(X), axis=0)
+        self._get_slabs([k.tobytes() for k in keys])
+
+    # ----- Prédiction -----
+
+    def _combination_keys(self, X):
+        return np.packbits(X[:, self.n_numeric:] > 0.5, axis=1)
+
+    def predict(self, X):
+        """Prédire à partir de la matrice encodée (même entrée que XGBRegressor.predict)"""
+        X = np.asarray(X)
+        # XGBoost compare en float32 : on recherche la cellule sur la valeur convertie
+        numeric = X[:, :self.n_numeric].astype(np.float32)
+        global_cells = [np.searchsorted(t, numeric[:, j], side='right')
+                        for j, t in enumerate(self.global_thresholds)]
+
+        if len(X) == 1:
+            # Chemin /predict : une seule table, indexation scalaire
+            key = self._combination_keys(X)[0].tobytes()
+            cell_maps, table = self._get_slabs([key])[key]
+            cells = tuple(int(cell_map[cells[0]]) for cell_map, cells in zip(cell_maps, global_cells))
+            return np.array([table[cells]], dtype=np.float32)
+
+        groups = {}
+        for i, key in enumerate(self._combination_keys(X)):
+            groups.setdefault(key.tobytes(), []).append(i)
+        slabs = self._get_slabs(list(groups))
+
+        out = np.empty(len(X), dtype=np.float32)
+        for key, rows in groups.items():
+            cell_maps, table = slabs[key]
+            cells = tuple(cell_map[cells[rows]] for cell_map, cells in zip(cell_maps, global_cells))
+            out[rows] = table[cells]
+        return out
+
+    def stats(self):
+        with self._lock:
+            cells = sum(table.size for _, table in self._slabs.values())
+            return {
+                "slabs": len(self._slabs),
+                "max_slabs": self.max_slabs,
+                "cells": cells,
+                "memory_bytes": cells * 4,
+                "compiled": self.compiled,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,175 @@
+"""
+Runtime d'inférence allégé pour Mon Cacao
+Évalue le modèle exporté (paramètres du préprocesseur + arbres du booster) avec
+NumPy seul : ni xgboost, ni sklearn, ni pandas ne sont importés pour servir /predict
+
+Export : python lite_runtime.py [--model model_productivite_xgb.pkl] [--output ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from feature_encoder import CompiledEncoder
+
+FORMAT_VERSION = 1
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.pkl")
+LITE_MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.lite.npz")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TreeEnsemble:
+    """Arbres concaténés dans des tableaux plats, évalués pour toutes les lignes à la fois"""
+
+    def __init__(self, left, right, feature, value, default_left, tree_offsets, base_score):
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.tree_offsets = np.asarray(tree_offsets, dtype=np.int32)
+        self.base_score = np.float32(base_score)
+        self.is_leaf = self.left == -1
+
+        # Indices d'enfants globaux (les tableaux exportés sont locaux à chaque arbre)
+        tree_of_node = np.repeat(np.arange(len(self.tree_offsets) - 1), np.diff(self.tree_offsets))
+        start = self.tree_offsets[tree_of_node]
+        self._left = np.where(self.is_leaf, np.arange(len(self.left)), self.left + start).astype(np.intp)
+        self._right = np.where(self.is_leaf, np.arange(len(self.left)), self.right + start).astype(np.intp)
+        self._feature = np.where(self.is_leaf, 0, self.feature).astype(np.intp)
+        self.roots = self.tree_offsets[:-1].astype(np.intp)
+        self.max_depth = self._depth()
+
+    @classmethod
+    def from_trees(cls, parsed):
+        """Depuis le résultat de xgb_trees.parse_booster_json"""
+        trees = parsed['trees']
+        offsets = np.cumsum([0] + [len(t['left']) for t in trees])
+        cat = lambda key: np.concatenate([t[key] for t in trees])
+        return cls(cat('left'), cat('right'), cat('feature'), cat('value'), cat('default_left'),
+                   offsets, parsed['base_score'])
+
+    def _depth(self):
+        depth = np.zeros(len(self.left), dtype=np.int32)
+        nodes = self.roots
+        level = 0
+        while len(nodes):
+            depth[nodes] = level
+            inner = nodes[~self.is_leaf[nodes]]
+            nodes = np.concatenate([self._left[inner], self._right[inner]])
+            level += 1
+        return int(depth.max()) if len(depth) else 0
+
+    def predict(self, X):
+        """Somme des feuilles atteintes, accumulée arbre par arbre en float32 comme XGBoost"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self._feature[nodes]]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.value[nodes])
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+        # cumsum est séquentiel : même ordre d'addition que le prédicteur XGBoost
+        terms = np.empty((len(X), len(self.roots) + 1), dtype=np.float32)
+        terms[:, 0] = self.base_score
+        terms[:, 1:] = self.value[nodes]
+        return np.cumsum(terms, axis=1, dtype=np.float32)[:, -1]
+
+    def arrays(self):
+        return {
+            'left': self.left, 'right': self.right, 'feature': self.feature, 'value': self.value,
+            'default_left': self.default_left, 'tree_offsets': self.tree_offsets,
+        }
+
+
+class LiteModel:
+    """Modèle exporté : encodeur compilé + ensemble d'arbres"""
+
+    def __init__(self, encoder, trees, metadata=None):
+        self.encoder = encoder
+        self.trees = trees
+        self.metadata = metadata or {}
+
+    @property
+    def version(self):
+        return self.metadata.get('model_version')
+
+    @property
+    def calibration(self):
+        return self.metadata.get('calibration')
+
+    @classmethod
+    def load(cls, path=LITE_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Version de format non supportée: {metadata.get('format_version')}")
+            trees = TreeEnsemble(data['left'], data['right'], data['feature'], data['value'],
+                                 data['default_left'], data['tree_offsets'], metadata['base_score'])
+        encoder = CompiledEncoder.from_dict(metadata['encoder'])
+        return cls(encoder, trees, metadata)
+
+    def is_stale(self, source_path=MODEL_PATH):
+        """Vrai si le modèle pickle source a changé depuis l'export"""
+        return self.metadata.get('source_sha256') != file_sha256(source_path)
+
+    def predict(self, X):
+        """Même interface que XGBRegressor.predict sur la matrice encodée"""
+        return self.trees.predict(X)
+
+    def predict_records(self, feature_rows):
+        return self.trees.predict(self.encoder.transform_records(feature_rows))
+
+    def stats(self):
+        return {
+            "trees": len(self.trees.roots),
+            "nodes": len(self.trees.left),
+            "max_depth": self.trees.max_depth,
+        }
+
+
+def export_pipeline(pipeline, output_path=LITE_MODEL_PATH, source_path=None):
+    """Exporter le pipeline sklearn (étapes `prep` et `model`) au format allégé"""
+    from xgb_trees import booster_trees
+
+    encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+    parsed = booster_trees(pipeline.named_steps["model"])
+    trees = TreeEnsemble.from_trees(parsed)
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'base_score': parsed['base_score'],
+        'num_feature': parsed['num_feature'],
+        'encoder': encoder.to_dict(),
+        'calibration': getattr(pipeline, 'calibration_', None),
+    }
+    if source_path:
+        metadata['source_sha256'] = file_sha256(source_path)
+        metadata['model_version'] = metadata['source_sha256'][:12]
+    np.savez(output_path, metadata=np.array(json.dumps(metadata, ensure_ascii=False)), **trees.arrays())
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export du modèle au format allégé")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", default=LITE_MODEL_PATH)
+    args = parser.parse_args()
+
+    import joblib
+    pipeline = joblib.load(args.model)
+    export_pipeline(pipeline, args.output, source_path=args.model)
+    print(f"✅ Modèle allégé exporté dans {args.output} ({os.path.getsize(args.output) / 1024:.0f} Ko)")
+
+
+if __name__ == "__main__":
+    main()
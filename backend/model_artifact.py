@@ -0,0 +1,161 @@
+"""
+Format d'artefact du modèle Mon Cacao, sans pickle
+Un répertoire `<modèle>.model/` versionné :
+
+  artifact.json   métadonnées : format, version, colonnes d'entrée, paramètres de
+                  l'encodeur compilé, calibration, empreintes des fichiers
+  booster.ubj     booster XGBoost au format UBJSON (XGBRegressor.save_model)
+  trees/*.npy     arbres à plat pour le runtime allégé, lus en mémoire partagée (mmap)
+
+Export : python model_artifact.py [--model model_productivite_xgb.pkl] [--output ...]
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+from feature_encoder import CompiledEncoder
+from lite_runtime import LiteModel, TreeEnsemble, file_sha256
+
+FORMAT_NAME = "mon-cacao-model"
+FORMAT_VERSION = 1
+METADATA_NAME = "artifact.json"
+BOOSTER_NAME = "booster.ubj"
+TREE_ARRAYS = ('left', 'right', 'feature', 'value', 'default_left', 'tree_offsets')
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.pkl")
+
+
+def artifact_path_for(model_path):
+    """Artefact associé à un pickle : même nom, extension .model"""
+    return os.path.splitext(model_path)[0] + ".model"
+
+
+def export_artifact(pipeline, output_path, source_path=None):
+    """Écrire l'artefact du pipeline sklearn (étapes `prep` et `model`)
+
+    Écrit dans un répertoire temporaire puis renommé : un lecteur ne voit jamais
+    d'artefact incomplet.
+    """
+    from xgb_trees import booster_trees
+
+    encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+    regressor = pipeline.named_steps["model"]
+    tmp_path = output_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    regressor.save_model(os.path.join(tmp_path, BOOSTER_NAME))
+    files = [BOOSTER_NAME]
+    metadata = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec="seconds"),
+        'feature_names': [str(name) for name in pipeline.named_steps["prep"].feature_names_in_],
+        'encoder': encoder.to_dict(),
+        'calibration': getattr(pipeline, 'calibration_', None),
+        'xgboost_version': __import__('xgboost').__version__,
+    }
+    try:
+        parsed = booster_trees(regressor)
+        trees = TreeEnsemble.from_trees(parsed)
+        os.makedirs(os.path.join(tmp_path, "trees"))
+        for name, array in trees.arrays().items():
+            np.save(os.path.join(tmp_path, "trees", f"{name}.npy"), array)
+            files.append(f"trees/{name}.npy")
+        metadata['base_score'] = parsed['base_score']
+    except ValueError as e:
+        # Catégories natives : pas d'arbres à plat, le moteur lite se replie sur XGBoost
+        print(f"⚠️ Arbres à plat non exportés ({e}).")
+
+    metadata['files'] = {name: file_sha256(os.path.join(tmp_path, name)) for name in files}
+    if source_path:
+        metadata['source_sha256'] = file_sha256(source_path)
+        metadata['model_version'] = metadata['source_sha256'][:12]
+    with open(os.path.join(tmp_path, METADATA_NAME), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    if os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class ModelArtifact:
+    """Artefact chargé : métadonnées et encodeur tout de suite, booster ou arbres à la demande"""
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = metadata
+        self.encoder = CompiledEncoder.from_dict(metadata['encoder'])
+
+    @classmethod
+    def load(cls, path, feature_names=None, verify=False):
+        """Lire artifact.json et contrôler le format et le schéma d'entrée
+
+        `feature_names` : colonnes attendues par l'API (celles de /model-info), dans
+        l'ordre. `verify` recalcule les empreintes de tous les fichiers.
+        """
+        with open(os.path.join(path, METADATA_NAME), encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('format') != FORMAT_NAME or metadata.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Format d'artefact non supporté: {metadata.get('format')} "
+                             f"v{metadata.get('format_version')}")
+        if feature_names is not None and metadata['feature_names'] != list(feature_names):
+            raise ValueError(f"Colonnes de l'artefact inattendues: {metadata['feature_names']}")
+        encoder = metadata['encoder']
+        if sorted(encoder['numeric_features'] + encoder['categorical_features']) != sorted(metadata['feature_names']):
+            raise ValueError("Colonnes de l'encodeur incohérentes avec feature_names")
+        if verify:
+            for name, digest in metadata['files'].items():
+                if file_sha256(os.path.join(path, name)) != digest:
+                    raise ValueError(f"Empreinte invalide: {name}")
+        return cls(path, metadata)
+
+    @property
+    def version(self):
+        return self.metadata.get('model_version')
+
+    @property
+    def calibration(self):
+        return self.metadata.get('calibration')
+
+    @property
+    def has_trees(self):
+        return 'base_score' in self.metadata
+
+    def regressor(self, n_threads=None):
+        """XGBRegressor rechargé depuis le booster UBJSON (importe xgboost)"""
+        from xgboost import XGBRegressor
+
+        regressor = XGBRegressor(n_jobs=n_threads)
+        regressor.load_model(os.path.join(self.path, BOOSTER_NAME))
+        return regressor
+
+    def lite_model(self):
+        """Runtime NumPy sur les arbres projetés en mémoire (partagés entre processus)"""
+        if not self.has_trees:
+            raise ValueError("Artefact sans arbres à plat (catégories natives)")
+        arrays = {name: np.load(os.path.join(self.path, "trees", f"{name}.npy"), mmap_mode='r')
+                  for name in TREE_ARRAYS}
+        return LiteModel(self.encoder, TreeEnsemble(base_score=self.metadata['base_score'], **arrays), self.metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export du modèle au format artefact")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    import joblib
+    output = args.output or artifact_path_for(args.model)
+    export_artifact(joblib.load(args.model), output, source_path=args.model)
+    size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(output) for f in files)
+    print(f"✅ Artefact exporté dans {output} ({size / 1024:.0f} Ko)")
+
+
+if __name__ == "__main__":
+    main()
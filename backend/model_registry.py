@@ -0,0 +1,430 @@
+"""
+Registre des modèles de Mon Cacao
+Artefacts versionnés (empreinte SHA-256 du pickle), chargement et validation en
+arrière-plan, puis bascule atomique du modèle servi sans redémarrer l'API
+
+Usage : python model_registry.py list | publish <model.pkl> [--activate] | activate <version>
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from calibration import IntervalLookup
+from feature_encoder import CompiledEncoder
+from lite_runtime import LiteModel, export_pipeline, file_sha256
+from model_artifact import ModelArtifact, artifact_path_for, export_artifact
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model_productivite_xgb.pkl")
+REGISTRY_DIR = os.environ.get("MON_CACAO_MODEL_DIR", os.path.join(BASE_DIR, "models"))
+MANIFEST_NAME = "registry.json"
+
+# Colonnes du modèle, dans l'ordre de l'entraînement
+MODEL_FEATURES = [
+    "Coût_production/ha",
+    "Age_verger",
+    "Région",
+    "Pluviometrie",
+    "Sexe",
+    "Niveau_education",
+    "Competences",
+    "Engrais chimique",
+    "Agroforesterie",
+    "fumier/ compost",
+    "Herbicide",
+    "Insecticide",
+    "Fongicide",
+    "Maladie"
+]
+
+# Exploitation de référence pour la prédiction test d'un nouveau modèle
+SMOKE_TEST_FEATURES = {
+    "Coût_production/ha": 450000.0,
+    "Age_verger": 15.0,
+    "Région": "Indenie-Djuablin",
+    "Pluviometrie": "Moyenne",
+    "Sexe": "Masculin",
+    "Niveau_education": "Non renseigné",
+    "Competences": "oui, lire et écrire",
+    "Engrais chimique": "Oui",
+    "Agroforesterie": "Non",
+    "fumier/ compost": "Non",
+    "Herbicide": "Non",
+    "Insecticide": "Oui",
+    "Fongicide": "Non",
+    "Maladie": "Non",
+}
+
+
+class ModelValidationError(ValueError):
+    """Le modèle chargé ne respecte pas le schéma ou échoue à la prédiction test"""
+
+
+def lite_path_for(model_path):
+    """Export allégé associé à un pickle : même nom, extension .lite.npz"""
+    return os.path.splitext(model_path)[0] + ".lite.npz"
+
+
+class LoadedModel:
+    """Modèle prêt à servir, figé au chargement
+
+    Une requête lit `registry.active` une seule fois et utilise cet objet jusqu'au
+    bout : une bascule pendant son traitement ne la concerne pas.
+    """
+
+    def __init__(self, version, engine, pipeline, encoder, predictor, feature_names, source_path, load_seconds,
+                 calibration=None, interval_level=0.9):
+        self.version = version
+        self.engine = engine
+        self.pipeline = pipeline
+        self.encoder = encoder
+        self.predictor = predictor
+        self.feature_names = list(feature_names)
+        self.source_path = source_path
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+        # Intervalles conformes calculés à l'entraînement (None pour un modèle non calibré)
+        self.intervals = None
+        if calibration:
+            try:
+                self.intervals = IntervalLookup(calibration, interval_level)
+            except (ValueError, KeyError) as e:
+                print(f"⚠️ Calibration inutilisable ({e}), intervalles désactivés.")
+
+    def predict_features(self, feature_rows):
+        """Évalue le modèle sur des exploitations déjà converties en colonnes du modèle"""
+        if self.encoder is None:
+            import pandas as pd  # Import différé : le runtime allégé ne charge pas pandas
+            X_trans = self.pipeline.named_steps["prep"].transform(pd.DataFrame(feature_rows, columns=self.feature_names))
+        elif len(feature_rows) == 1:
+            X_trans = self.encoder.transform_record(feature_rows[0])
+        else:
+            X_trans = self.encoder.transform_records(feature_rows)
+        return self.predictor.predict(X_trans)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "engine": self.engine,
+            "loaded_at": self.loaded_at,
+            "load_time_ms": round(self.load_seconds * 1000, 1),
+            "source": os.path.basename(self.source_path),
+            "compiled_encoder": self.encoder is not None,
+            "calibration": self.intervals.info() if self.intervals is not None else None,
+        }
+
+
+def load_from_artifact(path, version, feature_names, engine, grid_slabs, n_threads, interval_level, start):
+    """Construire le moteur depuis l'artefact `.model` du pickle, sans unpickling
+
+    Le schéma d'entrée est contrôlé avant de charger le booster ou les arbres.
+    """
+    from grid_engine import ThresholdGridEngine
+
+    artifact_path = artifact_path_for(path)
+    artifact = ModelArtifact.load(artifact_path, feature_names)
+    if artifact.version != version:
+        raise ValueError("artefact antérieur au modèle, relancer model_artifact.py")
+
+    if engine == "lite" and artifact.has_trees:
+        predictor = artifact.lite_model()
+    else:
+        predictor = artifact.regressor(n_threads)
+        if engine == "grid":
+            try:
+                predictor = ThresholdGridEngine(predictor, len(artifact.encoder.numeric_features),
+                                                max_slabs=grid_slabs)
+            except (ValueError, AttributeError, KeyError) as e:
+                engine = "xgboost"
+                print(f"⚠️ Moteur par grille indisponible ({e}), utilisation du booster XGBoost.")
+        elif engine != "xgboost":
+            engine = "xgboost"
+    return LoadedModel(version, engine, None, artifact.encoder, predictor, feature_names, artifact_path,
+                       time.perf_counter() - start, artifact.calibration, interval_level)
+
+
+def load_model(path, feature_names=MODEL_FEATURES, engine="xgboost", grid_slabs=2048, n_threads=None,
+               interval_level=0.9, use_artifact=True):
+    """Charger un artefact et construire le moteur d'inférence demandé
+
+    `n_threads` limite les threads de prédiction XGBoost (le modèle est entraîné
+    avec n_jobs=-1 : sans limite, chaque worker occuperait tous les cœurs).
+    L'artefact `.model` est préféré au pickle quand il est à jour ; `use_artifact=False`
+    force le pickle (pipeline sklearn complet, nécessaire à la publication).
+    """
+    from grid_engine import ThresholdGridEngine
+
+    start = time.perf_counter()
+    version = file_sha256(path)[:12]
+
+    if use_artifact:
+        try:
+            return load_from_artifact(path, version, feature_names, engine, grid_slabs, n_threads,
+                                      interval_level, start)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Artefact indisponible ({e}), chargement du pickle.")
+
+    if engine == "lite":
+        try:
+            lite_model = LiteModel.load(lite_path_for(path))
+            if lite_model.version != version:
+                raise ValueError("export antérieur au modèle, relancer lite_runtime.py")
+            return LoadedModel(version, "lite", None, lite_model.encoder, lite_model, feature_names,
+                               path, time.perf_counter() - start, lite_model.calibration, interval_level)
+        except (OSError, ValueError, KeyError) as e:
+            engine = "xgboost"
+            print(f"⚠️ Modèle allégé indisponible ({e}), chargement du pipeline XGBoost.")
+
+    import joblib
+    pipeline = joblib.load(path)
+
+    # Encodeur compilé (sans pandas) pour le chemin critique, avec repli sur le pipeline sklearn
+    encoder = None
+    try:
+        encoder = CompiledEncoder.from_pipeline(pipeline.named_steps["prep"])
+    except (ValueError, AttributeError, KeyError) as e:
+        print(f"⚠️ Encodeur compilé indisponible ({e}), utilisation du pipeline sklearn.")
+
+    predictor = pipeline.named_steps["model"]
+    if n_threads:
+        predictor.set_params(n_jobs=n_threads)
+    if engine == "grid":
+        try:
+            predictor = ThresholdGridEngine.from_pipeline(pipeline, max_slabs=grid_slabs)
+        except (ValueError, AttributeError, KeyError) as e:
+            engine = "xgboost"
+            print(f"⚠️ Moteur par grille indisponible ({e}), utilisation du booster XGBoost.")
+    elif engine != "xgboost":
+        engine = "xgboost"
+
+    return LoadedModel(version, engine, pipeline, encoder, predictor, feature_names,
+                       path, time.perf_counter() - start, getattr(pipeline, "calibration_", None), interval_level)
+
+
+class ModelRegistry:
+    """Artefacts versionnés sur disque + pointeur vers le modèle actif en mémoire
+
+    Le manifeste `registry.json` liste les versions publiées et la version active.
+    Sans manifeste, le registre sert `default_path` (model_productivite_xgb.pkl).
+    """
+
+    def __init__(self, feature_names=MODEL_FEATURES, smoke_record=SMOKE_TEST_FEATURES, registry_dir=REGISTRY_DIR,
+                 default_path=MODEL_PATH, engine="xgboost", grid_slabs=2048, n_threads=None, interval_level=0.9):
+        self.feature_names = list(feature_names)
+        self.smoke_record = dict(smoke_record)
+        self.registry_dir = registry_dir
+        self.default_path = default_path
+        self.engine = engine
+        self.grid_slabs = grid_slabs
+        self.n_threads = n_threads
+        self.interval_level = interval_level
+
+        self.active = None
+        self.loading = None  # version en cours de chargement
+        self.last_error = None
+        self.history = []
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    # ---------- Manifeste ----------
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.registry_dir, MANIFEST_NAME)
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None, "versions": {}}
+
+    def _write_manifest(self, manifest):
+        # Écriture dans un fichier temporaire puis os.replace : jamais de manifeste à moitié écrit
+        os.makedirs(self.registry_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def resolve(self, version=None):
+        """Chemin de l'artefact d'une version (None = version active du manifeste)"""
+        manifest = self.read_manifest()
+        version = version or manifest.get("active")
+        if version is None:
+            return self.default_path
+        entry = manifest["versions"].get(version)
+        if entry is None:
+            raise KeyError(f"Version inconnue: {version}")
+        return os.path.join(self.registry_dir, entry["file"])
+
+    def versions(self):
+        manifest = self.read_manifest()
+        return [
+            {"version": v, **entry, "active": v == manifest.get("active")}
+            for v, entry in manifest["versions"].items()
+        ]
+
+    def publish(self, source_path, activate=False, metrics=None):
+        """Copier un pickle dans le registre (avec son artefact et son export allégé), retourne sa version"""
+        version = file_sha256(source_path)[:12]
+        filename = f"model_{version}.pkl"
+        target = os.path.join(self.registry_dir, filename)
+        os.makedirs(self.registry_dir, exist_ok=True)
+        if not os.path.exists(target):
+            shutil.copyfile(source_path, target + ".tmp")
+            os.replace(target + ".tmp", target)
+
+        # L'artefact doit passer la validation avant d'entrer dans le manifeste
+        model = self.validate(load_model(target, self.feature_names, "xgboost", use_artifact=False))
+        export_artifact(model.pipeline, artifact_path_for(target), source_path=target)
+        try:
+            export_pipeline(model.pipeline, lite_path_for(target), source_path=target)
+        except ValueError as e:
+            # Catégories natives : pas d'export allégé, le moteur lite se replie sur XGBoost
+            print(f"⚠️ Export allégé impossible ({e}).")
+
+        with self._lock:
+            manifest = self.read_manifest()
+            manifest["versions"][version] = {
+                "file": filename,
+                "published_at": datetime.now().isoformat(timespec="seconds"),
+                "metrics": metrics or {},
+            }
+            if activate:
+                manifest["active"] = version
+            self._write_manifest(manifest)
+        return version
+
+    def set_active(self, version):
+        """Changer la version active du manifeste (les processus la chargent à la prochaine vérification)"""
+        with self._lock:
+            manifest = self.read_manifest()
+            if version not in manifest["versions"]:
+                raise KeyError(f"Version inconnue: {version}")
+            manifest["active"] = version
+            self._write_manifest(manifest)
+
+    # ---------- Chargement ----------
+
+    def validate(self, model):
+        """Contrôle du schéma d'entrée puis prédiction test sur une exploitation de référence"""
+        if model.pipeline is not None:
+            expected = getattr(model.pipeline.named_steps["prep"], "feature_names_in_", None)
+            if expected is not None and list(expected) != self.feature_names:
+                raise ModelValidationError(f"Colonnes inattendues: {list(expected)}")
+        if model.encoder is not None:
+            encoder_columns = model.encoder.numeric_features + model.encoder.categorical_features
+            if sorted(encoder_columns) != sorted(self.feature_names):
+                raise ModelValidationError(f"Colonnes de l'encodeur inattendues: {encoder_columns}")
+
+        prediction = np.asarray(model.predict_features([self.smoke_record]))
+        if prediction.shape != (1,) or not np.isfinite(prediction).all():
+            raise ModelValidationError(f"Prédiction test invalide: {prediction!r}")
+        return model
+
+    def activate(self, version=None):
+        """Charger, valider, puis basculer le pointeur actif ; l'ancien modèle reste servi en cas d'échec"""
+        try:
+            path = self.resolve(version)
+            model = self.validate(load_model(path, self.feature_names, self.engine, self.grid_slabs, self.n_threads,
+                                             self.interval_level))
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.history.append({"version": version, "success": False, "error": self.last_error,
+                                 "at": datetime.now().isoformat(timespec="seconds")})
+            raise
+        finally:
+            self.loading = None
+
+        # Une seule affectation : les requêtes en cours gardent leur référence à l'ancien modèle
+        self.active = model
+        self.last_error = None
+        self.history.append({"version": model.version, "success": True, "at": model.loaded_at})
+        del self.history[:-20]
+        return model
+
+    def reload_async(self, version=None):
+        """Lancer le chargement en arrière-plan, retourne False si un chargement est déjà en cours"""
+        with self._lock:
+            if self.loading is not None:
+                return False
+            self.loading = version or "active"
+
+        def run():
+            try:
+                model = self.activate(version)
+                print(f"✅ Modèle {model.version} actif ({model.info()['load_time_ms']} ms)")
+            except Exception as e:
+                print(f"⚠️ Rechargement du modèle refusé, version précédente conservée : {e}")
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return True
+
+    def check_for_update(self):
+        """Recharger en arrière-plan si la version active du manifeste a changé"""
+        wanted = self.read_manifest().get("active")
+        if wanted is not None and (self.active is None or self.active.version != wanted):
+            return self.reload_async(wanted)
+        return False
+
+    def watch(self, interval):
+        """Vérifier périodiquement le manifeste (un thread par processus)"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_for_update()
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Lecture du registre impossible : {e}")
+
+        self._watcher = threading.Thread(target=run, name="model-watch", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        return {
+            "active": self.active.info() if self.active is not None else None,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "requested_engine": self.engine,
+            "inference_threads": self.n_threads,
+            "registry_dir": self.registry_dir,
+            "history": self.history[-5:],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre des modèles Mon Cacao")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    publish = commands.add_parser("publish")
+    publish.add_argument("model")
+    publish.add_argument("--activate", action="store_true")
+    activate = commands.add_parser("activate")
+    activate.add_argument("version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == "publish":
+        version = registry.publish(args.model, activate=args.activate)
+        print(f"✅ Version {version} publiée{' et activée' if args.activate else ''}")
+    elif args.command == "activate":
+        registry.set_active(args.version)
+        print(f"✅ Version {args.version} active, chargée par les serveurs à la prochaine vérification")
+    else:
+        for entry in registry.versions():
+            print(f"{'*' if entry['active'] else ' '} {entry['version']}  {entry['published_at']}  {entry['file']}")
+
+
+if __name__ == "__main__":
+    main()
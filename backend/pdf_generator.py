@@ -13,8 +13,9 @@ import os
 from io import BytesIO
 
 class PDFGenerator:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        # Base de l'API réutilisée : pas de nouveau pool ni de vérification du schéma par rapport
+        self.db = db or Database()
         self.styles = getSampleStyleSheet()
         self.setup_custom_styles()
     
@@ -172,11 +173,8 @@ class PDFGenerator:
         story = []
         
         # Récupérer les données du producteur
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM producers WHERE id = ?', (producer_id,))
-        producer = dict(cursor.fetchone())
-        conn.close()
+        with self.db.connection() as conn:
+            producer = dict(conn.execute('SELECT * FROM producers WHERE id = ?', (producer_id,)).fetchone())
         
         submissions = self.db.get_submissions(producer_id=producer_id)
         
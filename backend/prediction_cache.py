@@ -0,0 +1,111 @@
+"""
+Cache des prédictions pour Mon Cacao
+Cache LRU/TTL en mémoire placé devant l'appel au modèle : les formulaires des
+producteurs d'une même coopérative reviennent souvent à l'identique
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def quantize(value, precision):
+    """Arrondir une valeur au multiple de `precision` le plus proche (0 = pas d'arrondi)"""
+    if not precision:
+        return float(value)
+    # Le second arrondi efface les résidus binaires (150 * 0.1 = 15.000000000000002)
+    return round(round(value / precision) * precision, 10)
+
+
+class PredictionCache:
+    """Cache LRU avec expiration, clé = tuple canonique des colonnes du modèle
+
+    Les colonnes numériques listées dans `precisions` sont quantifiées avant de
+    construire la clé ; le modèle est alors évalué sur la valeur quantifiée pour
+    que le résultat ne dépende pas de l'ordre d'arrivée des requêtes.
+    """
+
+    def __init__(self, feature_names, max_size=10000, ttl=3600, precisions=None):
+        self.feature_names = list(feature_names)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.precisions = dict(precisions or {})
+        self.model_version = None
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def canonicalize(self, features):
+        """Retourne (clé, colonnes quantifiées) pour une exploitation"""
+        canonical = dict(features)
+        for name, precision in self.precisions.items():
+            value = canonical.get(name)
+            if value is not None:
+                canonical[name] = quantize(value, precision)
+        key = tuple(canonical.get(name) for name in self.feature_names)
+        return key, canonical
+
+    def bind_model(self, version):
+        """Vider le cache si le modèle servi a changé"""
+        with self._lock:
+            if version != self.model_version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.model_version = version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            # Résultat d'un modèle remplacé entre-temps : ne pas le mélanger au nouveau
+            if version is not None and version != self.model_version:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "model_version": self.model_version,
+            }
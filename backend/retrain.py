@@ -0,0 +1,203 @@
+"""
+Réentraînement incrémental du modèle à partir des soumissions réelles
+Les soumissions postérieures au dernier filigrane (id) prolongent le booster actif
+de quelques arbres ; la nouvelle version n'est publiée dans le registre que si elle
+n'est pas moins bonne que l'actuelle sur l'échantillon de contrôle.
+Tâche de fond, hors du chemin des requêtes : processus séparé, priorité basse,
+threads XGBoost limités.
+
+Usage : python retrain.py [--loop SECONDES] [--threads 1] [--nice 10]
+"""
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from calibration import LEVELS, fit_calibration
+from database import DB_PATH, Database
+from lite_runtime import file_sha256
+from model_registry import MODEL_FEATURES, ModelRegistry
+from synthetic_data import SUBMISSION_COLUMNS
+
+STATE_NAME = "retrain_state.json"
+# Nouvelles soumissions nécessaires pour lancer un réentraînement
+MIN_NEW_SUBMISSIONS = int(os.environ.get("MON_CACAO_RETRAIN_MIN_ROWS", 200))
+# Arbres ajoutés au booster à chaque réentraînement
+EXTRA_ROUNDS = int(os.environ.get("MON_CACAO_RETRAIN_ROUNDS", 20))
+RETRAIN_THREADS = int(os.environ.get("MON_CACAO_RETRAIN_THREADS", 1))
+# Une soumission sur HOLDOUT_MODULO (selon son id) sert au contrôle, jamais à l'entraînement
+HOLDOUT_MODULO = 5
+MIN_HOLDOUT = 20
+# Production déclarée plausible (kg/ha) : au-delà, saisie erronée
+MAX_PRODUCTION_KG_HA = 5000
+
+
+# Soumissions exploitables pour l'entraînement, par ordre d'id (LIMIT -1 : sans limite)
+SUBMISSIONS_QUERY = f"""
+    SELECT id, production_reelle, {', '.join(SUBMISSION_COLUMNS)} FROM submissions
+    WHERE id > ? AND production_reelle > 0 AND production_reelle <= ?
+      AND age_verger IS NOT NULL AND cout_prod IS NOT NULL
+    ORDER BY id LIMIT ?
+"""
+
+
+def fetch_submissions(conn, since_id=0, limit=-1):
+    """Lignes brutes : id, production_reelle (kg/ha), puis les colonnes de SUBMISSION_COLUMNS"""
+    return conn.execute(SUBMISSIONS_QUERY, (since_id, MAX_PRODUCTION_KG_HA, limit)).fetchall()
+
+
+def load_submissions(conn, since_id=0):
+    """Soumissions exploitables d'id > since_id : (ids, lignes du modèle, productivité t/ha)"""
+    rows = fetch_submissions(conn, since_id)
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    y = np.array([row[1] for row in rows], dtype=np.float64) / 1000
+    # Sexe, niveau d'éducation et compétences ne sont pas saisis : valeurs manquantes
+    records = [dict(zip(SUBMISSION_COLUMNS.values(), row[2:])) for row in rows]
+    return ids, records, y
+
+
+def rmse(y_true, y_pred):
+    return float(np.sqrt(np.mean((np.asarray(y_true) - np.asarray(y_pred)) ** 2)))
+
+
+def continue_training(pipeline, X, y, rounds=EXTRA_ROUNDS, n_threads=RETRAIN_THREADS):
+    """Copie du pipeline dont le booster est prolongé de `rounds` arbres
+
+    Le préprocesseur est conservé tel quel : l'encodage des colonnes ne change pas
+    et l'API sert la nouvelle version sans autre adaptation.
+    """
+    candidate = copy.deepcopy(pipeline)
+    regressor = candidate.named_steps["model"]
+    regressor.set_params(n_estimators=rounds, n_jobs=n_threads)
+    regressor.fit(X, y, xgb_model=pipeline.named_steps["model"].get_booster())
+    return candidate
+
+
+class RetrainJob:
+    """Un réentraînement : soumissions nouvelles -> candidat -> contrôle -> publication
+
+    L'état (`retrain_state.json` dans le registre) garde le filigrane, id de la
+    dernière soumission intégrée à un modèle publié. Un candidat refusé ne le fait
+    pas avancer : ses soumissions seront reprises, avec les suivantes, au prochain passage.
+    """
+
+    def __init__(self, registry=None, db_path=DB_PATH, min_rows=MIN_NEW_SUBMISSIONS, rounds=EXTRA_ROUNDS,
+                 n_threads=RETRAIN_THREADS, tolerance=0.0):
+        self.registry = registry or ModelRegistry()
+        self.db_path = db_path
+        self.min_rows = min_rows
+        self.rounds = rounds
+        self.n_threads = n_threads
+        self.tolerance = tolerance
+
+    @property
+    def state_path(self):
+        return os.path.join(self.registry.registry_dir, STATE_NAME)
+
+    def read_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"watermark": 0}
+
+    def _write_state(self, state):
+        os.makedirs(self.registry.registry_dir, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def run_once(self):
+        """Un passage complet, retourne un compte rendu (status : skipped, rejected ou published)"""
+        import joblib
+
+        state = self.read_state()
+        watermark = state.get("watermark", 0)
+        conn = Database(self.db_path).get_connection()
+        try:
+            ids, records, y = load_submissions(conn, watermark)
+        finally:
+            conn.close()
+
+        holdout = ids % HOLDOUT_MODULO == 0
+        report = {"watermark": watermark, "new_rows": len(ids), "n_train": int((~holdout).sum()),
+                  "n_holdout": int(holdout.sum()), "at": datetime.now().isoformat(timespec="seconds")}
+        if len(ids) < self.min_rows or report["n_holdout"] < MIN_HOLDOUT:
+            return dict(report, status="skipped")
+
+        base_path = self.registry.resolve()
+        pipeline = joblib.load(base_path)
+        X = pipeline.named_steps["prep"].transform(pd.DataFrame(records, columns=MODEL_FEATURES))
+        candidate = continue_training(pipeline, X[~holdout], y[~holdout], self.rounds, self.n_threads)
+
+        base_pred = pipeline.named_steps["model"].predict(X[holdout])
+        candidate_pred = candidate.named_steps["model"].predict(X[holdout])
+        report.update(base_version=file_sha256(base_path)[:12],
+                      rmse_base=rmse(y[holdout], base_pred), rmse_candidate=rmse(y[holdout], candidate_pred))
+        if report["rmse_candidate"] > report["rmse_base"] * (1 + self.tolerance):
+            state["last_run"] = dict(report, status="rejected")
+            self._write_state(state)
+            return state["last_run"]
+
+        # Intervalles recalibrés sur le contrôle s'il suffit pour tous les niveaux, sinon conservés
+        regions = [r.get("Région") for r, h in zip(records, holdout) if h]
+        calibration = fit_calibration(y[holdout], candidate_pred, groups=regions)
+        if len(calibration["levels"]) == len(LEVELS):
+            candidate.calibration_ = calibration
+
+        os.makedirs(self.registry.registry_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".pkl", dir=self.registry.registry_dir)
+        os.close(fd)
+        try:
+            joblib.dump(candidate, tmp_path)
+            version = self.registry.publish(tmp_path, activate=True, metrics={
+                key: report[key] for key in ("base_version", "n_train", "n_holdout", "rmse_base", "rmse_candidate")
+            })
+        finally:
+            os.remove(tmp_path)
+
+        report.update(status="published", version=version, watermark=int(ids.max()))
+        self._write_state({"watermark": report["watermark"], "version": version, "last_run": report})
+        return report
+
+    def run_forever(self, interval):
+        while True:
+            try:
+                report = self.run_once()
+                print(f"[{report['at']}] {report['status']} : {report['new_rows']} nouvelles soumissions"
+                      + (f", RMSE {report['rmse_base']:.4f} -> {report['rmse_candidate']:.4f}"
+                         if "rmse_candidate" in report else "")
+                      + (f", version {report['version']}" if "version" in report else ""))
+            except Exception as e:
+                print(f"⚠️ Réentraînement interrompu : {e}")
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réentraînement incrémental du modèle")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--loop", type=float, default=0, help="relancer toutes les N secondes")
+    parser.add_argument("--threads", type=int, default=RETRAIN_THREADS)
+    parser.add_argument("--nice", type=int, default=10, help="priorité CPU abaissée du processus")
+    parser.add_argument("--min-rows", type=int, default=MIN_NEW_SUBMISSIONS)
+    parser.add_argument("--rounds", type=int, default=EXTRA_ROUNDS)
+    args = parser.parse_args()
+
+    if args.nice and hasattr(os, "nice"):
+        os.nice(args.nice)
+    job = RetrainJob(db_path=args.db, min_rows=args.min_rows, rounds=args.rounds, n_threads=args.threads)
+    if args.loop:
+        job.run_forever(args.loop)
+    else:
+        print(json.dumps(job.run_once(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
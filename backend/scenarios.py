@@ -0,0 +1,220 @@
+"""
+Scénarios « et si ? » pour Mon Cacao
+Construit les variantes d'une exploitation (pratiques culturales, prix, coûts...)
+sous forme de lots évalués en un seul appel au modèle
+"""
+import json
+import os
+
+import numpy as np
+
+# Pratiques culturales modifiables par le producteur (champs de l'API, valeurs Oui/Non)
+PRACTICES = ['engrais', 'agroforest', 'fumier', 'herbicide', 'insecticide', 'fongicide']
+
+PRACTICE_LABELS = {
+    'engrais': "Engrais chimique",
+    'agroforest': "Agroforesterie",
+    'fumier': "Fumier / compost",
+    'herbicide': "Herbicide",
+    'insecticide': "Insecticide",
+    'fongicide': "Fongicide",
+}
+
+
+def practice_matrix(n_practices=len(PRACTICES)):
+    """Les 2^n combinaisons de pratiques, une ligne par combinaison (True = pratique adoptée)"""
+    codes = np.arange(2 ** n_practices)[:, None]
+    return ((codes >> np.arange(n_practices)) & 1).astype(bool)
+
+
+def validate_practice_options(costs, budget):
+    """Vérifie la table des coûts et le budget, retourne un message d'erreur ou None"""
+    if costs is not None:
+        if not isinstance(costs, dict):
+            return "Format invalide: 'costs' doit être un objet {pratique: coût FCFA/ha}"
+        for practice, cost in costs.items():
+            if practice not in PRACTICES:
+                return f"Pratique inconnue: {practice}"
+            if isinstance(cost, bool) or not isinstance(cost, (int, float)) or cost < 0:
+                return f"Coût invalide pour {practice}"
+    if budget is not None:
+        if isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget < 0:
+            return "Valeur numérique positive attendue: budget"
+    return None
+
+
+def enumerate_practices(data, costs=None, budget=None):
+    """Variantes de l'exploitation pour toutes les combinaisons de pratiques
+
+    Le coût supplémentaire d'une combinaison est la somme des coûts des pratiques
+    adoptées moins celle des pratiques abandonnées ; il s'ajoute au coût de
+    production (entrée du modèle). Les combinaisons dont le coût supplémentaire
+    dépasse `budget` sont écartées.
+
+    Retourne (variantes, matrice des pratiques, coûts supplémentaires).
+    """
+    adopted = practice_matrix()
+    current = np.array([data[p] == "Oui" for p in PRACTICES])
+    unit_costs = np.array([float((costs or {}).get(p, 0)) for p in PRACTICES])
+    extra_costs = (adopted.astype(np.int8) - current.astype(np.int8)) @ unit_costs
+
+    if budget is not None:
+        keep = extra_costs <= budget
+        adopted, extra_costs = adopted[keep], extra_costs[keep]
+
+    variants = []
+    for row, extra in zip(adopted, extra_costs):
+        variant = dict(data)
+        variant.update({p: "Oui" if on else "Non" for p, on in zip(PRACTICES, row)})
+        variant['cout_prod'] = data['cout_prod'] + float(extra)
+        variants.append(variant)
+    return variants, adopted, extra_costs
+
+
+def economics(productions, prix_a, cout_prod):
+    """Revenu et bénéfice (FCFA/ha), mêmes formules que build_prediction_result
+
+    Les arguments sont diffusés (broadcasting NumPy) : des grilles de prix ou de
+    coûts donnent directement des tableaux de revenus et de bénéfices.
+    """
+    productions = np.asarray(productions, dtype=np.float64)
+    revenue = np.round(productions * 1000 * (np.asarray(prix_a, dtype=np.float64) / 1000))
+    benefit = np.round(revenue - np.asarray(cout_prod, dtype=np.float64))
+    return revenue, benefit
+
+
+# Nombre maximum de points d'une grille de sensibilité
+MAX_GRID_POINTS = 200
+
+
+def parse_grid(spec, name, default):
+    """Grille de valeurs : liste de nombres ou {"min", "max", "steps"}, retourne (tableau, erreur)"""
+    if spec is None:
+        return np.asarray(default, dtype=np.float64), None
+    if isinstance(spec, dict):
+        bounds = [spec.get(k) for k in ('min', 'max')]
+        steps = spec.get('steps', 21)
+        if any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in bounds) or bounds[0] > bounds[1]:
+            return None, f"Bornes invalides pour {name}"
+        if isinstance(steps, bool) or not isinstance(steps, int) or not 1 <= steps <= MAX_GRID_POINTS:
+            return None, f"Nombre de points invalide pour {name} (1 à {MAX_GRID_POINTS})"
+        return np.linspace(bounds[0], bounds[1], steps), None
+    if isinstance(spec, list) and 0 < len(spec) <= MAX_GRID_POINTS:
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in spec):
+            return np.asarray(spec, dtype=np.float64), None
+    return None, f"Grille invalide pour {name}: liste de 1 à {MAX_GRID_POINTS} nombres ou {{min, max, steps}}"
+
+
+def break_even_price(productions, cout_prod):
+    """Prix (FCFA/t, comme prix_a) pour lequel le revenu couvre le coût de production"""
+    productions = np.asarray(productions, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(productions > 0, np.asarray(cout_prod, dtype=np.float64) / productions, np.inf)
+
+
+# ========== SIMULATION DE MONTE-CARLO ==========
+
+RAINFALL_LEVELS = ['Faible', 'Moyenne', 'Élevée']
+DISEASE_LEVELS = ['Non', 'Un peu', 'Oui']
+
+# Probabilités indicatives par région, à remplacer par les relevés locaux
+# (fichier JSON de même structure désigné par MON_CACAO_SCENARIO_DISTRIBUTIONS)
+REGION_DISTRIBUTIONS = {
+    "Indenie-Djuablin": {"pluviometrie": {"Faible": 0.30, "Moyenne": 0.50, "Élevée": 0.20},
+                         "maladie": {"Non": 0.50, "Un peu": 0.35, "Oui": 0.15}},
+    "Yamoussoukro": {"pluviometrie": {"Faible": 0.40, "Moyenne": 0.45, "Élevée": 0.15},
+                     "maladie": {"Non": 0.55, "Un peu": 0.30, "Oui": 0.15}},
+    "La Me": {"pluviometrie": {"Faible": 0.20, "Moyenne": 0.50, "Élevée": 0.30},
+              "maladie": {"Non": 0.45, "Un peu": 0.35, "Oui": 0.20}},
+    "San-Pedro": {"pluviometrie": {"Faible": 0.15, "Moyenne": 0.45, "Élevée": 0.40},
+                  "maladie": {"Non": 0.40, "Un peu": 0.35, "Oui": 0.25}},
+    "Grand-Ponts": {"pluviometrie": {"Faible": 0.20, "Moyenne": 0.50, "Élevée": 0.30},
+                    "maladie": {"Non": 0.45, "Un peu": 0.35, "Oui": 0.20}},
+}
+UNIFORM_DISTRIBUTION = {
+    "pluviometrie": {level: 1 / len(RAINFALL_LEVELS) for level in RAINFALL_LEVELS},
+    "maladie": {level: 1 / len(DISEASE_LEVELS) for level in DISEASE_LEVELS},
+}
+
+# Nombre maximum de tirages par simulation
+MAX_SAMPLES = 100000
+QUANTILES = (5, 25, 50, 75, 95)
+
+
+def load_distributions(path=None):
+    """Distributions par région : valeurs par défaut, complétées par le fichier JSON éventuel"""
+    distributions = {region: dict(dist) for region, dist in REGION_DISTRIBUTIONS.items()}
+    path = path or os.environ.get("MON_CACAO_SCENARIO_DISTRIBUTIONS")
+    if path:
+        with open(path, encoding='utf-8') as f:
+            for region, dist in json.load(f).items():
+                distributions.setdefault(region, {}).update(dist)
+    return distributions
+
+
+def validate_distribution(distribution):
+    """Vérifie {"pluviometrie": {niveau: p}, "maladie": {niveau: p}}, retourne un message d'erreur ou None"""
+    if not isinstance(distribution, dict):
+        return "Format invalide: 'distribution' doit être un objet"
+    for field, levels in (('pluviometrie', RAINFALL_LEVELS), ('maladie', DISEASE_LEVELS)):
+        probabilities = distribution.get(field)
+        if probabilities is None:
+            continue
+        if not isinstance(probabilities, dict) or not probabilities:
+            return f"Distribution invalide pour {field}"
+        for level, p in probabilities.items():
+            if level not in levels:
+                return f"Modalité inconnue pour {field}: {level}"
+            if isinstance(p, bool) or not isinstance(p, (int, float)) or p < 0:
+                return f"Probabilité invalide pour {field}: {level}"
+        if sum(probabilities.values()) <= 0:
+            return f"Distribution invalide pour {field}"
+    return None
+
+
+def probability_vector(probabilities, levels):
+    weights = np.array([float(probabilities.get(level, 0)) for level in levels])
+    return weights / weights.sum()
+
+
+def sample_conditions(distribution, n_samples, rng):
+    """Tire pluviométrie et maladie, retourne l'indice de la combinaison (pluie x maladie) de chaque tirage"""
+    rain = rng.choice(len(RAINFALL_LEVELS), n_samples,
+                      p=probability_vector(distribution['pluviometrie'], RAINFALL_LEVELS))
+    disease = rng.choice(len(DISEASE_LEVELS), n_samples,
+                         p=probability_vector(distribution['maladie'], DISEASE_LEVELS))
+    return rain * len(DISEASE_LEVELS) + disease
+
+
+def condition_variants(data):
+    """Les 9 variantes pluie x maladie de l'exploitation, dans l'ordre des indices de sample_conditions"""
+    return [
+        dict(data, pluviometrie=rain, maladie=disease)
+        for rain in RAINFALL_LEVELS for disease in DISEASE_LEVELS
+    ]
+
+
+def quantiles(values, decimals=3):
+    values = np.asarray(values, dtype=np.float64)
+    summary = {f"p{q}": round(float(v), decimals) for q, v in zip(QUANTILES, np.percentile(values, QUANTILES))}
+    summary["mean"] = round(float(values.mean()), decimals)
+    return summary
+
+
+# ========== PROJECTION SUR LA DURÉE DE VIE DU VERGER ==========
+
+# Horizon maximum d'une projection (années)
+MAX_PROJECTION_YEARS = 40
+
+
+def age_trajectories(records, years, age_field='age_verger'):
+    """Chaque exploitation vieillie de 0 à `years` - 1 ans : matrice (exploitations x années) aplatie
+
+    Retourne (variantes ligne par ligne, matrice des âges).
+    """
+    ages = np.array([float(r[age_field]) for r in records])[:, None] + np.arange(years)
+    variants = [
+        dict(record, **{age_field: float(age)})
+        for record, row in zip(records, ages) for age in row
+    ]
+    return variants, ages
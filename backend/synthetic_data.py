@@ -0,0 +1,218 @@
+"""
+Générateur vectorisé de données synthétiques pour Mon Cacao
+Mêmes effets que le modèle d'origine (âge, engrais, agroforesterie, fumier, maladie,
+pluviométrie, région), calculés par colonnes entières et produits par blocs : des
+millions de lignes vers CSV, Parquet ou la table SQLite `submissions`
+Usage : python synthetic_data.py --rows 1000000 --format sqlite --output bench.db
+"""
+import argparse
+import gzip
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Colonnes numériques : (min, max) de la loi uniforme
+NUMERIC_RANGES = {
+    'Coût_production/ha': (200000, 600000),
+    'Age_verger': (1, 30),
+}
+
+# Modalités de chaque variable catégorielle, dans l'ordre de tirage
+CATEGORIES = {
+    'Région': ['Indenie-Djuablin', 'Yamoussoukro', 'La Me', 'San-Pedro', 'Grand-Ponts'],
+    'Pluviometrie': ['Faible', 'Moyenne', 'Élevée'],
+    'Sexe': ['Masculin', 'Feminin'],
+    'Niveau_education': ['Primaire', 'Secondaire', 'Supérieur', 'Non renseigné'],
+    'Competences': ['oui, lire et écrire', 'oui, lire seulement', 'non'],
+    'Engrais chimique': ['Oui', 'Non'],
+    'Agroforesterie': ['Oui', 'Non'],
+    'fumier/ compost': ['Oui', 'Non'],
+    'Herbicide': ['Oui', 'Non'],
+    'Insecticide': ['Oui', 'Non'],
+    'Fongicide': ['Oui', 'Non'],
+    'Maladie': ['Non', 'Un peu', 'Oui'],
+}
+
+# Effet de chaque modalité sur la productivité (t/ha), aligné sur CATEGORIES
+EFFECTS = {
+    'Engrais chimique': [0.2, 0.0],
+    'Agroforesterie': [0.15, 0.0],
+    'fumier/ compost': [0.1, 0.0],
+    'Maladie': [0.0, -0.1, -0.3],
+    'Pluviometrie': [-0.2, 0.0, 0.1],
+    'Région': [0.1, 0.05, 0.08, 0.15, 0.12],
+}
+
+BASE_PRODUCTIVITY = 0.5
+NOISE_STD = 0.1
+PRODUCTIVITY_RANGE = (0.1, 2.0)
+CHUNK_SIZE = 100000
+
+# Correspondance colonnes du modèle -> table `submissions` de database.py
+SUBMISSION_COLUMNS = {
+    'age_verger': 'Age_verger',
+    'agroforest': 'Agroforesterie',
+    'engrais': 'Engrais chimique',
+    'fumier': 'fumier/ compost',
+    'maladie': 'Maladie',
+    'herbicide': 'Herbicide',
+    'insecticide': 'Insecticide',
+    'fongicide': 'Fongicide',
+    'cout_prod': 'Coût_production/ha',
+    'region': 'Région',
+    'pluviometrie': 'Pluviometrie',
+}
+
+
+def productivity(age, codes, noise):
+    """Productivité (t/ha) de colonnes entières
+
+    `codes` : {variable: codes des modalités}. Les termes sont additionnés dans le
+    même ordre que l'ancienne boucle ligne par ligne : résultats identiques bit à bit.
+    """
+    def effect(name):
+        return np.take(EFFECTS[name], codes[name])
+
+    total = (BASE_PRODUCTIVITY
+             + 0.1 * np.exp(-0.1 * (age - 10) ** 2)  # Pic entre 8 et 15 ans
+             + effect('Engrais chimique')
+             + effect('Agroforesterie')
+             + effect('fumier/ compost')
+             + effect('Maladie')
+             + effect('Pluviometrie')
+             + effect('Région')
+             + noise)
+    return np.clip(total, *PRODUCTIVITY_RANGE)
+
+
+def generate_chunk(n_rows, rng):
+    """Un bloc de `n_rows` exploitations (colonnes du modèle + Productivite)
+
+    `rng` : np.random.Generator, ou np.random.RandomState pour retrouver le jeu
+    d'entraînement historique (même suite de tirages que np.random.seed).
+    """
+    columns = {name: rng.uniform(low, high, n_rows) for name, (low, high) in NUMERIC_RANGES.items()}
+    codes = {}
+    for name, levels in CATEGORIES.items():
+        codes[name] = rng.choice(len(levels), n_rows)
+        columns[name] = np.take(np.array(levels, dtype=object), codes[name])
+    df = pd.DataFrame(columns)
+    df['Productivite'] = productivity(columns['Age_verger'], codes, rng.normal(0, NOISE_STD, n_rows))
+    return df
+
+
+def iter_chunks(n_rows, chunk_size=CHUNK_SIZE, seed=None):
+    """Blocs successifs totalisant `n_rows` lignes, reproductibles pour une même graine"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, chunk_size):
+        yield generate_chunk(min(chunk_size, n_rows - start), rng)
+
+
+# ========== ÉCRITURE ==========
+
+def write_csv(path, chunks):
+    """CSV (compressé gzip si le nom finit par .gz), écrit bloc par bloc"""
+    opener = gzip.open if path.endswith('.gz') else open
+    n_rows = 0
+    with opener(path, 'wt', encoding='utf-8', newline='') as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=n_rows == 0, index=False)
+            n_rows += len(chunk)
+    return n_rows
+
+
+def write_parquet(path, chunks):
+    """Parquet, un groupe de lignes par bloc (nécessite pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow requis pour l'export Parquet (pip install pyarrow)")
+
+    writer = None
+    n_rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def submission_rows(chunk, rng, price_per_kg=(1000, 1800), days=365, user_id=None, producer_id=None):
+    """Tuples prêts pour INSERT INTO submissions, dans l'ordre de SUBMISSION_COLUMNS
+
+    Production en kg/ha, prix en FCFA/kg et dates réparties sur les `days` derniers
+    jours, comme les soumissions réelles.
+    """
+    n_rows = len(chunk)
+    production = chunk['Productivite'].to_numpy() * 1000
+    price = np.round(rng.uniform(*price_per_kg, n_rows))
+    now = datetime.now().replace(microsecond=0)
+    offsets = rng.integers(0, days * 86400, n_rows)
+    dates = [(now - timedelta(seconds=int(s))).strftime('%Y-%m-%d %H:%M:%S') for s in offsets]
+    values = [chunk[column].tolist() for column in SUBMISSION_COLUMNS.values()]
+    return list(zip(
+        [producer_id] * n_rows, [user_id] * n_rows, *values,
+        price.tolist(), np.round(production, 1).tolist(), np.round(production * price).tolist(), dates,
+    ))
+
+
+def write_sqlite(db_path, chunks, seed=None, **options):
+    """Insérer les exploitations dans la table `submissions` (schéma de database.py)"""
+    from database import Database
+
+    rng = np.random.default_rng(None if seed is None else seed + 1)
+    columns = ['producer_id', 'user_id', *SUBMISSION_COLUMNS,
+               'prix_vente', 'production_reelle', 'revenu_total', 'date_soumission']
+    query = f"INSERT INTO submissions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    conn = Database(db_path).get_connection()
+    n_rows = 0
+    try:
+        for chunk in chunks:
+            with conn:  # Une transaction par bloc
+                conn.executemany(query, submission_rows(chunk, rng, **options))
+            n_rows += len(chunk)
+    finally:
+        conn.close()
+    return n_rows
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'sqlite': write_sqlite}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génération de données synthétiques")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--user-id", type=int, default=None, help="propriétaire des soumissions (sqlite)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    chunks = iter_chunks(args.rows, args.chunk_size, args.seed)
+    try:
+        if args.format == 'sqlite':
+            n_rows = write_sqlite(args.output, chunks, seed=args.seed, user_id=args.user_id)
+        else:
+            n_rows = WRITERS[args.format](args.output, chunks)
+    except RuntimeError as e:
+        raise SystemExit(f"❌ {e}")
+    elapsed = time.perf_counter() - start
+    print(f"✅ {n_rows} lignes écrites dans {args.output} en {elapsed:.1f} s "
+          f"({n_rows / elapsed:.0f} lignes/s, {os.path.getsize(args.output) / 1e6:.0f} Mo)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Entraînement hors mémoire à partir de la table `submissions`
+Les soumissions sont lues par blocs (pagination sur l'id), encodées bloc par bloc
+par l'encodeur compilé et transmises à XGBoost par un itérateur de données : ni
+DataFrame complet ni matrice one-hot dense du jeu entier en mémoire.
+
+  --memory quantile : QuantileDMatrix, seul l'histogramme compact (1 octet par
+                      valeur) de tout le jeu reste en mémoire
+  --memory external : ExtMemQuantileDMatrix, pages de l'histogramme sur disque,
+                      mémoire bornée par la taille des blocs
+
+Usage : python train_stream.py --db bench.db [--memory quantile|external] [--output model_stream.pkl]
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from calibration import fit_calibration
+from database import DB_PATH, Database
+from feature_encoder import CompiledEncoder
+from model_registry import MODEL_FEATURES
+from retrain import HOLDOUT_MODULO, fetch_submissions
+from synthetic_data import CATEGORIES, SUBMISSION_COLUMNS
+from train_model import build_pipeline, categorical_features
+
+CHUNK_SIZE = 100000
+# Lignes tirées au hasard pour ajuster médianes, moyennes et écarts-types
+FIT_SAMPLE = 50000
+# Résidus du contrôle conservés pour calibrer les intervalles
+MAX_CALIBRATION_ROWS = 200000
+
+
+def rows_to_columns(rows, numeric_features):
+    """Lignes brutes de fetch_submissions -> (ids, colonnes du modèle, productivité t/ha)"""
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    y = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)) / 1000
+    columns = {}
+    for j, name in enumerate(SUBMISSION_COLUMNS.values(), start=2):
+        dtype = np.float64 if name in numeric_features else object
+        columns[name] = np.array([row[j] for row in rows], dtype=dtype)
+    return ids, columns, y
+
+
+def fit_preprocessor(conn, prep, sample_size=FIT_SAMPLE):
+    """Ajuster le préprocesseur sans charger la table
+
+    Modalités : toutes celles de la table et celles du formulaire (SELECT DISTINCT),
+    fixées dans le OneHotEncoder. Statistiques numériques : échantillon aléatoire,
+    les arbres n'étant pas sensibles au centrage ni à l'échelle.
+    """
+    columns = {model: sub for sub, model in SUBMISSION_COLUMNS.items()}
+    categories = []
+    for name in categorical_features:
+        values = set(CATEGORIES[name])
+        if name in columns:
+            values.update(v for (v,) in conn.execute(
+                f"SELECT DISTINCT {columns[name]} FROM submissions WHERE {columns[name]} IS NOT NULL"))
+        categories.append(sorted(values))
+    prep.set_params(cat__onehot__categories=categories)
+
+    sample = conn.execute(f"SELECT {', '.join(SUBMISSION_COLUMNS)} FROM submissions "
+                          "WHERE age_verger IS NOT NULL AND cout_prod IS NOT NULL "
+                          "ORDER BY RANDOM() LIMIT ?", (sample_size,)).fetchall()
+    if not sample:
+        raise ValueError("Aucune soumission exploitable")
+    # Sexe, niveau d'éducation et compétences ne sont pas saisis : 'missing', comme l'imputeur
+    sample = pd.DataFrame(sample, columns=list(SUBMISSION_COLUMNS.values()))
+    return prep.fit(sample.reindex(columns=MODEL_FEATURES, fill_value='missing'))
+
+
+class SubmissionIter(xgb.DataIter):
+    """Blocs encodés de la table `submissions` pour XGBoost
+
+    `holdout` : False pour l'entraînement, True pour le contrôle (une soumission
+    sur HOLDOUT_MODULO selon son id, comme retrain.py).
+    """
+
+    def __init__(self, db_path, encoder, holdout=False, chunk_size=CHUNK_SIZE, cache_prefix=None):
+        super().__init__(cache_prefix=cache_prefix)
+        self.db_path = db_path
+        self.encoder = encoder
+        self.holdout = holdout
+        self.chunk_size = chunk_size
+        self.n_rows = 0
+        self._chunks = None
+
+    def chunks(self):
+        """(X, y, colonnes) bloc par bloc ; une seule connexion par passage"""
+        conn = Database(self.db_path).get_connection()
+        try:
+            cursor = 0
+            while True:
+                rows = fetch_submissions(conn, cursor, self.chunk_size)
+                if not rows:
+                    return
+                ids, columns, y = rows_to_columns(rows, self.encoder.numeric_features)
+                cursor = int(ids[-1])
+                keep = (ids % HOLDOUT_MODULO == 0) == self.holdout
+                if not keep.any():
+                    continue
+                columns = {name: values[keep] for name, values in columns.items()}
+                yield self.encoder.transform_columns(columns, int(keep.sum())), y[keep], columns
+        finally:
+            conn.close()
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = self.chunks()
+            self.n_rows = 0
+        try:
+            X, y, _ = next(self._chunks)
+        except StopIteration:
+            return False
+        input_data(data=X, label=y)
+        self.n_rows += len(y)
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+def evaluate(booster, holdout_iter):
+    """RMSE et R² sur le contrôle, bloc par bloc ; calibration des intervalles sur un échantillon"""
+    n, sse, total, total_sq = 0, 0.0, 0.0, 0.0
+    y_kept, pred_kept, regions = [], [], []
+    for X, y, columns in holdout_iter.chunks():
+        prediction = booster.inplace_predict(X)
+        n += len(y)
+        sse += float(np.sum((y - prediction) ** 2))
+        total += float(y.sum())
+        total_sq += float(np.sum(y ** 2))
+        room = MAX_CALIBRATION_ROWS - sum(len(part) for part in y_kept)
+        if room > 0:
+            y_kept.append(y[:room])
+            pred_kept.append(prediction[:room])
+            regions.append(columns['Région'][:room])
+    if n == 0:
+        return None, None
+    variance = total_sq - total ** 2 / n
+    metrics = {"n_holdout": n, "rmse": float(np.sqrt(sse / n)), "r2": 1 - sse / variance if variance else None}
+    calibration = fit_calibration(np.concatenate(y_kept), np.concatenate(pred_kept), np.concatenate(regions))
+    return metrics, calibration
+
+
+def train(db_path=DB_PATH, memory="quantile", chunk_size=CHUNK_SIZE, fit_sample=FIT_SAMPLE,
+          model_params=None, n_threads=None):
+    """Entraîner le pipeline (mêmes hyperparamètres que train_model.py) sur toute la table
+
+    Retourne (pipeline, métriques) ; le pipeline est servi tel quel par l'API.
+    """
+    pipeline = build_pipeline(model_params=model_params)
+    conn = Database(db_path).get_connection()
+    try:
+        prep = fit_preprocessor(conn, pipeline.named_steps["prep"], fit_sample)
+    finally:
+        conn.close()
+    encoder = CompiledEncoder.from_pipeline(prep)
+    regressor = pipeline.named_steps["model"]
+    if n_threads:
+        regressor.set_params(n_jobs=n_threads)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if memory == "external":
+            train_iter = SubmissionIter(db_path, encoder, chunk_size=chunk_size,
+                                        cache_prefix=os.path.join(cache_dir, "train"))
+            dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=256)
+        else:
+            train_iter = SubmissionIter(db_path, encoder, chunk_size=chunk_size)
+            dtrain = xgb.QuantileDMatrix(train_iter, max_bin=256)
+        booster = xgb.train(regressor.get_xgb_params(), dtrain, num_boost_round=regressor.n_estimators)
+        n_train = dtrain.num_row()
+        del dtrain
+    fit_seconds = time.perf_counter() - start
+
+    # Le booster rejoint l'estimateur sklearn : pipeline identique à celui de train_model.py
+    regressor.load_model(bytearray(booster.save_raw("ubj")))
+    metrics, calibration = evaluate(booster, SubmissionIter(db_path, encoder, holdout=True, chunk_size=chunk_size))
+    if calibration is not None:
+        pipeline.calibration_ = calibration
+    return pipeline, dict(metrics or {}, n_train=n_train, fit_seconds=fit_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraînement hors mémoire depuis SQLite")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--memory", choices=("quantile", "external"), default="quantile")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--fit-sample", type=int, default=FIT_SAMPLE)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default="model_stream.pkl")
+    args = parser.parse_args()
+
+    pipeline, metrics = train(args.db, args.memory, args.chunk_size, args.fit_sample, n_threads=args.threads)
+    import joblib
+    joblib.dump(pipeline, args.output)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"✅ {metrics['n_train']} lignes, {metrics['fit_seconds']:.1f} s, "
+          f"contrôle : RMSE {metrics.get('rmse', float('nan')):.4f}, R² {metrics.get('r2') or float('nan'):.4f}, "
+          f"RSS max {peak_mb:.0f} Mo")
+    print(f"Modèle sauvegardé dans {args.output} (python model_registry.py publish {args.output})")
+
+
+if __name__ == "__main__":
+    main()
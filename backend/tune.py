@@ -0,0 +1,221 @@
+"""
+Recherche d'hyperparamètres pour le modèle de productivité Mon Cacao
+Essais répartis sur un pool de processus avec un budget de temps, arrêt précoce
+sur un ensemble de validation, puis classement sur l'erreur et la latence
+d'inférence mesurée, pour choisir un modèle compatible avec l'objectif de latence
+
+Usage : python tune.py [--strategy random|halving] [--trials 40] [--budget 300]
+                       [--workers N] [--slo-ms 2] [--output model_tuned.pkl]
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from batch_scheduler import percentile
+
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+HALVING_ETA = 3
+
+# Données des essais, transmises une fois à chaque processus du pool
+_DATA = {}
+
+
+def sample_params(rng):
+    """Un jeu d'hyperparamètres tiré dans l'espace de recherche"""
+    def log_uniform(low, high):
+        return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+
+    return {
+        'max_depth': int(rng.integers(2, 11)),
+        'learning_rate': round(log_uniform(0.02, 0.3), 4),
+        'min_child_weight': round(log_uniform(1, 20), 2),
+        'subsample': round(float(rng.uniform(0.6, 1.0)), 2),
+        'colsample_bytree': round(float(rng.uniform(0.5, 1.0)), 2),
+        'reg_lambda': round(log_uniform(0.1, 10), 3),
+    }
+
+
+def _init_worker(X_train, y_train, X_val, y_val):
+    _DATA.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+
+def run_trial(trial_id, params, n_rows, n_threads):
+    """Entraîner un candidat sur `n_rows` lignes, arrêt précoce sur la validation
+
+    Le booster est tronqué à sa meilleure itération et renvoyé sérialisé.
+    """
+    from xgboost import XGBRegressor
+
+    start = time.perf_counter()
+    model = XGBRegressor(n_estimators=MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                         random_state=42, n_jobs=n_threads, **params)
+    model.fit(_DATA['X_train'][:n_rows], _DATA['y_train'][:n_rows],
+              eval_set=[(_DATA['X_val'], _DATA['y_val'])], verbose=False)
+    rounds = model.best_iteration + 1
+    booster = model.get_booster()[:rounds]
+    prediction = booster.inplace_predict(_DATA['X_val'])
+    return {
+        'trial': trial_id,
+        'params': params,
+        'n_rows': n_rows,
+        'rounds': rounds,
+        'val_rmse': float(np.sqrt(np.mean((prediction - _DATA['y_val']) ** 2))),
+        'fit_seconds': time.perf_counter() - start,
+        'booster': bytes(booster.save_raw('ubj')),
+    }
+
+
+def run_rung(pool, configs, n_rows, n_threads, workers, deadline):
+    """Évaluer des configurations, au plus `workers` à la fois, sans en lancer après l'échéance"""
+    pending = list(configs)
+    running, results = set(), []
+    while pending or running:
+        while pending and len(running) < workers and time.monotonic() < deadline:
+            trial_id, params = pending.pop(0)
+            running.add(pool.submit(run_trial, trial_id, params, n_rows, n_threads))
+        if not running:
+            break  # Budget épuisé : les configurations restantes ne sont pas lancées
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        results.extend(future.result() for future in done)
+    return results
+
+
+def search(data, strategy="random", n_trials=40, budget=300, workers=None, seed=42):
+    """Résultats des essais, triés par RMSE de validation
+
+    `halving` (successive halving) : toutes les configurations sur une fraction des
+    données, puis le meilleur tiers sur trois fois plus, jusqu'aux données complètes.
+    Si le budget s'épuise avant, ce sont les résultats du dernier palier atteint :
+    `n_rows` de chaque résultat indique le nombre de lignes d'entraînement utilisées.
+    """
+    workers = workers or os.cpu_count()
+    # Threads par essai : les essais simultanés se partagent les cœurs sans les surcharger
+    n_threads = max(1, os.cpu_count() // workers)
+    rng = np.random.default_rng(seed)
+    configs = [(i, sample_params(rng)) for i in range(n_trials)]
+    n_total = len(data[1])
+    deadline = time.monotonic() + budget
+
+    # spawn : aucun état OpenMP hérité du processus parent
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=data) as pool:
+        if strategy == "halving":
+            rungs = max(1, math.ceil(math.log(n_trials, HALVING_ETA)))
+            for rung in reversed(range(rungs)):
+                # Dernier palier (rung = 0) : toutes les données
+                n_rows = min(n_total, max(200, n_total // HALVING_ETA ** rung))
+                results = run_rung(pool, configs, n_rows, n_threads, workers, deadline)
+                results.sort(key=lambda r: r['val_rmse'])
+                if rung == 0 or time.monotonic() >= deadline:
+                    break
+                keep = {r['trial'] for r in results[:max(1, len(results) // HALVING_ETA)]}
+                configs = [(i, params) for i, params in configs if i in keep]
+        else:
+            results = run_rung(pool, configs, n_total, n_threads, workers, deadline)
+    return sorted(results, key=lambda r: r['val_rmse'])
+
+
+def measure_latency(booster_raw, X, n_calls=300):
+    """Latence d'une prédiction à une ligne (ms), comme sur le chemin de /predict, 1 thread"""
+    from xgboost import XGBRegressor
+
+    model = XGBRegressor(n_jobs=1)
+    model.load_model(bytearray(booster_raw))
+    rows = [X[i:i + 1] for i in range(min(len(X), 50))]
+    model.predict(rows[0])
+    timings = []
+    for i in range(n_calls):
+        start = time.perf_counter()
+        model.predict(rows[i % len(rows)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': percentile(timings, 50), 'p99_ms': percentile(timings, 99)}
+
+
+def rank(results, X_val, slo_ms=None, n_measured=10):
+    """Mesurer la latence des meilleurs candidats, l'un après l'autre (pool arrêté)
+
+    Les candidats qui respectent l'objectif de latence passent en tête, chaque groupe
+    trié par RMSE de validation.
+    """
+    ranked = []
+    for result in results[:n_measured]:
+        entry = {key: value for key, value in result.items() if key != 'booster'}
+        entry.update(measure_latency(result['booster'], X_val))
+        entry['meets_slo'] = slo_ms is None or entry['p99_ms'] <= slo_ms
+        ranked.append(entry)
+    return sorted(ranked, key=lambda r: (not r['meets_slo'], r['val_rmse']))
+
+
+def main():
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+    from train_model import build_pipeline, calibrate, generate_dataset
+
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres")
+    parser.add_argument("--strategy", choices=("random", "halving"), default="random")
+    parser.add_argument("--trials", type=int, default=40)
+    parser.add_argument("--budget", type=float, default=300, help="secondes")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--slo-ms", type=float, default=None, help="p99 maximal d'une prédiction")
+    parser.add_argument("--measure", type=int, default=10, help="candidats dont la latence est mesurée")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", default=None, help="classement au format JSON")
+    parser.add_argument("--output", default=None, help="entraîner et sauvegarder le meilleur candidat")
+    args = parser.parse_args()
+
+    # Entraînement 60 %, validation 20 % (arrêt précoce), test 20 % (même découpage que train_model.py)
+    X, y = generate_dataset(args.samples)
+    X_fit, X_test, y_fit, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_val, y_train, y_val = train_test_split(X_fit, y_fit, test_size=0.25, random_state=42)
+    prep = clone(build_pipeline().named_steps['prep']).fit(X_train)
+    data = (prep.transform(X_train), y_train.to_numpy(), prep.transform(X_val), y_val.to_numpy())
+
+    start = time.perf_counter()
+    results = search(data, args.strategy, args.trials, args.budget, args.workers, args.seed)
+    if not results:
+        raise SystemExit("❌ Aucun essai terminé dans le budget")
+    n_rows, n_total = results[0]['n_rows'], len(data[1])
+    print(f"{len(results)} candidats évalués sur {n_rows} lignes d'entraînement sur {n_total} "
+          f"en {time.perf_counter() - start:.0f} s")
+    if n_rows < n_total:
+        print(f"⚠️ Budget épuisé avant le dernier palier : candidats entraînés sur {n_rows} lignes seulement, "
+              "classement et nombre d'arbres moins fiables (augmenter --budget)")
+
+    ranked = rank(results, data[2], args.slo_ms, args.measure)
+    rows = [(i + 1, f"{r['val_rmse']:.4f}", r['rounds'], r['params']['max_depth'], r['params']['learning_rate'],
+             f"{r['p50_ms']:.2f}", f"{r['p99_ms']:.2f}", f"{r['fit_seconds']:.1f}", "oui" if r['meets_slo'] else "non")
+            for i, r in enumerate(ranked)]
+    from benchmark import print_table
+    print_table(("rang", "RMSE val", "arbres", "profondeur", "taux", "p50 (ms)", "p99 (ms)", "fit (s)", "SLO"), rows)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(ranked, f, ensure_ascii=False, indent=2)
+
+    best = ranked[0]
+    if not best['meets_slo']:
+        print(f"⚠️ Aucun candidat mesuré ne respecte p99 <= {args.slo_ms} ms")
+    if args.output:
+        if n_rows < n_total:
+            print(f"⚠️ Nombre d'arbres ({best['rounds']}) déterminé sur {n_rows} lignes, "
+                  "probablement sous-estimé pour l'entraînement complet")
+        # Réentraînement sur entraînement + validation avec le nombre d'arbres retenu
+        pipeline = build_pipeline(model_params=dict(best['params'], n_estimators=best['rounds']))
+        pipeline.fit(X_fit, y_fit)
+        calibrate(pipeline, X_test, y_test)
+        import joblib
+        joblib.dump(pipeline, args.output)
+        print(f"✅ Candidat {best['trial']} : R² test {pipeline.score(X_test, y_test):.4f}, "
+              f"sauvegardé dans {args.output} (python model_registry.py publish {args.output})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Cache météo à deux niveaux pour Mon Cacao
+Dictionnaire TTL en mémoire (par processus) devant la table SQLite `weather_cache`
+(une ligne par région, partagée entre les workers)
+
+Passé leur expiration, les données restent servies pendant `stale_ttl` secondes
+(stale-while-revalidate) : la réponse est marquée périmée et un seul appelant par
+région et par délai `revalidate_after` est invité à les rafraîchir auprès de l'API
+météo externe. Au-delà, la région est absente du cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class WeatherCache:
+    """Cache météo par région : mémoire LRU/TTL, puis base de données"""
+
+    def __init__(self, db, ttl=3600, stale_ttl=21600, max_size=256, revalidate_after=60):
+        self.db = db
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.revalidate_after = revalidate_after
+
+        self._entries = OrderedDict()  # région -> (données, expires_at)
+        self._revalidating = {}  # région -> fin du délai laissé au rafraîchissement en cours
+        self._lock = threading.Lock()
+        self._evictor = None
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.expired_rows = 0
+        self.last_eviction = None
+
+    def _remember(self, region, data, expires_at):
+        if self.max_size <= 0:
+            return
+        self._entries[region] = (data, expires_at)
+        self._entries.move_to_end(region)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, region):
+        """Retourne (données, périmées, à rafraîchir) ; données None si la région est absente"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(region)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(region)
+                self.memory_hits += 1
+                return entry[0], False, False
+
+        # Absente ou expirée en mémoire : un autre worker a pu rafraîchir la base
+        entry = self.db.get_weather_entry(region)
+        with self._lock:
+            if entry is None or entry[1] + self.stale_ttl <= now:
+                self._entries.pop(region, None)
+                self.misses += 1
+                return None, False, False
+            data, expires_at = entry
+            self._remember(region, data, expires_at)
+            if expires_at > now:
+                self.database_hits += 1
+                return data, False, False
+            self.stale_hits += 1
+            revalidate = self._revalidating.get(region, 0) <= now
+            if revalidate:
+                self._revalidating[region] = now + self.revalidate_after
+                self.revalidations += 1
+            return data, True, revalidate
+
+    def put(self, region, latitude, longitude, temperature, humidity, precipitation, forecast_data):
+        """Enregistrer les données d'une région dans la base puis en mémoire"""
+        result = self.db.cache_weather(region, latitude, longitude, temperature, humidity, precipitation,
+                                       forecast_data, ttl=self.ttl)
+        data = {
+            'temperature': temperature,
+            'humidity': humidity,
+            'precipitation': precipitation,
+            'forecast': forecast_data
+        }
+        with self._lock:
+            self._remember(region, data, result['expires_at'])
+            self._revalidating.pop(region, None)
+        return {'success': True}
+
+    def evict(self):
+        """Retirer de la mémoire et de la base les données expirées depuis plus de `stale_ttl`"""
+        now = time.time()
+        limit = now - self.stale_ttl
+        with self._lock:
+            for region in [r for r, (_, expires_at) in self._entries.items() if expires_at <= limit]:
+                del self._entries[region]
+            for region in [r for r, until in self._revalidating.items() if until <= now]:
+                del self._revalidating[region]
+        deleted = self.db.evict_weather(limit)
+        with self._lock:
+            self.expired_rows += deleted
+            self.last_eviction = now
+        return deleted
+
+    def start_eviction(self, interval):
+        """Purger périodiquement les données expirées (un thread par processus)"""
+        if self._evictor is not None and self._evictor.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"⚠️ Purge du cache météo impossible : {e}")
+
+        self._evictor = threading.Thread(target=run, name="weather-evict", daemon=True)
+        self._evictor.start()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revalidating.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.database_hits + self.stale_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "stale_seconds": self.stale_ttl,
+                "memory_hits": self.memory_hits,
+                "database_hits": self.database_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_hit_rate": round(self.memory_hits / lookups, 4) if lookups else 0.0,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "expired_rows_deleted": self.expired_rows,
+                "last_eviction": self.last_eviction,
+            }
@@ -0,0 +1,53 @@
+"""
+Lecture des arbres d'un modèle XGBoost pour Mon Cacao
+Convertit le JSON du booster en tableaux NumPy (un jeu de tableaux par arbre),
+utilisés par les moteurs d'inférence compilés
+"""
+import json
+
+import numpy as np
+
+
+def parse_base_score(value):
+    """base_score est une chaîne, scalaire ou vectorielle selon la version d'XGBoost"""
+    return float(str(value).strip('[]').split(',')[0])
+
+
+def parse_booster_json(raw):
+    """Extraire le score de base et les arbres du JSON `save_raw('json')` d'un booster"""
+    model = json.loads(raw)
+    learner = model['learner']
+    booster = learner['gradient_booster']
+    if booster['name'] != 'gbtree':
+        raise ValueError(f"Booster non supporté: {booster['name']}")
+    objective = learner['objective']['name']
+    if objective not in ('reg:squarederror', 'reg:linear'):
+        raise ValueError(f"Objectif non supporté: {objective}")
+
+    trees = []
+    for tree in booster['model']['trees']:
+        if any(tree['split_type']):
+            raise ValueError("Les divisions catégorielles natives ne sont pas supportées")
+        left = np.asarray(tree['left_children'], dtype=np.int32)
+        trees.append({
+            'left': left,
+            'right': np.asarray(tree['right_children'], dtype=np.int32),
+            'feature': np.asarray(tree['split_indices'], dtype=np.int32),
+            # Seuil pour un nœud de division, valeur de sortie pour une feuille
+            'value': np.asarray(tree['split_conditions'], dtype=np.float32),
+            'default_left': np.asarray(tree['default_left'], dtype=bool),
+            'is_leaf': left == -1,
+        })
+
+    return {
+        'base_score': parse_base_score(learner['learner_model_param']['base_score']),
+        'num_feature': int(learner['learner_model_param']['num_feature']),
+        'trees': trees,
+    }
+
+
+def booster_trees(booster):
+    """Arbres d'un `xgboost.Booster` (ou d'un XGBRegressor) sous forme de tableaux"""
+    if hasattr(booster, 'get_booster'):
+        booster = booster.get_booster()
+    return parse_booster_json(booster.save_raw('json'))
@@ -132,9 +132,12 @@ class DatabaseSync {
         }
     }
 
-    async getProducers(professionalId) {
+    async getProducers(professionalId, cursor = null) {
         try {
-            const response = await fetch(`${API_BASE_URL}/producers/${professionalId}`);
+            const params = new URLSearchParams();
+            if (cursor) params.append('cursor', cursor);
+            
+            const response = await fetch(`${API_BASE_URL}/producers/${professionalId}?${params}`);
             const result = await response.json();
             
             if (result.success) {
@@ -180,11 +183,12 @@ class DatabaseSync {
         }
     }
 
-    async getSubmissions(userId = null, producerId = null) {
+    async getSubmissions(userId = null, producerId = null, cursor = null) {
         try {
             const params = new URLSearchParams();
             if (userId) params.append('user_id', userId);
             if (producerId) params.append('producer_id', producerId);
+            if (cursor) params.append('cursor', cursor);
             
             const response = await fetch(`${API_BASE_URL}/submissions?${params}`);
             return await response.json();
@@ -228,11 +232,12 @@ class DatabaseSync {
 
     // ========== NOTIFICATIONS ==========
 
-    async getNotifications(userId, unreadOnly = false) {
+    async getNotifications(userId, unreadOnly = false, cursor = null) {
         try {
-            const response = await fetch(
-                `${API_BASE_URL}/notifications/${userId}?unread_only=${unreadOnly}`
-            );
+            const params = new URLSearchParams({ unread_only: unreadOnly });
+            if (cursor) params.append('cursor', cursor);
+            
+            const response = await fetch(`${API_BASE_URL}/notifications/${userId}?${params}`);
             return await response.json();
         } catch (error) {
             return { success: false, notifications: [] };
@@ -316,9 +321,12 @@ class DatabaseSync {
         }
     }
 
-    async getMessages(userId, folder = 'inbox') {
+    async getMessages(userId, folder = 'inbox', cursor = null) {
         try {
-            const response = await fetch(`${API_BASE_URL}/messages/${userId}?folder=${folder}`);
+            const params = new URLSearchParams({ folder });
+            if (cursor) params.append('cursor', cursor);
+            
+            const response = await fetch(`${API_BASE_URL}/messages/${userId}?${params}`);
             return await response.json();
         } catch (error) {
             return this.getMessagesOffline(userId, folder);
@@ -347,11 +355,12 @@ class DatabaseSync {
         }
     }
 
-    async getLocations(userId = null, producerId = null) {
+    async getLocations(userId = null, producerId = null, cursor = null) {
         try {
             const params = new URLSearchParams();
             if (userId) params.append('user_id', userId);
             if (producerId) params.append('producer_id', producerId);
+            if (cursor) params.append('cursor', cursor);
             
             const response = await fetch(`${API_BASE_URL}/locations?${params}`);
             return await response.json();
@@ -368,6 +377,10 @@ class DatabaseSync {
             const result = await response.json();
             
             if (result.success && result.data) {
+                if (result.revalidate) {
+                    // Données périmées : affichées tout de suite, rafraîchies en arrière-plan
+                    this.fetchWeatherFromAPI(region).catch(() => {});
+                }
                 return result;
             }
             
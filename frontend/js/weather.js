@@ -40,6 +40,10 @@ class WeatherService {
 
             if (result.success && result.data) {
                 this.cacheWeather(region, result.data);
+                if (result.revalidate) {
+                    // Données périmées : affichées tout de suite, rafraîchies en arrière-plan
+                    this.fetchFromOpenWeather(coords.lat, coords.lon, region).catch(() => {});
+                }
                 return result;
             }
 
@@ -0,0 +1,60 @@
+"""
+Configuration Gunicorn de l'API Mon Cacao (production)
+Usage : gunicorn -c gunicorn_config.py
+
+Le processus maître importe api_server une seule fois (modèle, registre, base de
+données) puis crée les workers par fork : les pages du modèle sont partagées en
+copie sur écriture au lieu d'être rechargées dans chaque worker.
+"""
+import gc
+import os
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+# ========== PROCESSUS ==========
+
+wsgi_app = "api_server:app"
+pythonpath = BACKEND_DIR
+bind = os.environ.get("MON_CACAO_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("MON_CACAO_WORKERS", CPU_COUNT))
+worker_class = "gthread"
+threads = int(os.environ.get("MON_CACAO_WORKER_THREADS", 4))
+preload_app = True
+
+# Threads de calcul par worker : les cœurs sont répartis entre les workers pour
+# que XGBoost/OpenMP/BLAS ne lancent pas chacun un thread par cœur
+inference_threads = int(os.environ.get("MON_CACAO_INFERENCE_THREADS", max(1, CPU_COUNT // workers)))
+os.environ["MON_CACAO_INFERENCE_THREADS"] = str(inference_threads)
+for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(name, str(inference_threads))
+
+# ========== REDÉMARRAGES ==========
+
+timeout = int(os.environ.get("MON_CACAO_TIMEOUT", 120))
+# Délai laissé aux requêtes en cours lors d'un arrêt ou d'un `kill -HUP`
+graceful_timeout = int(os.environ.get("MON_CACAO_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# Renouvellement progressif des workers (0 = jamais)
+max_requests = int(os.environ.get("MON_CACAO_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# ========== HOOKS ==========
+
+def when_ready(server):
+    server.log.info(f"Mon Cacao : {workers} workers x {threads} threads, "
+                    f"{inference_threads} thread(s) de calcul par worker")
+
+def pre_fork(server, worker):
+    # Objets du maître (modèle compris) exclus du ramasse-miettes : ses passages
+    # ne touchent plus leurs en-têtes et ne cassent pas le partage des pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Les threads ne survivent pas à fork() : relancer la surveillance du registre
+    # et la purge du cache météo
+    import api_server
+    if api_server.MODEL_POLL_SECONDS > 0:
+        api_server.model_registry.watch(api_server.MODEL_POLL_SECONDS)
+    if api_server.WEATHER_EVICT_SECONDS > 0:
+        api_server.weather_cache.start_eviction(api_server.WEATHER_EVICT_SECONDS)
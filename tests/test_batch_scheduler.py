@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de l'ordonnanceur de micro-lots
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+import api_server
+from batch_scheduler import MicroBatchScheduler
+from test_prediction_batch import FARM
+
+def slow_square(items):
+    time.sleep(0.005)
+    return [x * x for x in items]
+
+def test_concurrent_requests_are_coalesced():
+    """Requêtes concurrentes regroupées, chaque appelant reçoit sa propre ligne"""
+    scheduler = MicroBatchScheduler(slow_square, max_batch_size=8, max_wait_ms=20)
+    results = {}
+
+    def call(i):
+        results[i] = scheduler.predict(i, timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    scheduler.stop()
+
+    assert results == {i: i * i for i in range(40)}
+    stats = scheduler.stats()
+    assert stats["requests"] == 40
+    assert stats["batches"] < 40
+    assert stats["batch_size"]["max"] <= 8
+    assert stats["queue_depth"] == 0
+
+def test_lone_request_waits_at_most_max_wait():
+    """Une requête isolée part après l'attente maximale"""
+    scheduler = MicroBatchScheduler(lambda items: items, max_batch_size=64, max_wait_ms=10)
+    start = time.perf_counter()
+    assert scheduler.predict("seul", timeout=5) == "seul"
+    assert time.perf_counter() - start < 1
+    assert scheduler.stats()["wait_ms"]["p99"] >= 9
+    scheduler.stop()
+
+def test_model_error_is_propagated():
+    """Une erreur du modèle est renvoyée à tous les appelants du lot"""
+    def failing(items):
+        raise RuntimeError("modèle indisponible")
+
+    scheduler = MicroBatchScheduler(failing, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        scheduler.predict(1, timeout=5)
+    assert scheduler.stats()["errors"] == 1
+    scheduler.stop()
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_worker_fails_batch_and_keeps_queue():
+    """Thread de travail interrompu : son lot échoue, les éléments en file passent au thread suivant"""
+    release = threading.Event()
+
+    def dying(items):
+        if items == ["fatal"]:
+            release.wait(5)
+            raise SystemExit  # BaseException : tue le thread de travail
+        return [x * 2 for x in items]
+
+    scheduler = MicroBatchScheduler(dying, max_batch_size=1, max_wait_ms=0)
+    fatal = scheduler.submit("fatal")
+    while scheduler.stats()["queue_depth"]:
+        time.sleep(0.001)
+    queued = scheduler.submit(21)  # en file derrière le lot qui va tuer le thread
+    release.set()
+    with pytest.raises(RuntimeError):
+        fatal.result(timeout=5)
+    scheduler._worker.join(5)
+    assert not queued.done()
+
+    assert scheduler.predict(4, timeout=5) == 8  # redémarre le thread, qui reprend la file
+    assert queued.result(timeout=5) == 42
+    scheduler.stop()
+
+def test_timeout_is_counted():
+    release = threading.Event()
+    scheduler = MicroBatchScheduler(lambda items: release.wait(5) and items, max_batch_size=1, max_wait_ms=0)
+    with pytest.raises(TimeoutError):
+        scheduler.predict(1, timeout=0.05)
+    release.set()
+    assert scheduler.stats()["timeouts"] == 1
+    scheduler.stop()
+
+def test_api_falls_back_to_direct_call(monkeypatch):
+    """Micro-lot sans réponse dans le délai : /predict évalue la requête seule"""
+    release = threading.Event()
+    stuck = MicroBatchScheduler(lambda items: release.wait(5) and [0.0] * len(items), max_batch_size=1)
+    monkeypatch.setattr(api_server, "micro_batcher", stuck)
+    monkeypatch.setattr(api_server, "MICROBATCH_TIMEOUT", 0.05)
+    model = api_server.model_registry.active
+    features = [api_server.to_model_features(FARM)]
+    assert np.array_equal(api_server.evaluate_rows(model, features), model.predict_features(features))
+    release.set()
+    assert stuck.stats()["timeouts"] == 1
+    stuck.stop()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test des intervalles de prédiction conformes
+"""
+
+import os
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+import api_server
+from calibration import IntervalLookup, conformal_quantile, fit_calibration
+from lite_runtime import LiteModel, LITE_MODEL_PATH
+from test_prediction_batch import FARM
+from test_scenarios import count_model_calls
+
+def test_conformal_quantile_rank():
+    """Rang ceil((n + 1) * niveau), None si l'effectif est insuffisant"""
+    residuals = np.arange(1, 10)
+    assert conformal_quantile(residuals, 0.9) == 9
+    assert conformal_quantile(residuals, 0.5) == 5
+    assert conformal_quantile(residuals, 0.95) is None
+
+def test_intervals_reach_nominal_coverage():
+    """Couverture empirique au moins égale au niveau demandé, tables par groupe"""
+    rng = np.random.default_rng(0)
+    groups = rng.choice(["A", "B"], 4000)
+    noise = np.where(groups == "A", 0.1, 0.4)
+    y_pred = rng.uniform(0.5, 1.5, 4000)
+    y_true = y_pred + rng.normal(0, noise)
+
+    table = fit_calibration(y_true[:2000], y_pred[:2000], groups[:2000])
+    lookup = IntervalLookup(table, 0.9)
+    assert lookup.width("A") < lookup.width("B")
+    assert lookup.width("inconnue") == lookup.width(None)
+
+    lower, upper = lookup.intervals(y_pred[2000:], groups[2000:])
+    covered = (y_true[2000:] >= lower) & (y_true[2000:] <= upper)
+    for group in ("A", "B"):
+        assert covered[groups[2000:] == group].mean() >= 0.87
+
+def test_calibration_is_stored_in_artifacts():
+    """Tables rangées dans le pickle et recopiées dans l'export allégé"""
+    pipeline = joblib.load(os.path.join(BACKEND_DIR, "model_productivite_xgb.pkl"))
+    assert set(pipeline.calibration_["levels"]) == {"0.8", "0.9", "0.95"}
+    assert LiteModel.load(LITE_MODEL_PATH).calibration == pipeline.calibration_
+
+def test_predict_returns_interval_without_extra_model_call(monkeypatch):
+    """/predict et /predict/batch : intervalle par ligne, un seul appel au modèle"""
+    client = api_server.app.test_client()
+    api_server.prediction_cache.clear()
+    calls = count_model_calls(monkeypatch)
+
+    prediction = client.post('/predict', json=FARM).get_json()["prediction"]
+    interval = prediction["interval"]
+    assert interval["method"] == "conformal" and interval["level"] == 0.9
+    assert interval["lower_t_ha"] <= prediction["productivity_t_ha"] <= interval["upper_t_ha"]
+    assert prediction["confidence"] == 90
+
+    records = [FARM, dict(FARM, region="San-Pedro", age_verger=4.0), dict(FARM, region="La Me")]
+    body = client.post('/predict/batch', json={"records": records}).get_json()
+    assert calls == [1, 2]  # FARM est déjà en cache
+    widths = [r["prediction"]["interval"]["upper_t_ha"] - r["prediction"]["productivity_t_ha"]
+              for r in body["results"]]
+    assert all(w > 0 for w in widths)
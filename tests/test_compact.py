@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du compactage du modèle sous un budget de précision
+"""
+
+import os
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from compact import booster_stats, compact, compacted_pipeline, prune
+from model_registry import MODEL_PATH, SMOKE_TEST_FEATURES, ModelRegistry
+from train_model import generate_dataset
+
+PIPELINE = joblib.load(MODEL_PATH)
+PREP = PIPELINE.named_steps["prep"]
+TEACHER = PIPELINE.named_steps["model"].get_booster()
+
+def make_data():
+    X_holdout, y_holdout = generate_dataset(500, seed=1)
+    X_distill, _ = generate_dataset(2000, seed=2)
+    return PREP.transform(X_holdout), y_holdout.to_numpy(), PREP.transform(X_distill)
+
+def test_prune_counts_reachable_nodes():
+    """L'élagage réduit la profondeur ; les nœuds supprimés ne sont plus comptés"""
+    X = make_data()[2]
+    pruned = prune(TEACHER, xgb.DMatrix(X[:1], label=[1.0]), max_depth=3, gamma=0.0)
+    stats, base = booster_stats(pruned), booster_stats(TEACHER)
+    assert stats['max_depth'] == 3 and stats['trees'] == base['trees']
+    assert stats['nodes'] < base['nodes'] / 2
+
+def test_selected_candidate_within_budget():
+    """Le candidat retenu respecte le budget de précision et est plus petit que l'origine"""
+    report, booster = compact(TEACHER, *make_data(), max_loss=0.05)
+    selected = next(c for c in report['candidates'] if c['name'] == report['selected'])
+    assert selected['loss'] <= 0.05 and selected['nodes'] < report['baseline']['nodes']
+    assert selected['nodes'] == min(c['nodes'] for c in report['candidates'] if c['within_loss'])
+    assert booster_stats(booster)['nodes'] == selected['nodes']
+
+    # Budget impossible : le modèle d'origine est conservé
+    report, booster = compact(TEACHER, *make_data(), max_loss=-1.0)
+    assert report['selected'] == "origine" and booster is TEACHER
+
+def test_compacted_pipeline_is_served():
+    """Le pickle compacté passe par le registre comme un modèle ordinaire"""
+    _, booster = compact(TEACHER, *make_data(), max_loss=0.05)
+    path = os.path.join(tempfile.mkdtemp(), "compact.pkl")
+    joblib.dump(compacted_pipeline(PIPELINE, booster), path)
+
+    registry = ModelRegistry(registry_dir=tempfile.mkdtemp())
+    registry.publish(path, activate=True)
+    model = registry.activate()
+    expected = booster.inplace_predict(PREP.transform(pd.DataFrame([SMOKE_TEST_FEATURES])))
+    np.testing.assert_allclose(model.predict_features([SMOKE_TEST_FEATURES]), expected, rtol=1e-6)
+    assert model.predictor.get_booster().num_boosted_rounds() == booster.num_boosted_rounds()
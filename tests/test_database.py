@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du pool de connexions SQLite de Database
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from database import Database
+
+def make_db(**options):
+    return Database(os.path.join(tempfile.mkdtemp(), "mon_cacao.db"), **options)
+
+def test_pragmas_and_connection_reuse():
+    """WAL et pragmas sur chaque connexion ; les appels successifs réutilisent la même"""
+    db = make_db()
+    assert db.stats()["idle"] == 0  # rien de gardé ouvert après l'initialisation
+    with db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        first = conn
+
+    db.create_notification(1, "Titre", "Message")
+    assert len(db.get_notifications(1)) == 1
+    with db.connection() as conn:
+        assert conn is first
+    assert db.stats()["opened"] == 2  # initialisation + premier emprunt
+
+def test_transaction_rollback_and_nesting():
+    """Exception : tout le bloc est annulé ; une transaction imbriquée rejoint l'englobante"""
+    db = make_db()
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO notifications (user_id, title, message) VALUES (1, 'a', 'b')")
+            db.create_notification(1, "Imbriquée", "Message")
+            raise RuntimeError("échec")
+    assert db.get_notifications(1) == []
+
+    with db.transaction():
+        db.create_notification(1, "Imbriquée", "Message")
+        db.add_points(1, 15)
+    assert len(db.get_notifications(1)) == 1
+    with db.connection() as conn:
+        assert conn.execute("SELECT level FROM user_points WHERE user_id = 1").fetchone()[0] == 2
+
+def test_integrity_error_keeps_pool_usable():
+    """Utilisateur en double : erreur rendue, aucune transaction laissée ouverte"""
+    db = make_db()
+    assert db.create_user("awa", "secret", "producteur")["success"]
+    assert db.create_user("awa", "secret", "producteur") == {'success': False, 'error': 'Utilisateur déjà existant'}
+    assert db.authenticate_user("awa", "secret")["success"]
+    with db.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM user_points").fetchone()[0] == 1
+
+def test_concurrent_writers():
+    """Écritures depuis plusieurs threads : toutes validées, pool borné"""
+    db = make_db(pool_size=2)
+
+    def write(user_id):
+        for _ in range(50):
+            db.save_submission(user_id, submission_data={"age_verger": 10})
+            db.add_points(user_id, 1)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(db.get_submissions(limit=1000)) == 400
+    with db.connection() as conn:
+        assert [row[0] for row in conn.execute("SELECT total_points FROM user_points")] == [50] * 8
+    assert db.stats()["idle"] <= 2
+
+def test_forked_process_opens_own_connections():
+    """Dans un processus fils, les connexions du parent ne sont pas réutilisées"""
+    db = make_db()
+    with db.connection() as parent:
+        pass
+    db._pid = -1  # simule un appel depuis un autre processus
+    with db.connection() as child:
+        assert child is not parent
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de parité de l'encodeur compilé avec le préprocesseur sklearn
+"""
+
+import itertools
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from feature_encoder import CompiledEncoder
+
+PREP = joblib.load(os.path.join(BACKEND_DIR, "model_productivite_xgb.pkl")).named_steps["prep"]
+ENCODER = CompiledEncoder.from_pipeline(PREP)
+
+def all_training_combinations():
+    """Toutes les combinaisons de modalités vues à l'entraînement, avec des valeurs numériques variées"""
+    numeric_values = [
+        (450000.0, 15.0), (200000.0, 1.0), (600000.0, 30.0), (0.0, 0.0),
+        (np.nan, 12.5), (321987.654, np.nan), (1e9, 150.0), (-5.0, 7.3),
+    ]
+    rows = []
+    for i, cats in enumerate(itertools.product(*ENCODER.categories)):
+        cout, age = numeric_values[i % len(numeric_values)]
+        row = {"Coût_production/ha": cout, "Age_verger": age}
+        row.update(zip(ENCODER.categorical_features, cats))
+        rows.append(row)
+    return rows
+
+def test_transform_records_bitwise_parity():
+    """transform_records identique bit à bit à prep.transform sur toutes les modalités"""
+    rows = all_training_combinations()
+    expected = PREP.transform(pd.DataFrame(rows))
+    actual = ENCODER.transform_records(rows)
+    assert actual.dtype == expected.dtype
+    assert actual.tobytes() == expected.tobytes()
+
+def test_transform_record_and_columns_parity():
+    """Chemin ligne unique préallouée et chemin colonnes identiques au pipeline"""
+    rows = all_training_combinations()[::97]
+    expected = PREP.transform(pd.DataFrame(rows))
+    for row, exp in zip(rows, expected):
+        assert ENCODER.transform_record(row)[0].tobytes() == exp.tobytes()
+
+    columns = {name: np.array([r[name] for r in rows], dtype=object) for name in rows[0]}
+    for name in ENCODER.numeric_features:
+        columns[name] = columns[name].astype(np.float64)
+    assert ENCODER.transform_columns(columns, len(rows)).tobytes() == expected.tobytes()
+
+def test_unknown_and_missing_categories():
+    """Modalité inconnue ou absente : colonnes à zéro, comme handle_unknown='ignore'"""
+    row = all_training_combinations()[0]
+    row["Région"] = "Région inconnue"
+    row["Maladie"] = None
+    expected = PREP.transform(pd.DataFrame([row]))
+    assert ENCODER.transform_record(row).tobytes() == expected.tobytes()
+
+def test_roundtrip_dict():
+    """Les paramètres exportés reconstruisent un encodeur identique"""
+    clone = CompiledEncoder.from_dict(ENCODER.to_dict())
+    rows = all_training_combinations()[:500]
+    assert clone.transform_records(rows).tobytes() == ENCODER.transform_records(rows).tobytes()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test d'équivalence du moteur par grille de seuils avec xgb_model.predict
+"""
+
+import os
+import sys
+
+import joblib
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmark import random_farm_columns
+from feature_encoder import CompiledEncoder
+from grid_engine import ThresholdGridEngine
+
+PIPELINE = joblib.load(os.path.join(BACKEND_DIR, "model_productivite_xgb.pkl"))
+ENCODER = CompiledEncoder.from_pipeline(PIPELINE.named_steps["prep"])
+REGRESSOR = PIPELINE.named_steps["model"]
+
+def test_grid_matches_booster_on_random_farms():
+    """Prédictions identiques bit à bit sur des exploitations aléatoires"""
+    engine = ThresholdGridEngine.from_pipeline(PIPELINE)
+    n_rows = 3000
+    X = ENCODER.transform_columns(random_farm_columns(ENCODER, n_rows, n_combinations=24, seed=1), n_rows)
+    # Valeurs extrêmes hors de la plage d'entraînement
+    X[:50, 0] = np.linspace(-50, 50, 50)
+    X[50:100, 1] = np.linspace(-50, 50, 50)
+
+    assert np.array_equal(engine.predict(X), REGRESSOR.predict(X))
+    for i in range(0, n_rows, 250):
+        assert engine.predict(X[i:i + 1])[0] == REGRESSOR.predict(X[i:i + 1])[0]
+
+def test_grid_matches_booster_on_cell_boundaries():
+    """Valeurs exactement sur un seuil et juste en dessous : même cellule qu'XGBoost"""
+    engine = ThresholdGridEngine.from_pipeline(PIPELINE)
+    base = ENCODER.transform_columns(random_farm_columns(ENCODER, 1, n_combinations=1, seed=2), 1)
+    for j, thresholds in enumerate(engine.global_thresholds):
+        values = np.concatenate([thresholds, np.nextafter(thresholds, np.float32(-np.inf))])
+        X = np.repeat(base, len(values), axis=0)
+        X[:, j] = values
+        assert np.array_equal(engine.predict(X), REGRESSOR.predict(X))
+
+def test_slab_cache_is_bounded():
+    """Le nombre de tables compilées en mémoire reste borné"""
+    engine = ThresholdGridEngine.from_pipeline(PIPELINE, max_slabs=3)
+    X = ENCODER.transform_columns(random_farm_columns(ENCODER, 40, n_combinations=8, seed=3), 40)
+    assert np.array_equal(engine.predict(X), REGRESSOR.predict(X))
+    stats = engine.stats()
+    assert stats["slabs"] == 3 and stats["evictions"] == stats["compiled"] - 3
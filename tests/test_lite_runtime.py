@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du runtime d'inférence allégé (NumPy seul)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmark import random_farm_columns
+from lite_runtime import LiteModel, export_pipeline
+
+MODEL_PATH = os.path.join(BACKEND_DIR, "model_productivite_xgb.pkl")
+PIPELINE = joblib.load(MODEL_PATH)
+
+def export_to_tmp():
+    path = os.path.join(tempfile.mkdtemp(), "model.lite.npz")
+    export_pipeline(PIPELINE, path, source_path=MODEL_PATH)
+    return path
+
+def test_lite_matches_xgboost():
+    """Prédictions identiques au booster, valeurs manquantes comprises"""
+    model = LiteModel.load(export_to_tmp())
+    n_rows = 2000
+    X = model.encoder.transform_columns(random_farm_columns(model.encoder, n_rows, 200, seed=4), n_rows)
+    X[:20, 0] = np.nan
+    X[20:40, 1] = np.nan
+    assert np.array_equal(model.predict(X), PIPELINE.named_steps["model"].predict(X))
+    assert model.predict(X[:1])[0] == PIPELINE.named_steps["model"].predict(X[:1])[0]
+
+def test_stale_export_is_detected():
+    """Un export ne correspond plus si le modèle pickle change"""
+    model = LiteModel.load(export_to_tmp())
+    assert not model.is_stale(MODEL_PATH)
+    other = os.path.join(tempfile.mkdtemp(), "other.pkl")
+    with open(other, 'wb') as f:
+        f.write(b"autre modele")
+    assert model.is_stale(other)
+
+def test_lite_runtime_does_not_import_heavy_libraries():
+    """Charger et évaluer le modèle allégé n'importe ni xgboost, ni sklearn, ni pandas"""
+    path = export_to_tmp()
+    code = (
+        "import sys, json\n"
+        "from lite_runtime import LiteModel\n"
+        f"model = LiteModel.load({path!r})\n"
+        "row = {'Coût_production/ha': 450000.0, 'Age_verger': 15.0}\n"
+        "model.predict_records([row])\n"
+        "print(json.dumps([m for m in ('xgboost', 'sklearn', 'pandas') if m in sys.modules]))\n"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=BACKEND_DIR)
+    assert json.loads(output) == []
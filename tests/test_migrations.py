@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test des migrations du schéma et des plans d'exécution des requêtes de Database
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+import database
+from database import MIGRATIONS, SCHEMA_VERSION, Database, encode_cursor
+
+def traced(monkeypatch):
+    """Toutes les requêtes exécutées par Database, paramètres inclus"""
+    statements = []
+    connect = Database._connect
+
+    def traced_connect(self, *args, **kwargs):
+        conn = connect(self, *args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(Database, "_connect", traced_connect)
+    return statements
+
+def exercise(db):
+    """Appeler chaque méthode de Database, avec chacune de ses variantes de requête"""
+    pro = db.create_user("koffi", "secret", "professionnel", email="k@example.ci")["user_id"]
+    farmer = db.create_user("awa", "secret", "producteur", phone="0700000000")["user_id"]
+    db.authenticate_user("k@example.ci", "secret")
+    db.enable_2fa(pro)
+    db.verify_2fa(pro, "000000")
+    token = db.generate_reset_token("awa")["token"]
+    db.reset_password(token, "nouveau")
+
+    producer = db.create_producer(pro, "Awa", "Nawa")["producer_id"]
+    db.get_producers_by_professional(pro)
+    db.get_producers_by_professional(pro, limit=10, cursor=encode_cursor({"created_at": "2030-01-01", "id": 99}))
+    for _ in range(3):
+        db.save_submission(farmer, producer, {"age_verger": 12, "region": "Nawa"})
+    db.get_submissions(producer_id=producer)
+    db.get_submissions(user_id=farmer)
+    db.get_submissions()
+    page = db.get_submissions(user_id=farmer, limit=2)
+    db.get_submissions(user_id=farmer, limit=2, cursor=encode_cursor(page[-1], "date_soumission"))
+    db.get_submissions(producer_id=producer, cursor=encode_cursor(page[-1], "date_soumission"))
+    db.get_submissions(cursor=encode_cursor(page[-1], "date_soumission"))
+
+    db.save_advice(producer, pro, "Tailler", "entretien", "conseil", "api")
+    db.get_advice_stats(pro)
+    db.get_advice_stats()
+
+    notification = db.create_notification(farmer, "Titre", "Message")["notification_id"]
+    db.get_notifications(farmer, unread_only=True)
+    db.get_notifications(farmer)
+    cursor = encode_cursor(db.get_notifications(farmer)[-1])
+    db.get_notifications(farmer, unread_only=True, cursor=cursor)
+    db.get_notifications(farmer, cursor=cursor)
+    null_cursor = encode_cursor({"created_at": None, "id": 99})
+    db.get_notifications(farmer, unread_only=True, cursor=null_cursor)
+    db.get_notifications(farmer, cursor=null_cursor)
+    db.mark_notification_read(notification, farmer)
+
+    db.add_points(farmer, 20)
+    db.award_badge(farmer, "soumission", "Première soumission")
+    db.award_badge(farmer, "soumission", "Première soumission")
+    db.get_user_badges(farmer)
+    db.get_leaderboard()
+
+    db.send_message(pro, farmer, "Visite", "Demain")
+    db.get_messages(farmer, "inbox")
+    db.get_messages(pro, "sent")
+    cursor = encode_cursor(db.get_messages(farmer, "inbox")[-1])
+    db.get_messages(farmer, "inbox", limit=20, cursor=cursor)
+    db.get_messages(pro, "sent", limit=20, cursor=cursor)
+    db.get_unread_count(farmer)
+
+    db.save_location(farmer, producer, 6.1, -5.9)
+    db.get_locations(producer_id=producer)
+    db.get_locations(user_id=farmer)
+    db.get_locations()
+    cursor = encode_cursor(db.get_locations()[-1])
+    db.get_locations(producer_id=producer, limit=20, cursor=cursor)
+    db.get_locations(user_id=farmer, limit=20, cursor=cursor)
+    db.get_locations(limit=20, cursor=cursor)
+    db.get_locations(limit=20, cursor=encode_cursor({"created_at": None, "id": 99}))
+
+    db.cache_weather("Nawa", 6.1, -5.9, 28.0, 80.0, 3.0, {"jours": []})
+    db.get_cached_weather("Nawa")
+    db.evict_weather(0)
+
+def test_every_query_uses_an_index(monkeypatch):
+    """EXPLAIN QUERY PLAN : ni parcours complet de table, ni tri en mémoire pour ORDER BY"""
+    db_path = os.path.join(tempfile.mkdtemp(), "mon_cacao.db")
+    db = Database(db_path)
+    statements = traced(monkeypatch)
+    exercise(db)
+
+    queries = {s.strip() for s in statements if re.match(r"\s*(SELECT|UPDATE|DELETE)\b", s, re.IGNORECASE)}
+    assert len(queries) > 25
+    conn = sqlite3.connect(db_path)
+    problems = []
+    for query in sorted(queries):
+        for _, _, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}"):
+            full_scan = detail.startswith("SCAN ") and "INDEX" not in detail and "CONSTANT ROW" not in detail
+            if full_scan or "TEMP B-TREE FOR ORDER BY" in detail:
+                problems.append(f"{detail} <- {' '.join(query.split())}")
+    conn.close()
+    assert problems == []
+
+def test_up_to_date_database_only_reads_version(monkeypatch):
+    """Base à jour : le constructeur lit schema_version et n'écrit rien"""
+    db_path = os.path.join(tempfile.mkdtemp(), "mon_cacao.db")
+    Database(db_path)
+    statements = traced(monkeypatch)
+    Database(db_path)
+    queries = [s for s in statements if not s.startswith("PRAGMA")]
+    assert queries == ["SELECT MAX(version) FROM schema_version"]
+
+def test_existing_database_is_migrated():
+    """Base créée avant les migrations : tables conservées, index ajoutés, version enregistrée"""
+    db_path = os.path.join(tempfile.mkdtemp(), "mon_cacao.db")
+    conn = sqlite3.connect(db_path)
+    for statement in MIGRATIONS[0][2]:
+        conn.execute(statement)
+    conn.execute("INSERT INTO notifications (user_id, title, message) VALUES (1, 'a', 'b')")
+    conn.commit()
+    conn.close()
+
+    db = Database(db_path)
+    with db.connection() as conn:
+        assert db.schema_version(conn) == SCHEMA_VERSION
+        versions = [row["version"] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == [version for version, _, _ in MIGRATIONS]
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_submissions_user_date", "idx_notifications_user_unread", "idx_messages_receiver_read"} <= names
+    assert len(db.get_notifications(1)) == 1
+
+def test_new_migration_applied_once(monkeypatch):
+    """Une migration ajoutée n'est appliquée qu'aux bases qui ne l'ont pas encore"""
+    db_path = os.path.join(tempfile.mkdtemp(), "mon_cacao.db")
+    Database(db_path)
+    migration = (SCHEMA_VERSION + 1, "Test", ["CREATE TABLE extra (id INTEGER PRIMARY KEY)"])
+    monkeypatch.setattr(database, "MIGRATIONS", MIGRATIONS + [migration])
+    monkeypatch.setattr(database, "SCHEMA_VERSION", SCHEMA_VERSION + 1)
+    db = Database(db_path)
+    Database(db_path)  # déjà migrée : CREATE TABLE extra n'est pas rejoué
+    with db.connection() as conn:
+        assert db.schema_version(conn) == SCHEMA_VERSION + 1
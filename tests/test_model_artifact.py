@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de l'artefact sans pickle (booster UBJSON + métadonnées JSON/NumPy)
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from model_artifact import METADATA_NAME, ModelArtifact, artifact_path_for, export_artifact
+from model_registry import MODEL_FEATURES, MODEL_PATH, SMOKE_TEST_FEATURES, ModelRegistry, load_model
+
+def export_copy():
+    """Pickle du dépôt et son artefact dans un répertoire temporaire"""
+    model_path = os.path.join(tempfile.mkdtemp(), "model.pkl")
+    shutil.copyfile(MODEL_PATH, model_path)
+    export_artifact(joblib.load(model_path), artifact_path_for(model_path), source_path=model_path)
+    return model_path
+
+def test_artifact_predicts_like_pickle():
+    """Booster UBJSON et arbres projetés en mémoire : prédictions identiques au pickle"""
+    pipeline = joblib.load(MODEL_PATH)
+    artifact = ModelArtifact.load(artifact_path_for(export_copy()), MODEL_FEATURES, verify=True)
+    X = artifact.encoder.transform_records([SMOKE_TEST_FEATURES] * 3)
+    expected = pipeline.named_steps["model"].predict(X)
+
+    np.testing.assert_array_equal(artifact.regressor(n_threads=1).predict(X), expected)
+    lite = artifact.lite_model()
+    assert not lite.trees.value.flags.writeable  # tableaux en lecture seule sur le fichier
+    np.testing.assert_allclose(lite.predict(X), expected, rtol=1e-6)
+    assert artifact.calibration == pipeline.calibration_
+
+@pytest.mark.parametrize("engine", ["xgboost", "grid", "lite"])
+def test_registry_loads_artifact(engine):
+    """load_model préfère l'artefact à jour et passe la validation du registre"""
+    model_path = export_copy()
+    model = ModelRegistry(registry_dir=tempfile.mkdtemp()).validate(load_model(model_path, engine=engine))
+    assert model.pipeline is None and model.engine == engine
+    assert model.info()["source"] == "model.model"
+    expected = joblib.load(MODEL_PATH).predict(__import__("pandas").DataFrame([SMOKE_TEST_FEATURES]))
+    np.testing.assert_allclose(model.predict_features([SMOKE_TEST_FEATURES]), expected, rtol=1e-6)
+
+def test_schema_mismatch_falls_back_to_pickle():
+    """Colonnes différentes de celles de /model-info : artefact refusé, pickle chargé"""
+    model_path = export_copy()
+    with pytest.raises(ValueError):
+        ModelArtifact.load(artifact_path_for(model_path), list(reversed(MODEL_FEATURES)))
+
+    metadata_path = os.path.join(artifact_path_for(model_path), METADATA_NAME)
+    with open(metadata_path, encoding='utf-8') as f:
+        metadata = json.load(f)
+    metadata['feature_names'] = metadata['feature_names'][:-1]
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+    model = load_model(model_path)
+    assert model.pipeline is not None and model.source_path == model_path
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du registre des modèles et du rechargement à chaud
+"""
+
+import copy
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+import api_server
+from model_registry import ModelRegistry, ModelValidationError, SMOKE_TEST_FEATURES, load_model
+from test_prediction_batch import FARM
+
+MODEL_PATH = os.path.join(BACKEND_DIR, "model_productivite_xgb.pkl")
+PIPELINE = joblib.load(MODEL_PATH)
+
+def dump_variant(pipeline, compress):
+    """Même modèle, pickle différent : une nouvelle version pour le registre"""
+    path = os.path.join(tempfile.mkdtemp(), "candidate.pkl")
+    joblib.dump(pipeline, path, compress=compress)
+    return path
+
+def wait_until_loaded(registry, timeout=30):
+    deadline = time.monotonic() + timeout
+    while registry.loading is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.loading is None
+
+def test_publish_and_hot_swap():
+    """Une version publiée est chargée en arrière-plan puis devient active"""
+    registry = ModelRegistry(registry_dir=tempfile.mkdtemp())
+    initial = registry.activate()
+    assert initial.version == api_server.model_registry.active.version
+
+    version = registry.publish(dump_variant(PIPELINE, 3), activate=True)
+    assert [v["version"] for v in registry.versions()] == [version]
+    assert registry.check_for_update()
+    wait_until_loaded(registry)
+
+    assert registry.active.version == version
+    # La requête qui a lu l'ancien modèle le garde jusqu'au bout
+    before = initial.predict_features([SMOKE_TEST_FEATURES])
+    assert np.array_equal(before, registry.active.predict_features([SMOKE_TEST_FEATURES]))
+    assert registry.status()["history"][-1] == {"version": version, "success": True,
+                                               "at": registry.active.loaded_at}
+
+def test_invalid_model_keeps_previous_version():
+    """Un modèle qui échoue au contrôle du schéma n'est jamais activé"""
+    registry = ModelRegistry(registry_dir=tempfile.mkdtemp())
+    current = registry.activate()
+
+    broken = copy.deepcopy(PIPELINE)
+    broken.named_steps["prep"].feature_names_in_ = np.array(["Région", "Age_verger"], dtype=object)
+    with pytest.raises(ModelValidationError):
+        registry.publish(dump_variant(broken, 0))
+    assert registry.versions() == []
+
+    registry.default_path = dump_variant(broken, 0)
+    assert registry.reload_async()
+    wait_until_loaded(registry)
+    assert registry.active is current
+    assert "ModelValidationError" in registry.status()["last_error"]
+
+def test_inference_threads_are_limited():
+    """Chaque worker limite les threads XGBoost (modèle entraîné avec n_jobs=-1)"""
+    model = load_model(MODEL_PATH, n_threads=1)
+    assert model.predictor.get_params()["n_jobs"] == 1
+
+def test_model_info_reports_active_version():
+    """/model-info expose la version active et son temps de chargement"""
+    client = api_server.app.test_client()
+    info = client.get('/model-info').get_json()
+    active = api_server.model_registry.active
+    assert info["version"] == active.version
+    assert info["load_time_ms"] >= 0
+    assert info["loaded_at"] == active.loaded_at
+
+    prediction = client.post('/predict', json=FARM).get_json()
+    assert prediction["model_info"]["model_version"] == active.version
+    assert client.post('/model/reload', json={"version": "inconnue"}).status_code == 404
+
+def test_reload_version_persists_for_every_worker(monkeypatch):
+    """Version demandée à /model/reload : écrite dans le manifeste, la surveillance ne revient pas en arrière"""
+    registry_dir = tempfile.mkdtemp()
+    worker = ModelRegistry(registry_dir=registry_dir)
+    previous = worker.publish(dump_variant(PIPELINE, 1))
+    current = worker.publish(dump_variant(PIPELINE, 3), activate=True)
+    worker.activate()
+    other_worker = ModelRegistry(registry_dir=registry_dir)
+    other_worker.activate()
+    monkeypatch.setattr(api_server, "model_registry", worker)
+
+    client = api_server.app.test_client()
+    assert client.post('/model/reload', json={"version": previous}).status_code == 202
+    wait_until_loaded(worker)
+    assert worker.active.version == previous
+    assert worker.read_manifest()["active"] == previous
+
+    assert not worker.check_for_update()  # le worker qui a reçu la requête garde la version demandée
+    assert other_worker.active.version == current
+    assert other_worker.check_for_update()
+    wait_until_loaded(other_worker)
+    assert other_worker.active.version == previous
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du mode catégories natives XGBoost (train_model.py --categorical native)
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from feature_encoder import CompiledEncoder
+from model_registry import ModelRegistry, load_model, lite_path_for
+from train_model import build_pipeline, generate_dataset
+
+X, y = generate_dataset(n_samples=300)
+PIPELINE = build_pipeline("native").fit(X, y)
+PREP = PIPELINE.named_steps["prep"]
+ENCODER = CompiledEncoder.from_pipeline(PREP)
+
+def sample_rows(step=53):
+    """Un échantillon des combinaisons de modalités vues à l'entraînement"""
+    rows = []
+    for i, cats in enumerate(itertools.islice(itertools.product(*ENCODER.categories), 0, None, step)):
+        row = {"Coût_production/ha": 200000.0 + 1000 * i, "Age_verger": float(i % 30)}
+        row.update(zip(ENCODER.categorical_features, cats))
+        rows.append(row)
+    return rows
+
+def dump_native():
+    path = os.path.join(tempfile.mkdtemp(), "native.pkl")
+    joblib.dump(PIPELINE, path)
+    return path
+
+def test_ordinal_encoder_bitwise_parity():
+    """Une colonne par variable, identique bit à bit à prep.transform"""
+    assert ENCODER.encoding == "ordinal"
+    assert ENCODER.n_features_out == len(ENCODER.numeric_features) + len(ENCODER.categorical_features)
+    rows = sample_rows()
+    expected = PREP.transform(pd.DataFrame(rows))
+    assert ENCODER.transform_records(rows).tobytes() == expected.tobytes()
+    assert ENCODER.transform_record(rows[0])[0].tobytes() == expected[0].tobytes()
+
+    columns = {name: np.array([r[name] for r in rows], dtype=object) for name in rows[0]}
+    for name in ENCODER.numeric_features:
+        columns[name] = columns[name].astype(np.float64)
+    assert ENCODER.transform_columns(columns, len(rows)).tobytes() == expected.tobytes()
+
+def test_unknown_category_is_missing():
+    """Modalité inconnue ou absente : NaN, comme unknown_value=np.nan"""
+    row = dict(sample_rows()[0], Région="Région inconnue", Maladie=None)
+    encoded = ENCODER.transform_record(row)[0]
+    assert np.isnan(encoded[2]) and np.isnan(encoded[-1])
+    assert encoded.tobytes() == PREP.transform(pd.DataFrame([row]))[0].tobytes()
+    clone = CompiledEncoder.from_dict(ENCODER.to_dict())
+    assert clone.encoding == "ordinal"
+    assert clone.transform_record(row).tobytes() == ENCODER.transform_record(row).tobytes()
+
+def test_native_model_served_by_registry():
+    """Servi par le booster XGBoost ; grille et runtime allégé se replient dessus"""
+    path = dump_native()
+    rows = sample_rows()
+    expected = PIPELINE.predict(pd.DataFrame(rows))
+    for engine in ("xgboost", "grid", "lite"):
+        model = load_model(path, engine=engine)
+        assert model.engine == "xgboost"
+        np.testing.assert_array_equal(model.predict_features(rows), expected)
+
+    registry = ModelRegistry(registry_dir=tempfile.mkdtemp())
+    version = registry.publish(path, activate=True)
+    assert registry.activate().version == version
+    assert not os.path.exists(lite_path_for(registry.resolve(version)))
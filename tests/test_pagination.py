@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la pagination par clé (created_at, id) des listes de Database et de l'API
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+import api_server
+from database import Database, decode_cursor, paginate
+
+def make_db():
+    return Database(os.path.join(tempfile.mkdtemp(), "mon_cacao.db"))
+
+def walk(fetch, limit, column='created_at'):
+    """Parcourir toutes les pages comme un client qui suit next_cursor"""
+    rows, cursor = [], None
+    while True:
+        page, cursor = paginate(fetch(limit + 1, cursor), limit, column)
+        rows += page
+        if cursor is None:
+            return rows
+
+def test_pages_cover_every_row_once():
+    """Lignes de même horodatage (CURRENT_TIMESTAMP à la seconde) : départagées par id"""
+    db = make_db()
+    pro = db.create_user("koffi", "secret", "professionnel")["user_id"]
+    farmer = db.create_user("awa", "secret", "producteur")["user_id"]
+    for i in range(23):
+        db.create_producer(pro, f"Producteur {i}", "Nawa")
+        db.save_submission(farmer, submission_data={"age_verger": i})
+        db.create_notification(farmer, f"Titre {i}", "Message")
+        db.send_message(pro, farmer, "Sujet", f"Message {i}")
+        db.save_location(farmer, None, 6.1, -5.9)
+
+    listings = {
+        "producers": (lambda limit, cursor: db.get_producers_by_professional(pro, limit, cursor), 'created_at'),
+        "submissions": (lambda limit, cursor: db.get_submissions(user_id=farmer, limit=limit, cursor=cursor),
+                        'date_soumission'),
+        "notifications": (lambda limit, cursor: db.get_notifications(farmer, limit=limit, cursor=cursor), 'created_at'),
+        "inbox": (lambda limit, cursor: db.get_messages(farmer, 'inbox', limit, cursor), 'created_at'),
+        "sent": (lambda limit, cursor: db.get_messages(pro, 'sent', limit, cursor), 'created_at'),
+        "locations": (lambda limit, cursor: db.get_locations(user_id=farmer, limit=limit, cursor=cursor), 'created_at'),
+    }
+    for name, (fetch, column) in listings.items():
+        everything = fetch(None, None)
+        assert len(everything) == 23, name
+        for limit in (1, 5, 23, 50):
+            assert walk(fetch, limit, column) == everything, (name, limit)
+        assert [row['id'] for row in everything] == sorted((row['id'] for row in everything), reverse=True)
+
+def test_null_dates_paginated_last():
+    """Lignes sans date : après toutes les autres, et leur curseur mène à la page suivante"""
+    db = make_db()
+    for i in range(6):
+        db.create_notification(7, f"Titre {i}", "Message")
+        db.save_submission(7, submission_data={"age_verger": i})
+    with db.transaction() as conn:
+        conn.execute("UPDATE notifications SET created_at = NULL WHERE id % 2 = 0")
+        conn.execute("UPDATE submissions SET date_soumission = NULL WHERE id % 2 = 0")
+
+    for fetch, column in ((lambda limit, cursor: db.get_notifications(7, limit=limit, cursor=cursor), 'created_at'),
+                          (lambda limit, cursor: db.get_submissions(user_id=7, limit=limit, cursor=cursor),
+                           'date_soumission')):
+        everything = fetch(None, None)
+        assert [row['id'] for row in everything] == [5, 3, 1, 6, 4, 2]
+        for limit in (1, 2, 4, 6):
+            assert walk(fetch, limit, column) == everything, (column, limit)
+
+    client = api_server.app.test_client()
+    user_id = api_server.db.create_user("sans_date", "secret", "producteur")["user_id"]
+    for i in range(3):
+        api_server.db.create_notification(user_id, f"Titre {i}", "Message")
+    with api_server.db.transaction() as conn:
+        conn.execute("UPDATE notifications SET created_at = NULL WHERE user_id = ?", (user_id,))
+    body = client.get(f'/api/notifications/{user_id}', query_string={'limit': 2}).get_json()
+    body = client.get(f'/api/notifications/{user_id}', query_string={'limit': 2, 'cursor': body['next_cursor']})
+    assert body.status_code == 200
+    assert [n['title'] for n in body.get_json()['notifications']] == ["Titre 0"]
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("pas-un-curseur")
+    with pytest.raises(ValueError):
+        make_db().get_notifications(1, cursor="W10")  # "[]" encodé
+
+def test_api_next_cursor():
+    """L'API renvoie next_cursor jusqu'à la dernière page, 400 pour un curseur ou une taille invalide"""
+    client = api_server.app.test_client()
+    user_id = api_server.db.create_user("pagination", "secret", "producteur")["user_id"]
+    for i in range(5):
+        api_server.db.create_notification(user_id, f"Titre {i}", "Message")
+
+    titles, cursor = [], None
+    while True:
+        query = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        body = client.get(f'/api/notifications/{user_id}', query_string=query).get_json()
+        assert len(body['notifications']) <= 2
+        titles += [n['title'] for n in body['notifications']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert titles == [f"Titre {i}" for i in reversed(range(5))]
+
+    assert client.get(f'/api/messages/{user_id}', query_string={'cursor': 'xyz'}).status_code == 400
+    assert client.get('/api/submissions', query_string={'limit': 0}).status_code == 400
+    assert client.get('/api/submissions', query_string={'limit': 'abc'}).status_code == 400
+    assert client.get('/api/submissions', query_string={'limit': '2.5'}).status_code == 400
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de l'endpoint de prédiction par lot /predict/batch
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+import api_server
+
+FARM = {
+    "age_verger": 15.0,
+    "agroforest": "Non",
+    "engrais": "Oui",
+    "fumier": "Non",
+    "maladie": "Non",
+    "herbicide": "Non",
+    "insecticide": "Oui",
+    "fongicide": "Non",
+    "cout_prod": 450000.0,
+    "prix_a": 750000.0,
+    "region": "Indenie-Djuablin",
+    "pluviometrie": "Moyenne",
+    "sexe": "Masculin",
+    "competences": "oui, lire et écrire"
+}
+
+def test_batch_matches_single_predictions():
+    """Chaque ligne du lot doit donner le même résultat que /predict"""
+    client = api_server.app.test_client()
+    records = [
+        FARM,
+        dict(FARM, age_verger=3.0, engrais="Non", region="San-Pedro"),
+        dict(FARM, maladie="Oui", pluviometrie="Faible", cout_prod=250000.0),
+    ]
+
+    response = client.post('/predict/batch', json={"records": records})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["success"] and body["count"] == 3 and body["valid_count"] == 3
+
+    for record, result in zip(records, body["results"]):
+        single = client.post('/predict', json=record).get_json()
+        assert result["success"]
+        assert result["prediction"] == single["prediction"]
+
+def test_batch_reports_item_errors():
+    """Une ligne invalide est signalée sans bloquer les autres"""
+    client = api_server.app.test_client()
+    incomplete = dict(FARM)
+    del incomplete["region"]
+    records = [FARM, incomplete, dict(FARM, cout_prod="beaucoup")]
+
+    body = client.post('/predict/batch', json={"records": records}).get_json()
+    assert body["valid_count"] == 1
+    assert body["results"][0]["success"]
+    assert body["results"][1] == {"index": 1, "success": False, "error": "Champ manquant: region"}
+    assert "cout_prod" in body["results"][2]["error"]
+
+def test_batch_rejects_empty_or_oversized():
+    """Lot vide ou trop grand refusé"""
+    client = api_server.app.test_client()
+    assert client.post('/predict/batch', json={"records": []}).status_code == 400
+    oversized = [FARM] * (api_server.MAX_BATCH_SIZE + 1)
+    assert client.post('/predict/batch', json={"records": oversized}).status_code == 400
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du cache des prédictions
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+from prediction_cache import PredictionCache, quantize
+
+FEATURES = ["Coût_production/ha", "Age_verger", "Région"]
+
+def make_cache(**kwargs):
+    return PredictionCache(FEATURES, precisions={"Coût_production/ha": 1000, "Age_verger": 0.1}, **kwargs)
+
+def test_quantize():
+    """Arrondi au pas choisi, sans résidu binaire"""
+    assert quantize(450499.0, 1000) == 450000.0
+    assert quantize(450600.0, 1000) == 451000.0
+    assert quantize(15.0, 0.1) == 15.0
+    assert quantize(15.04, 0.1) == 15.0
+    assert quantize(15.06, 0.1) == 15.1
+    assert quantize(12.345, 0) == 12.345
+
+def test_canonical_key_groups_near_identical_forms():
+    """Deux formulaires proches partagent la même clé"""
+    cache = make_cache()
+    key_a, canonical = cache.canonicalize({"Coût_production/ha": 450200, "Age_verger": 15.01, "Région": "La Me"})
+    key_b, _ = cache.canonicalize({"Coût_production/ha": 449800, "Age_verger": 14.99, "Région": "La Me"})
+    key_c, _ = cache.canonicalize({"Coût_production/ha": 449800, "Age_verger": 14.99, "Région": "San-Pedro"})
+    assert key_a == key_b != key_c
+    assert canonical["Coût_production/ha"] == 450000.0 and canonical["Age_verger"] == 15.0
+
+def test_lru_eviction_and_counters():
+    """Éviction de l'entrée la moins récemment utilisée"""
+    cache = make_cache(max_size=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    assert cache.get("a") == 1.0
+    cache.put("c", 3.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0 and cache.get("c") == 3.0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 1, 1, 2)
+
+def test_ttl_expiration():
+    """Une entrée expirée n'est plus servie"""
+    cache = make_cache(ttl=0.01)
+    cache.put("a", 1.0)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_model_change_invalidates():
+    """Changer de version de modèle vide le cache"""
+    cache = make_cache()
+    cache.bind_model("v1")
+    cache.put("a", 1.0)
+    cache.bind_model("v1")
+    assert cache.get("a") == 1.0
+    cache.bind_model("v2")
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_api_cache_counters_on_health():
+    """Les compteurs du cache apparaissent sur /health"""
+    import api_server
+    from test_prediction_batch import FARM
+
+    client = api_server.app.test_client()
+    api_server.prediction_cache.clear()
+    before = client.get('/health').get_json()["prediction_cache"]
+    first = client.post('/predict', json=FARM).get_json()
+    second = client.post('/predict', json=dict(FARM, cout_prod=FARM["cout_prod"] + 100)).get_json()
+    after = client.get('/health').get_json()["prediction_cache"]
+
+    assert first["prediction"]["productivity_t_ha"] == second["prediction"]["productivity_t_ha"]
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du réentraînement incrémental à partir des soumissions
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+import joblib
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from model_registry import ModelRegistry
+from retrain import RetrainJob, load_submissions
+from synthetic_data import iter_chunks, write_sqlite
+
+def make_job(n_rows, **options):
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "submissions.db")
+    write_sqlite(db_path, iter_chunks(n_rows, seed=11), seed=11)
+    registry = ModelRegistry(registry_dir=os.path.join(tmp, "models"))
+    return RetrainJob(registry, db_path, min_rows=500, rounds=10, **options)
+
+def test_publish_then_skip_until_new_submissions():
+    """Le booster actif est prolongé, publié et activé ; le filigrane avance"""
+    job = make_job(3000)
+    base_rounds = joblib.load(job.registry.resolve()).named_steps["model"].get_booster().num_boosted_rounds()
+
+    report = job.run_once()
+    assert report["status"] == "published"
+    assert report["rmse_candidate"] <= report["rmse_base"]
+    assert job.read_state()["watermark"] == 3000
+    assert job.registry.read_manifest()["active"] == report["version"]
+
+    model = job.registry.activate()
+    assert model.version == report["version"]
+    assert model.predictor.get_booster().num_boosted_rounds() == base_rounds + 10
+    assert model.info()["calibration"] is not None
+
+    assert job.run_once()["status"] == "skipped"
+
+def test_rejected_candidate_keeps_watermark():
+    """Un candidat moins bon n'est pas publié et ses soumissions restent à traiter"""
+    job = make_job(1000, tolerance=-1.0)
+    report = job.run_once()
+    assert report["status"] == "rejected"
+    assert job.read_state()["watermark"] == 0
+    assert job.registry.versions() == []
+
+def test_implausible_submissions_are_ignored():
+    """Production nulle, aberrante ou colonnes du modèle manquantes : ligne écartée"""
+    job = make_job(10)
+    conn = sqlite3.connect(job.db_path)
+    conn.execute("INSERT INTO submissions (age_verger, cout_prod, production_reelle) VALUES (10, 400000, 0)")
+    conn.execute("INSERT INTO submissions (age_verger, cout_prod, production_reelle) VALUES (10, 400000, 90000)")
+    conn.execute("INSERT INTO submissions (age_verger, production_reelle) VALUES (10, 800)")
+    conn.commit()
+    ids, records, y = load_submissions(conn, since_id=5)
+    conn.close()
+    assert ids.tolist() == [6, 7, 8, 9, 10]
+    assert len(records) == len(y) == 5
+    assert (y > 0).all() and (y <= 5).all()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test des scénarios « et si ? » (pratiques culturales)
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault('MON_CACAO_DB_PATH', os.path.join(tempfile.mkdtemp(), 'test_mon_cacao.db'))
+
+import api_server
+from scenarios import PRACTICES, enumerate_practices, practice_matrix
+from test_prediction_batch import FARM
+
+def count_model_calls(monkeypatch):
+    model = api_server.model_registry.active
+    calls = []
+    original = model.predict_features
+    def counted(rows):
+        calls.append(len(rows))
+        return original(rows)
+    monkeypatch.setattr(model, "predict_features", counted)
+    return calls
+
+def test_practice_matrix_enumerates_all_combinations():
+    """64 combinaisons distinctes pour 6 pratiques"""
+    matrix = practice_matrix()
+    assert matrix.shape == (64, 6)
+    assert len({tuple(row) for row in matrix}) == 64
+
+def test_budget_filters_costly_combinations():
+    """Le coût supplémentaire tient compte des pratiques déjà adoptées"""
+    costs = {"engrais": 60000, "fongicide": 25000, "insecticide": 30000}
+    variants, adopted, extra = enumerate_practices(FARM, costs, budget=30000)
+    assert (extra <= 30000).all()
+    # FARM utilise déjà engrais et insecticide : les arrêter libère du budget
+    assert any(v['engrais'] == "Non" and v['fongicide'] == "Oui" for v in variants)
+    assert [v['cout_prod'] for v in variants] == list(FARM['cout_prod'] + extra)
+
+def test_practices_endpoint_scores_in_one_call(monkeypatch):
+    """Toutes les combinaisons classées, évaluées en un seul appel au modèle"""
+    client = api_server.app.test_client()
+    api_server.prediction_cache.clear()
+    calls = count_model_calls(monkeypatch)
+
+    response = client.post('/predict/practices', json={"farm": FARM})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["evaluated"] == 64
+    assert len(calls) == 1
+
+    gains = [s["yield_gain_t_ha"] for s in body["scenarios"]]
+    assert gains == sorted(gains, reverse=True)
+    unchanged = [s for s in body["scenarios"] if not s["changes"]]
+    assert len(unchanged) == 1 and unchanged[0]["benefit_gain_fcfa"] == 0
+
+    # Chaque scénario correspond à une prédiction individuelle
+    best = body["scenarios"][0]
+    single = client.post('/predict', json=dict(FARM, **best["practices"])).get_json()["prediction"]
+    assert single["productivity_t_ha"] == best["productivity_t_ha"]
+    assert single["benefit_fcfa"] == best["benefit_fcfa"]
+
+def test_practices_endpoint_sorts_by_benefit_with_budget():
+    """Tri par gain de bénéfice et respect du budget"""
+    client = api_server.app.test_client()
+    body = client.post('/predict/practices', json={
+        "farm": FARM, "costs": {p: 20000 for p in PRACTICES}, "budget": 20000,
+        "sort_by": "benefit", "top": 5
+    }).get_json()
+    assert len(body["scenarios"]) == 5
+    assert all(s["extra_cost_fcfa"] <= 20000 for s in body["scenarios"])
+    gains = [s["benefit_gain_fcfa"] for s in body["scenarios"]]
+    assert gains == sorted(gains, reverse=True)
+
+    invalid = client.post('/predict/practices', json={"farm": FARM, "costs": {"irrigation": 1}})
+    assert invalid.status_code == 400
+
+def test_sensitivity_matches_predict_over_grids(monkeypatch):
+    """Grilles prix x coûts en un appel, identiques à /predict point par point"""
+    client = api_server.app.test_client()
+    api_server.prediction_cache.clear()
+    calls = count_model_calls(monkeypatch)
+
+    body = client.post('/predict/sensitivity', json={
+        "farm": FARM,
+        "prices": {"min": 500000, "max": 1000000, "steps": 11},
+        "costs": [300000, 450000, 600000],
+    }).get_json()
+    assert calls == [3]
+    assert len(body["benefit_fcfa"]) == 3 and len(body["benefit_fcfa"][0]) == 11
+
+    for i, cost in enumerate(body["costs"]):
+        for j in (0, 7):
+            farm = dict(FARM, cout_prod=cost, prix_a=body["prices"][j])
+            single = client.post('/predict', json=farm).get_json()["prediction"]
+            assert single["benefit_fcfa"] == body["benefit_fcfa"][i][j]
+            assert single["revenue_fcfa"] == body["revenue_fcfa"][i][j]
+
+        # Au prix d'équilibre, le bénéfice est nul (à l'arrondi près)
+        at_break_even = dict(FARM, cout_prod=cost, prix_a=float(body["break_even_price"][i]))
+        assert abs(client.post('/predict', json=at_break_even).get_json()["prediction"]["benefit_fcfa"]) <= 1
+
+def test_sensitivity_rejects_invalid_grid():
+    """Bornes inversées refusées"""
+    client = api_server.app.test_client()
+    response = client.post('/predict/sensitivity', json={"farm": FARM, "prices": {"min": 2, "max": 1}})
+    assert response.status_code == 400
+
+def test_monte_carlo_scenarios(monkeypatch):
+    """10 000 tirages : un appel au modèle (9 combinaisons), quantiles ordonnés"""
+    client = api_server.app.test_client()
+    api_server.prediction_cache.clear()
+    calls = count_model_calls(monkeypatch)
+
+    body = client.post('/predict/scenarios', json={"farm": FARM, "seed": 1, "n_samples": 10000}).get_json()
+    assert calls == [9]
+    quantiles = body["productivity_t_ha"]
+    assert quantiles["p5"] <= quantiles["p25"] <= quantiles["p50"] <= quantiles["p75"] <= quantiles["p95"]
+    assert abs(sum(c["frequency"] for c in body["conditions"]) - 1) < 1e-3
+
+    # Distribution certaine : un seul scénario, égal à /predict
+    certain = {"pluviometrie": {"Moyenne": 1}, "maladie": {"Non": 1}}
+    body = client.post('/predict/scenarios', json={"farm": FARM, "distribution": certain, "n_samples": 500}).get_json()
+    single = client.post('/predict', json=FARM).get_json()["prediction"]
+    assert body["productivity_t_ha"]["p5"] == body["productivity_t_ha"]["p95"] == single["productivity_t_ha"]
+    assert body["benefit_fcfa"]["p50"] == single["benefit_fcfa"]
+    assert body["probability_of_loss"] == float(single["benefit_fcfa"] < 0)
+
+def test_monte_carlo_rejects_unknown_level():
+    """Modalité de maladie inconnue refusée"""
+    client = api_server.app.test_client()
+    response = client.post('/predict/scenarios', json={"farm": FARM, "distribution": {"maladie": {"Grave": 1}}})
+    assert response.status_code == 400
+
+def test_monte_carlo_rejects_invalid_seed():
+    """Graine non entière ou négative : 400 au lieu d'une erreur de NumPy"""
+    client = api_server.app.test_client()
+    for seed in ("abc", -1, 1.5, True):
+        assert client.post('/predict/scenarios', json={"farm": FARM, "seed": seed}).status_code == 400
+    assert client.post('/predict/scenarios', json={"farm": FARM, "seed": 0, "n_samples": 100}).status_code == 200
+
+def test_projection_for_many_farms_in_one_call(monkeypatch):
+    """Trajectoires d'âge de plusieurs exploitations évaluées ensemble, cumuls cohérents"""
+    client = api_server.app.test_client()
+    api_server.prediction_cache.clear()
+    calls = count_model_calls(monkeypatch)
+
+    farms = [FARM, dict(FARM, age_verger=3.0, region="San-Pedro")]
+    body = client.post('/predict/projection', json={"farms": farms, "years": 20}).get_json()
+    assert len(calls) == 1 and calls[0] <= 40
+    assert len(body["projections"]) == 2
+
+    young = body["projections"][1]
+    assert young["ages"] == [3.0 + t for t in range(20)]
+    assert young["cumulative_benefit_fcfa"][-1] == sum(young["benefit_fcfa"])
+    at_ten = client.post('/predict', json=dict(farms[1], age_verger=10.0)).get_json()["prediction"]
+    assert young["productivity_t_ha"][7] == at_ten["productivity_t_ha"]
+    assert young["benefit_fcfa"][7] == at_ten["benefit_fcfa"]
+
+def test_projection_rejects_long_horizon():
+    """Horizon limité à MAX_PROJECTION_YEARS"""
+    client = api_server.app.test_client()
+    assert client.post('/predict/projection', json={"farm": FARM, "years": 100}).status_code == 400
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du générateur vectorisé de données synthétiques
+"""
+
+import gzip
+import os
+import sqlite3
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from synthetic_data import CATEGORIES, iter_chunks, write_csv, write_sqlite
+from train_model import generate_dataset
+
+def reference_productivity(row, noise):
+    """Règles de l'ancienne boucle ligne par ligne (df.apply)"""
+    region_effects = {'Indenie-Djuablin': 0.1, 'Yamoussoukro': 0.05, 'La Me': 0.08,
+                      'San-Pedro': 0.15, 'Grand-Ponts': 0.12}
+    productivity = (0.5
+                    + 0.1 * np.exp(-0.1 * (row['Age_verger'] - 10) ** 2)
+                    + (0.2 if row['Engrais chimique'] == 'Oui' else 0)
+                    + (0.15 if row['Agroforesterie'] == 'Oui' else 0)
+                    + (0.1 if row['fumier/ compost'] == 'Oui' else 0)
+                    + (-0.3 if row['Maladie'] == 'Oui' else (-0.1 if row['Maladie'] == 'Un peu' else 0))
+                    + {'Faible': -0.2, 'Moyenne': 0, 'Élevée': 0.1}[row['Pluviometrie']]
+                    + region_effects[row['Région']]
+                    + noise)
+    return max(0.1, min(2.0, productivity))
+
+def test_matches_row_by_row_rules():
+    """Jeu d'entraînement identique bit à bit à l'ancienne génération par df.apply"""
+    X, y = generate_dataset(n_samples=2000, seed=42)
+
+    # Même suite de tirages : le bruit vient après les 14 colonnes
+    rng = np.random.RandomState(42)
+    rng.uniform(size=2 * 2000)
+    for levels in CATEGORIES.values():
+        rng.choice(len(levels), 2000)
+    noise = rng.normal(0, 0.1, 2000)
+
+    expected = [reference_productivity(row, n) for (_, row), n in zip(X.iterrows(), noise)]
+    assert y.to_numpy().tobytes() == np.array(expected).tobytes()
+    assert list(X.columns)[:2] == ['Coût_production/ha', 'Age_verger']
+
+def test_chunks_are_reproducible():
+    """Même graine, même découpage : mêmes données ; le total de lignes est respecté"""
+    first = pd.concat(iter_chunks(2500, chunk_size=1000, seed=7), ignore_index=True)
+    second = pd.concat(iter_chunks(2500, chunk_size=1000, seed=7), ignore_index=True)
+    assert len(first) == 2500
+    pd.testing.assert_frame_equal(first, second)
+    assert first['Productivite'].between(0.1, 2.0).all()
+
+def test_write_csv_and_sqlite():
+    """Écriture par blocs en CSV gzip et dans la table submissions"""
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, "farms.csv.gz")
+    assert write_csv(csv_path, iter_chunks(1500, chunk_size=400, seed=1)) == 1500
+    with gzip.open(csv_path, 'rt', encoding='utf-8') as f:
+        df = pd.read_csv(f)
+    expected = pd.concat(iter_chunks(1500, chunk_size=400, seed=1), ignore_index=True)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    db_path = os.path.join(tmp, "bench.db")
+    assert write_sqlite(db_path, iter_chunks(1500, chunk_size=400, seed=1), seed=1, user_id=3) == 1500
+    conn = sqlite3.connect(db_path)
+    count, users, production, revenue = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT user_id), AVG(production_reelle), "
+        "SUM(ABS(revenu_total - ROUND(production_reelle * prix_vente)) > 1000) FROM submissions").fetchone()
+    conn.close()
+    assert (count, users) == (1500, 1)
+    assert abs(production - df['Productivite'].mean() * 1000) < 1
+    assert revenue == 0
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de l'entraînement hors mémoire depuis SQLite
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from database import Database
+from feature_encoder import CompiledEncoder
+from model_registry import ModelRegistry, SMOKE_TEST_FEATURES, load_model
+from synthetic_data import iter_chunks, write_sqlite
+from train_model import build_pipeline
+from train_stream import SubmissionIter, fit_preprocessor, train
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "submissions.db")
+write_sqlite(DB_PATH, iter_chunks(6000, chunk_size=2000, seed=4), seed=4)
+
+def test_iterator_chunks_match_table():
+    """Blocs encodés : toutes les lignes, contrôle disjoint, identiques au préprocesseur sklearn"""
+    conn = Database(DB_PATH).get_connection()
+    prep = fit_preprocessor(conn, build_pipeline().named_steps["prep"], sample_size=1000)
+    conn.close()
+    encoder = CompiledEncoder.from_pipeline(prep)
+
+    train_iter = SubmissionIter(DB_PATH, encoder, chunk_size=700)
+    holdout_iter = SubmissionIter(DB_PATH, encoder, holdout=True, chunk_size=700)
+    chunks = list(train_iter.chunks())
+    n_train = sum(len(y) for _, y, _ in chunks)
+    n_holdout = sum(len(y) for _, y, _ in holdout_iter.chunks())
+    assert n_train + n_holdout == 6000 and n_holdout == 1200
+    assert max(len(y) for _, y, _ in chunks) <= 700
+
+    X, _, columns = chunks[0]
+    expected = prep.transform(pd.DataFrame(columns).reindex(columns=prep.feature_names_in_))
+    assert X.tobytes() == expected.tobytes()
+
+@pytest.mark.parametrize("memory", ["quantile", "external"])
+def test_streamed_model_is_served(memory):
+    """Le pipeline entraîné par blocs passe la validation du registre et prédit comme son booster"""
+    pipeline, metrics = train(DB_PATH, memory, chunk_size=1000, fit_sample=2000, n_threads=1)
+    assert metrics["n_train"] == 4800 and metrics["n_holdout"] == 1200
+    assert metrics["r2"] > 0.6
+
+    path = os.path.join(tempfile.mkdtemp(), "stream.pkl")
+    import joblib
+    joblib.dump(pipeline, path)
+    model = ModelRegistry(registry_dir=tempfile.mkdtemp()).validate(load_model(path))
+    expected = pipeline.predict(pd.DataFrame([SMOKE_TEST_FEATURES]))
+    np.testing.assert_array_equal(model.predict_features([SMOKE_TEST_FEATURES]), expected)
+    assert model.intervals is not None
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la recherche d'hyperparamètres
+"""
+
+import os
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from tune import MAX_ROUNDS, rank, sample_params, search
+
+def make_data(n_rows=1200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 6))
+    y = X[:, 0] + 0.5 * (X[:, 1] > 0) + rng.normal(0, 0.1, n_rows)
+    split = n_rows * 3 // 4
+    return X[:split], y[:split], X[split:], y[split:]
+
+def test_sample_params_reproducible():
+    first = sample_params(np.random.default_rng(3))
+    assert first == sample_params(np.random.default_rng(3))
+    assert 2 <= first['max_depth'] <= 10 and 0.02 <= first['learning_rate'] <= 0.3
+
+def test_halving_search_and_latency_ranking():
+    """Arrêt précoce, meilleurs candidats sur toutes les données, classement par SLO puis RMSE"""
+    data = make_data()
+    results = search(data, "halving", n_trials=9, budget=120, workers=1, seed=1)
+    assert 1 <= len(results) <= 3
+    assert all(r['n_rows'] == len(data[1]) and r['rounds'] < MAX_ROUNDS for r in results)
+    assert [r['val_rmse'] for r in results] == sorted(r['val_rmse'] for r in results)
+
+    ranked = rank(results, data[2], slo_ms=1e-6, n_measured=2)
+    assert len(ranked) == min(2, len(results))
+    assert not any(r['meets_slo'] for r in ranked)
+    assert all(r['p99_ms'] >= r['p50_ms'] > 0 and 'booster' not in r for r in ranked)
+    assert rank(results, data[2], n_measured=1)[0]['trial'] == results[0]['trial']
+
+def test_halving_out_of_budget_reports_rows():
+    """Budget épuisé au premier palier : résultats partiels, signalés par n_rows"""
+    data = make_data()
+    results = search(data, "halving", n_trials=9, budget=0.01, workers=1, seed=1)
+    assert len(results) == 1
+    assert results[0]['n_rows'] < len(data[1])
+
+def test_budget_stops_new_trials():
+    """Budget épuisé : aucun nouvel essai n'est lancé"""
+    assert search(make_data(), "random", n_trials=5, budget=0, workers=1) == []
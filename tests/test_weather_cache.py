@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test du cache météo à deux niveaux (mémoire puis SQLite)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from database import MIGRATIONS, Database
+from weather_cache import WeatherCache
+
+def make_cache(**options):
+    db = Database(os.path.join(tempfile.mkdtemp(), "mon_cacao.db"))
+    return WeatherCache(db, **options)
+
+def put(cache, region, temperature):
+    cache.put(region, 6.1, -5.9, temperature, 80.0, 3.0, {"jours": [temperature]})
+
+def count_rows(db):
+    with db.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM weather_cache").fetchone()[0]
+
+def expire(db, region, seconds_ago):
+    with db.transaction() as conn:
+        conn.execute("UPDATE weather_cache SET expires_at = ? WHERE region = ?", (time.time() - seconds_ago, region))
+
+def test_one_row_per_region():
+    """Écritures répétées : la ligne de la région est remplacée, pas dupliquée"""
+    cache = make_cache()
+    for temperature in range(20, 30):
+        put(cache, "Nawa", temperature)
+    put(cache, "Soubré", 31.0)
+    assert count_rows(cache.db) == 2
+    assert cache.db.get_cached_weather("Nawa")["forecast"] == {"jours": [29]}
+
+def test_memory_then_database():
+    """Premier accès d'un worker : lu en base ; les suivants : servis par la mémoire"""
+    cache = make_cache()
+    put(cache, "Nawa", 28.0)
+    worker = WeatherCache(cache.db)  # autre processus : mémoire vide, même base
+    assert worker.get("Nawa") == (cache.get("Nawa")[0], False, False)
+    worker.get("Nawa")
+    assert worker.get("Absente") == (None, False, False)
+    stats = worker.stats()
+    assert (stats["database_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+def test_stale_while_revalidate():
+    """Expirée depuis peu : servie périmée, un seul appelant invité à rafraîchir"""
+    cache = make_cache(stale_ttl=600, revalidate_after=60)
+    put(cache, "Nawa", 28.0)
+    expire(cache.db, "Nawa", 10)
+    cache.clear()
+    data, stale, revalidate = cache.get("Nawa")
+    assert data["temperature"] == 28.0 and stale and revalidate
+    assert cache.get("Nawa")[1:] == (True, False)
+
+    put(cache, "Nawa", 30.0)  # rafraîchie par l'appelant désigné
+    assert cache.get("Nawa") == (cache.db.get_cached_weather("Nawa"), False, False)
+    assert cache.stats()["revalidations"] == 1
+
+    expire(cache.db, "Nawa", 700)
+    cache.clear()
+    assert cache.get("Nawa") == (None, False, False)
+
+def test_eviction_and_memory_bound():
+    """Purge des lignes trop anciennes ; mémoire bornée à max_size régions"""
+    cache = make_cache(stale_ttl=600, max_size=2)
+    for region in ("Nawa", "Soubré", "Daloa"):
+        put(cache, region, 28.0)
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 1
+    expire(cache.db, "Nawa", 700)
+    expire(cache.db, "Soubré", 10)  # périmée mais encore servie : conservée
+    assert cache.evict() == 1
+    assert count_rows(cache.db) == 2
+    assert cache.stats()["expired_rows_deleted"] == 1
+
+def test_duplicate_rows_migrated():
+    """Base créée avant la migration 3 : seule la ligne la plus récente de chaque région reste"""
+    db_path = os.path.join(tempfile.mkdtemp(), "mon_cacao.db")
+    conn = sqlite3.connect(db_path)
+    for _, _, statements in MIGRATIONS[:2]:
+        for statement in statements:
+            conn.execute(statement)
+    for temperature in (25.0, 26.0, 27.0):
+        conn.execute("INSERT INTO weather_cache (region, temperature, forecast_data, expires_at) VALUES (?, ?, 'null', ?)",
+                     ("Nawa", temperature, time.time() + 3600))
+    conn.commit()
+    conn.close()
+
+    db = Database(db_path)
+    assert count_rows(db) == 1
+    assert db.get_cached_weather("Nawa")["temperature"] == 27.0
+
+def test_fresh_database_weather_indexes():
+    """Base neuve : seuls les index de la migration 3 sur weather_cache"""
+    db = make_cache().db
+    with db.connection() as conn:
+        names = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'weather_cache' AND sql IS NOT NULL")}
+    assert names == {"idx_weather_region", "idx_weather_expires"}